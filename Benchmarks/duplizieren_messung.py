@@ -0,0 +1,71 @@
+"""Vergleicht das Kopieren einer großen Reise per Export/Import mit reise_duplizieren().
+
+Legt in einer temporären SQLite-Datei eine Reise mit vielen Items an und misst
+export_reise_to_dict + import_reise_from_dict gegen die INSERT ... SELECT-Kopie.
+
+    python Benchmarks/duplizieren_messung.py [anzahl_items]
+"""
+
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from peewee import SqliteDatabase  # noqa: E402
+
+from database import (  # noqa: E402
+    ReiseModel,
+    KategorieModel,
+    GegenstandNameModel,
+    GegenstandModel,
+    reise_duplizieren,
+)
+from austausch import export_reise_to_dict, import_reise_from_dict  # noqa: E402
+from statistik import MODELLE, statistik_einrichten  # noqa: E402
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel] + MODELLE
+
+
+def _zeit(fn, wiederholungen=3):
+    beste = None
+    for _ in range(wiederholungen):
+        t = time.perf_counter()
+        fn()
+        dauer = time.perf_counter() - t
+        beste = dauer if beste is None else min(beste, dauer)
+    return beste
+
+
+def main(anzahl_items: int):
+    with TemporaryDirectory() as tmp:
+        db = SqliteDatabase(str(Path(tmp) / "bench.db"), pragmas={"foreign_keys": 1})
+        with db.bind_ctx(MODELS):
+            db.create_tables(MODELS)
+            statistik_einrichten()
+            with db.atomic():
+                r = ReiseModel.create(name="Ski", ziel="Alpen", startdatum=date(2024, 2, 1), enddatum=date(2024, 2, 7))
+                for k in range(anzahl_items // 100):
+                    kat = KategorieModel.create(name=f"Kategorie {k}", reise=r)
+                    for i in range(100):
+                        GegenstandModel.create(
+                            name=f"Item {i}", menge=1 + i % 5, menge_pro_tag=1 if i % 4 == 0 else None,
+                            gepackt=i % 3 == 0, kategorie=kat,
+                        )
+
+            roundtrip = _zeit(lambda: import_reise_from_dict(export_reise_to_dict(r, mit_uid=False)))
+            gleich = _zeit(lambda: reise_duplizieren(r.id, zuruecksetzen=False))
+            verschoben = _zeit(lambda: reise_duplizieren(r.id, startdatum=date(2025, 2, 1), enddatum=date(2025, 2, 10)))
+        db.close()
+
+    print(f"Reise mit {anzahl_items} Items (inkl. Statistik-Trigger)")
+    print(f"  Export + Import:                  {roundtrip * 1000:8.1f} ms")
+    print(f"  reise_duplizieren():              {gleich * 1000:8.1f} ms")
+    print(f"  reise_duplizieren() neue Dauer:   {verschoben * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,57 @@
+"""Vergleicht den Speicherbedarf pro Item: peewee-Instanz, Dict und Lesemodell (__slots__).
+
+Baut jeweils eine Liste mit vielen Items im Speicher auf (ohne Datenbank) und misst
+mit tracemalloc, wie viele Bytes pro Item dazukommen. Die Namen kommen aus einer
+kleinen, gemeinsam genutzten Liste, damit nur der Aufwand pro Objekt zählt.
+
+    python Benchmarks/lesemodell_speicher.py [anzahl_items]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from database import GegenstandModel  # noqa: E402
+from lesemodell import GegenstandLesen  # noqa: E402
+
+NAMEN = [f"Item {i}" for i in range(100)]
+
+
+def _peewee(i):
+    return GegenstandModel(id=i, name=NAMEN[i % 100], menge=1 + i % 5, gepackt=i % 3 == 0, menge_gepackt=0)
+
+
+def _dict(i):
+    return {"id": i, "name": NAMEN[i % 100], "menge": 1 + i % 5, "gepackt": i % 3 == 0, "menge_gepackt": 0}
+
+
+def _lesemodell(i):
+    return GegenstandLesen(i, NAMEN[i % 100], 1 + i % 5, i % 3 == 0, 0)
+
+
+def _messen(erzeugen, anzahl: int):
+    gc.collect()
+    tracemalloc.start()
+    t = time.perf_counter()
+    items = [erzeugen(i) for i in range(anzahl)]
+    dauer = time.perf_counter() - t
+    groesse, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return groesse / anzahl, dauer
+
+
+def main(anzahl: int):
+    print(f"{anzahl} Items")
+    for name, erzeugen in (("peewee-Instanz", _peewee), ("Dict", _dict), ("GegenstandLesen", _lesemodell)):
+        pro_item, dauer = _messen(erzeugen, anzahl)
+        print(f"  {name:16s} {pro_item:7.0f} Bytes/Item  {pro_item * anzahl / 2**20:8.1f} MiB  {dauer:6.2f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
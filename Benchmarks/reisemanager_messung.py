@@ -0,0 +1,76 @@
+"""Vergleicht Suche und Fortschritt im Draft-ReiseManager mit der früheren linearen Variante.
+
+Baut viele Reisen im Speicher auf und misst:
+  - reise_finden() über den Namensindex gegen einen Durchlauf über manager.reisen
+  - fortschritt_berechnen() über die mitgeführten Zähler gegen das frühere
+    Zusammensammeln aller Gegenstände in einer Liste
+
+    python Benchmarks/reisemanager_messung.py [anzahl_reisen] [items_pro_reise]
+"""
+
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Draft" / "Backend"))
+
+from backend import Gegenstand, Kategorie, Reise, ReiseManager  # noqa: E402
+
+
+# Frühere Implementierungen als Vergleich
+def _finden_linear(reisen, name):
+    return next((r for r in reisen if r.name == name), None)
+
+
+def _fortschritt_liste(reise):
+    alle_gegenstaende = [g for k in reise.kategorien for g in k.gegenstaende]
+    if not alle_gegenstaende:
+        return 0.0
+    gepackt = sum(1 for g in alle_gegenstaende if g.gepackt)
+    return round((gepackt / len(alle_gegenstaende)) * 100, 2)
+
+
+def _zeit(fn, wiederholungen):
+    t = time.perf_counter()
+    for _ in range(wiederholungen):
+        fn()
+    return (time.perf_counter() - t) / wiederholungen
+
+
+def main(anzahl_reisen: int, items_pro_reise: int):
+    with TemporaryDirectory() as tmp:
+        manager = ReiseManager(str(Path(tmp) / "reisen.json"), kompaktieren_ab=10**9)
+        for i in range(anzahl_reisen):
+            reise = Reise(f"Reise {i}", date(2026, 5, 1), date(2026, 5, 5))
+            for k in range(items_pro_reise // 10):
+                kategorie = Kategorie(f"Kategorie {k}")
+                for n in range(10):
+                    kategorie.gegenstand_hinzufuegen(Gegenstand(f"Item {n}", gepackt=n % 3 == 0))
+                reise.kategorie_hinzufuegen(kategorie)
+            manager._anhaengen(reise)  # ohne Journal, es geht nur um die Lesezugriffe
+
+        reisen = manager.reisen
+        letzte = reisen[-1]
+        assert _fortschritt_liste(letzte) == letzte.fortschritt_berechnen()
+        n = 1000
+        finden_alt = _zeit(lambda: _finden_linear(reisen, letzte.name), n)
+        finden_neu = _zeit(lambda: manager.reise_finden(letzte.name), n)
+        fortschritt_alt = _zeit(lambda: _fortschritt_liste(letzte), n)
+        fortschritt_neu = _zeit(lambda: letzte.fortschritt_berechnen(), n)
+        uebersicht_alt = _zeit(lambda: [_fortschritt_liste(r) for r in reisen], 5)
+        uebersicht_neu = _zeit(lambda: [r.fortschritt_berechnen() for r in reisen], 5)
+
+    print(f"{anzahl_reisen} Reisen mit je {items_pro_reise} Items")
+    print(f"  reise_finden (letzte Reise)    linear {finden_alt * 1e6:9.1f} µs   Index  {finden_neu * 1e6:9.1f} µs")
+    print(f"  fortschritt_berechnen          Liste  {fortschritt_alt * 1e6:9.1f} µs   Zähler {fortschritt_neu * 1e6:9.1f} µs")
+    print(f"  Fortschritt aller Reisen       Liste  {uebersicht_alt * 1e3:9.1f} ms   Zähler {uebersicht_neu * 1e3:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
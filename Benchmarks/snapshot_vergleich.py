@@ -0,0 +1,119 @@
+"""Vergleicht den JSON-Export mit dem Snapshot-Format.
+
+Legt in einer temporären SQLite-Datei viele Reisen mit abwechslungsreichen Daten an
+(zufällige Namen, Mengen, Reiselängen und Packstände statt immer derselben Vorlagen)
+und misst Größe sowie Encode-/Decode-Zeit von
+  - JSON mit indent=2 (wie der Export-Button),
+  - kompaktem JSON mit zlib (der naheliegende Konkurrent),
+  - dem Snapshot-Format.
+
+    python Benchmarks/snapshot_vergleich.py [anzahl_reisen] [seed]
+"""
+
+import json
+import random
+import sys
+import time
+import zlib
+from datetime import date, timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from peewee import SqliteDatabase  # noqa: E402
+
+from austausch import export_reise_to_dict  # noqa: E402
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel  # noqa: E402
+from snapshot import snapshot_erstellen, snapshot_laden  # noqa: E402
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+
+KATEGORIEN = ["Kleidung", "Hygiene", "Technik", "Dokumente", "Apotheke", "Küche", "Sport", "Sonstiges"]
+WOERTER = [
+    "Socken", "Hose", "Jacke", "Mütze", "Kabel", "Ladegerät", "Pass", "Ticket", "Zahnbürste", "Creme",
+    "Pflaster", "Topf", "Messer", "Schuhe", "Buch", "Kamera", "Akku", "Schal", "Brille", "Karte",
+]
+
+
+def _name(rnd: random.Random) -> str:
+    # Mischung aus wiederkehrenden und einmaligen Namen, wie in echten Listen
+    wort = rnd.choice(WOERTER)
+    if rnd.random() < 0.5:
+        return wort
+    return f"{wort} {rnd.choice(['rot', 'blau', 'klein', 'groß', 'alt', 'neu'])} {rnd.randint(1, 999)}"
+
+
+def _daten_anlegen(anzahl_reisen: int, rnd: random.Random):
+    for i in range(anzahl_reisen):
+        start = date(2024, 1, 1) + timedelta(days=rnd.randint(0, 700))
+        r = ReiseModel.create(
+            name=f"Reise {i} {rnd.choice(WOERTER)}", ziel=rnd.choice(["Alpen", "Meer", "Stadt", ""]),
+            startdatum=start, enddatum=start + timedelta(days=rnd.randint(0, 21)),
+            beschreibung=rnd.choice(["", "Mit Kindern", f"Notiz {rnd.randint(1, 10 ** 6)}"]),
+        )
+        for k in rnd.sample(KATEGORIEN, rnd.randint(2, len(KATEGORIEN))):
+            kat = KategorieModel.create(name=k, reise=r)
+            zeilen = []
+            for _ in range(rnd.randint(0, 25)):
+                menge = rnd.choice([1, 1, 1, 2, 3, rnd.randint(1, 20)])
+                gepackt = rnd.random() < 0.4
+                zeilen.append({
+                    "name": _name(rnd), "menge": menge, "gepackt": gepackt, "kategorie": kat.id,
+                    "menge_gepackt": menge if gepackt else rnd.randint(0, menge - 1),
+                    "menge_pro_tag": rnd.choice([None, None, None, 0.5, 1.0]),
+                })
+            if zeilen:
+                GegenstandModel.insert_many(zeilen).execute()
+
+
+def _zeit(fn, wiederholungen=3):
+    beste = None
+    for _ in range(wiederholungen):
+        t = time.perf_counter()
+        ergebnis = fn()
+        dauer = time.perf_counter() - t
+        beste = dauer if beste is None else min(beste, dauer)
+    return ergebnis, beste
+
+
+def main(anzahl_reisen: int, seed: int):
+    rnd = random.Random(seed)
+    with TemporaryDirectory() as tmp:
+        db = SqliteDatabase(str(Path(tmp) / "bench.db"), pragmas={"foreign_keys": 1})
+        with db.bind_ctx(MODELS):
+            db.create_tables(MODELS)
+            with db.atomic():
+                _daten_anlegen(anzahl_reisen, rnd)
+            items = GegenstandModel.select().count()
+
+            def export():
+                # Gleicher Inhalt wie im Snapshot (mit uids)
+                return [export_reise_to_dict(r) for r in ReiseModel.select().order_by(ReiseModel.id)]
+
+            json_daten, json_enc = _zeit(lambda: json.dumps(export(), ensure_ascii=False, indent=2).encode("utf-8"))
+            _, json_dec = _zeit(lambda: json.loads(json_daten))
+            zlib_daten, zlib_enc = _zeit(
+                lambda: zlib.compress(json.dumps(export(), ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+            )
+            _, zlib_dec = _zeit(lambda: json.loads(zlib.decompress(zlib_daten)))
+            snap, snap_enc = _zeit(snapshot_erstellen)
+            _, snap_dec = _zeit(lambda: snapshot_laden(snap))
+        db.close()
+
+    print(f"{anzahl_reisen} Reisen, {items} Gegenstände (seed {seed})")
+    for titel, daten, enc, dec in (
+        ("JSON (indent=2)", json_daten, json_enc, json_dec),
+        ("JSON + zlib    ", zlib_daten, zlib_enc, zlib_dec),
+        ("Snapshot       ", snap, snap_enc, snap_dec),
+    ):
+        print(f"{titel}: {len(daten) / 1024:9.1f} KiB  encode {enc * 1000:7.1f} ms  decode {dec * 1000:6.1f} ms")
+    print(f"Snapshot gegenüber JSON + zlib: {len(zlib_daten) / len(snap):.2f}x kleiner")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1,
+    )
@@ -0,0 +1,90 @@
+"""Vergleicht Startzeit und Speicherbedarf von Entwicklungs- und Produktionsmodus.
+
+Startet main.py jeweils in einem leeren Arbeitsverzeichnis (eigene app.db),
+misst die Zeit bis GET / mit 200 antwortet und summiert danach den RSS aller
+Prozesse des Prozessbaums (Reload-Supervisor + Worker im Dev-Modus).
+Nur unter Linux (liest /proc).
+
+    python Benchmarks/startvergleich.py
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _kinder(pid: int) -> list:
+    kinder = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            kinder += [int(p) for p in (task / "children").read_text().split()]
+        except OSError:
+            pass
+    return kinder
+
+
+def _rss_baum_mb(pid: int) -> float:
+    gesamt_kb = 0
+    offen = [pid]
+    while offen:
+        p = offen.pop()
+        try:
+            for zeile in Path(f"/proc/{p}/status").read_text().splitlines():
+                if zeile.startswith("VmRSS:"):
+                    gesamt_kb += int(zeile.split()[1])
+        except OSError:
+            continue
+        offen += _kinder(p)
+    return gesamt_kb / 1024
+
+
+def messen(modus: str, port: int, timeout: float = 60.0) -> dict:
+    env = dict(os.environ, PACKATTACK_PORT=str(port), NICEGUI_STORAGE_SECRET="x" * 32)
+    args = [sys.executable, str(ROOT / "main.py")]
+    if modus == "prod":
+        args.append("--prod")
+    else:
+        # Dev-Modus hört fest auf 8080; Browser nicht öffnen
+        env["BROWSER"] = "true"
+        port = 8080
+
+    with TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(
+            args, cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        try:
+            while True:
+                if time.perf_counter() - t0 > timeout:
+                    raise TimeoutError(f"{modus}: Server antwortet nicht")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as resp:
+                        if resp.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.05)
+            startzeit = time.perf_counter() - t0
+            # Erster Seitenaufruf ist durch, Speicher kurz setzen lassen
+            time.sleep(1.0)
+            rss = _rss_baum_mb(proc.pid)
+            prozesse = 1 + len(_kinder(proc.pid))
+        finally:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait(timeout=10)
+    return {"modus": modus, "startzeit_s": startzeit, "rss_mb": rss, "prozesse": prozesse}
+
+
+if __name__ == "__main__":
+    for ergebnis in (messen("dev", 8080), messen("prod", 8090)):
+        print(
+            f"{ergebnis['modus']:>4}: Start bis erste Antwort {ergebnis['startzeit_s']:.2f} s, "
+            f"RSS {ergebnis['rss_mb']:.0f} MB, {ergebnis['prozesse']} Prozess(e) (direkt)"
+        )
@@ -0,0 +1,89 @@
+"""Misst Abfragezeiten der Statistik und den Mehraufwand der Trigger beim Schreiben.
+
+Legt in einer temporären SQLite-Datei viele Reisen aus den Vorlagen an, einmal
+ohne und einmal mit Statistik-Triggern, und vergleicht danach die Abfragen auf
+den Aggregat-Tabellen mit einem GROUP BY direkt über alle Items. Ist NumPy
+installiert, wird außerdem fortschritt_auswerten() mit einer Schleife über
+fortschritt_berechnen() verglichen.
+
+    python Benchmarks/statistik_messung.py [anzahl_reisen]
+"""
+
+import importlib.util
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from peewee import SqliteDatabase  # noqa: E402
+
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel  # noqa: E402
+from main import lade_vorlagen, reise_anlegen  # noqa: E402
+from statistik import (  # noqa: E402
+    MODELLE,
+    fortschritt_auswerten,
+    fortschritt_pro_ziel,
+    haeufigste_gegenstaende,
+    oft_vergessen,
+    statistik_einrichten,
+)
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel] + MODELLE
+ZIELE = ["Rom", "Oslo", "Nizza", "Zermatt", "Berlin"]
+
+
+def _anlegen(anzahl_reisen: int, mit_triggern: bool) -> float:
+    vorlagen = lade_vorlagen()
+    with TemporaryDirectory() as tmp:
+        db = SqliteDatabase(str(Path(tmp) / "bench.db"), pragmas={"foreign_keys": 1})
+        with db.bind_ctx(MODELS):
+            db.create_tables(MODELS)
+            if mit_triggern:
+                statistik_einrichten()
+            t = time.perf_counter()
+            with db.atomic():
+                for i in range(anzahl_reisen):
+                    reise_anlegen(f"R{i}", ZIELE[i % len(ZIELE)], date(2024, 1, 1), date(2024, 1, 5),
+                                  vorlage=vorlagen[i % len(vorlagen)])
+            dauer = time.perf_counter() - t
+            if mit_triggern:
+                _abfragen(db)
+        db.close()
+    return dauer
+
+
+def _ms(fn, wiederholungen=20):
+    t = time.perf_counter()
+    for _ in range(wiederholungen):
+        fn()
+    return (time.perf_counter() - t) / wiederholungen * 1000
+
+
+def _abfragen(db):
+    GegenstandModel.update(gepackt=True).where(GegenstandModel.id % 3 != 0).execute()
+    items = GegenstandModel.select().count()
+    direkt = """
+        SELECT r.vorlage_id, g.name, COUNT(*), SUM(g.gepackt)
+        FROM gegenstaende g JOIN kategorien k ON k.id = g.kategorie_id JOIN reisen r ON r.id = k.reise_id
+        WHERE r.geloescht = 0 GROUP BY 1, 2
+    """
+    print(f"{items} Items")
+    print(f"  GROUP BY über alle Items:  {_ms(lambda: db.execute_sql(direkt).fetchall(), 5):8.2f} ms")
+    print(f"  haeufigste_gegenstaende(): {_ms(haeufigste_gegenstaende):8.2f} ms")
+    print(f"  oft_vergessen():           {_ms(oft_vergessen):8.2f} ms")
+    print(f"  fortschritt_pro_ziel():    {_ms(fortschritt_pro_ziel):8.2f} ms")
+    if importlib.util.find_spec("numpy") is not None:
+        schleife = _ms(lambda: [r.fortschritt_berechnen() for r in ReiseModel.aktive()], 1)
+        print(f"  fortschritt_berechnen() je Reise: {schleife:8.1f} ms")
+        print(f"  fortschritt_auswerten() (NumPy):  {_ms(fortschritt_auswerten, 5):8.1f} ms")
+
+
+if __name__ == "__main__":
+    anzahl = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ohne = _anlegen(anzahl, False)
+    mit = _anlegen(anzahl, True)
+    print(f"Anlegen von {anzahl} Reisen: ohne Trigger {ohne:.2f} s, mit Triggern {mit:.2f} s")
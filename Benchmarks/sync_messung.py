@@ -0,0 +1,74 @@
+"""Misst den Abgleich zwischen zwei Instanzen: erster Abgleich gegen Nachzügler.
+
+Legt zwei temporäre SQLite-Dateien an ("heim" und "laptop"), füllt "heim" mit
+vielen Reisen aus den Vorlagen und gleicht einmal komplett ab. Danach werden
+einige Items gepackt und erneut abgeglichen: übertragen und geschrieben werden
+nur die geänderten Items, die Dauer hängt nicht von der Anzahl Reisen ab.
+
+    python Benchmarks/sync_messung.py [anzahl_reisen] [anzahl_aenderungen]
+"""
+
+import json
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from peewee import SqliteDatabase  # noqa: E402
+
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel  # noqa: E402
+from main import lade_vorlagen, reise_anlegen  # noqa: E402
+from sync import MODELLE, aenderungen_seit, aktueller_stand, aus_datei, sync_einrichten, synchronisieren  # noqa: E402
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel] + MODELLE
+
+
+def _abgleichen(laptop, heim_pfad) -> tuple:
+    with laptop.bind_ctx(MODELS):
+        t = time.perf_counter()
+        ergebnis = synchronisieren("heim", aus_datei(heim_pfad))
+        return time.perf_counter() - t, ergebnis
+
+
+def main(anzahl_reisen: int, anzahl_aenderungen: int):
+    vorlagen = lade_vorlagen()
+    with TemporaryDirectory() as tmp:
+        heim_pfad = Path(tmp) / "heim.db"
+        heim = SqliteDatabase(str(heim_pfad), pragmas={"foreign_keys": 1})
+        laptop = SqliteDatabase(str(Path(tmp) / "laptop.db"), pragmas={"foreign_keys": 1})
+        for db in (heim, laptop):
+            with db.bind_ctx(MODELS):
+                db.create_tables(MODELS)
+                sync_einrichten()
+
+        with heim.bind_ctx(MODELS):
+            with heim.atomic():
+                for i in range(anzahl_reisen):
+                    reise_anlegen(f"R{i}", "", date(2024, 1, 1), date(2024, 1, 5), vorlage=vorlagen[i % len(vorlagen)])
+            anzahl_items = GegenstandModel.select().count()
+        voll, _ = _abgleichen(laptop, heim_pfad)
+
+        with heim.bind_ctx(MODELS):
+            stand = aktueller_stand()
+            ids = [g.id for g in GegenstandModel.select(GegenstandModel.id).order_by(GegenstandModel.id).limit(anzahl_aenderungen)]
+            GegenstandModel.update(gepackt=True).where(GegenstandModel.id.in_(ids)).execute()
+            groesse = len(json.dumps(aenderungen_seit(stand)).encode("utf-8"))
+        delta, ergebnis = _abgleichen(laptop, heim_pfad)
+        heim.close()
+        laptop.close()
+
+    print(f"{anzahl_reisen} Reisen, {anzahl_items} Items")
+    print(f"  Erster Abgleich:                      {voll * 1000:8.1f} ms")
+    print(f"  Abgleich nach {anzahl_aenderungen:4d} Änderungen:       {delta * 1000:8.1f} ms"
+          f"  ({ergebnis['aktualisiert']} Reisen, {groesse} Bytes)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+    )
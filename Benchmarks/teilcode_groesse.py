@@ -0,0 +1,57 @@
+"""Vergleicht die Größe des Teilen-Codes mit dem bisherigen JSON-Export.
+
+Legt für jede mitgelieferte Vorlage eine Reise an (plus eine große Reise mit
+eigenen Items) und vergleicht json.dumps(indent=2), minifiziertes JSON,
+zlib ohne Wörterbuch und den Teilen-Code (zlib mit Wörterbuch + Base85).
+
+    python Benchmarks/teilcode_groesse.py
+"""
+
+import base64
+import json
+import sys
+import zlib
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from peewee import SqliteDatabase  # noqa: E402
+
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel  # noqa: E402
+from main import export_reise_to_dict, lade_vorlagen, reise_anlegen  # noqa: E402
+from teilcode import teilcode_erstellen  # noqa: E402
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+
+
+def _groessen(daten: dict) -> tuple:
+    lesbar = json.dumps(daten, ensure_ascii=False, indent=2).encode("utf-8")
+    minifiziert = json.dumps(daten, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    ohne_woerterbuch = base64.b85encode(zlib.compress(minifiziert, 9))
+    return len(lesbar), len(minifiziert), len(ohne_woerterbuch), len(teilcode_erstellen(daten).encode("utf-8"))
+
+
+def main():
+    db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+    with db.bind_ctx(MODELS):
+        db.create_tables(MODELS)
+        reisen = [
+            reise_anlegen(v["name"], "Ziel", date(2024, 7, 1), date(2024, 7, 7), vorlage=v) for v in lade_vorlagen()
+        ]
+        gross = reise_anlegen("Weltreise", "Welt", date(2024, 1, 1), date(2024, 3, 31), vorlage=lade_vorlagen()[0])
+        for k in range(10):
+            kat = KategorieModel.create(name=f"Etappe {k}", reise=gross)
+            for i in range(20):
+                GegenstandModel.create(name=f"Souvenir {k}-{i}", menge=1, kategorie=kat)
+        reisen.append(gross)
+
+        print(f"{'Reise':20s} {'indent=2':>9s} {'minifiz.':>9s} {'zlib+b85':>9s} {'Teilcode':>9s}")
+        for r in reisen:
+            lesbar, minifiziert, ohne, code = _groessen(export_reise_to_dict(r))
+            print(f"{r.name[:20]:20s} {lesbar:9d} {minifiziert:9d} {ohne:9d} {code:9d}  ({code / lesbar:.0%})")
+
+
+if __name__ == "__main__":
+    main()
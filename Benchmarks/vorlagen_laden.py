@@ -0,0 +1,74 @@
+"""Vergleicht das Laden einer großen vorlagen.json mit dem Vorlagen-Verzeichnis.
+
+Erzeugt viele Vorlagen (aus den Bausteinen der mitgelieferten vorlagen.json) und misst:
+  - Einlesen und Auflösen der kompletten Datei (bisher bei jedem Start/Änderung)
+  - Index lesen (Auswahlliste) + eine einzelne Vorlage bei Auswahl laden
+
+    python Benchmarks/vorlagen_laden.py [anzahl_vorlagen]
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from vorlagen import VorlagenVerzeichnis, verzeichnis_aus_datei, vorlagen_aufloesen  # noqa: E402
+
+
+def _zeit(fn, wiederholungen=5):
+    beste = None
+    for _ in range(wiederholungen):
+        t = time.perf_counter()
+        fn()
+        dauer = time.perf_counter() - t
+        beste = dauer if beste is None else min(beste, dauer)
+    return beste
+
+
+def _datei_laden(datei: Path):
+    daten = json.loads(datei.read_text(encoding="utf-8"))
+    return vorlagen_aufloesen(daten["vorlagen"], daten.get("bausteine", []))
+
+
+def main(anzahl: int):
+    basis = json.loads((ROOT / "vorlagen.json").read_text(encoding="utf-8"))
+    vorlagen = []
+    for i in range(anzahl):
+        v = dict(basis["vorlagen"][i % len(basis["vorlagen"])])
+        v["id"] = f"{v['id']}-{i}"
+        v["name"] = f"{v['name']} {i}"
+        v["kategorien"] = v["kategorien"] + [
+            {"name": f"Extra {k}", "gegenstaende": [{"name": f"Item {k}-{n}", "menge": 1} for n in range(20)]}
+            for k in range(5)
+        ]
+        vorlagen.append(v)
+
+    with TemporaryDirectory() as tmp:
+        datei = Path(tmp) / "vorlagen.json"
+        datei.write_text(json.dumps({"bausteine": basis["bausteine"], "vorlagen": vorlagen}), encoding="utf-8")
+        verzeichnis = Path(tmp) / "bibliothek"
+        verzeichnis_aus_datei(datei, verzeichnis)
+        gesucht = vorlagen[anzahl // 2]["id"]
+
+        komplett = _zeit(lambda: _datei_laden(datei))
+
+        # Jede Messung mit frischem Objekt, damit der Cache nicht mitzählt
+        def auswahl():
+            vz = VorlagenVerzeichnis(verzeichnis)
+            vz.koepfe()
+            vz.laden(gesucht)
+
+        verzeichnis_zeit = _zeit(auswahl)
+        groesse = datei.stat().st_size
+
+    print(f"{anzahl} Vorlagen, vorlagen.json {groesse / 1024:.0f} KiB")
+    print(f"  Datei komplett laden + auflösen:   {komplett * 1000:8.1f} ms")
+    print(f"  Index + eine Vorlage laden:        {verzeichnis_zeit * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -1,14 +1,47 @@
 from datetime import date
-from typing import List
+from typing import List, Optional, Tuple
 import json
+import logging
+import os
 from pathlib import Path
 
+log = logging.getLogger(__name__)
+
 
 class Gegenstand:  # Repräsentiert einen einzelnen Gegenstand, der eingepackt werden soll.
+    # kein __dict__ pro Objekt, spart Speicher bei vielen Items
+    __slots__ = ("_name", "menge", "_gepackt", "_kategorie", "_position")
+
     def __init__(self, name: str, menge: int = 1, gepackt: bool = False):
-        self.name = name
+        self._name = name
         self.menge = menge
-        self.gepackt = gepackt
+        self._gepackt = bool(gepackt)
+        self._kategorie: Optional["Kategorie"] = None  # wird von gegenstand_hinzufuegen gesetzt
+        self._position = 0  # Stelle in kategorie.gegenstaende, für das Journal
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, wert: str):  # Hält den Namens-Index der Reise aktuell
+        alt, self._name = self._name, wert
+        reise = self._kategorie._reise if self._kategorie is not None else None
+        if reise is not None and alt != wert:
+            reise._gegenstand_austragen(self, alt)
+            reise._nach_name.setdefault(wert, []).append(self)
+
+    @property
+    def gepackt(self) -> bool:
+        return self._gepackt
+
+    @gepackt.setter
+    def gepackt(self, wert: bool):  # Hält die Zähler von Kategorie und Reise aktuell
+        wert = bool(wert)
+        if wert != self._gepackt:
+            self._gepackt = wert
+            if self._kategorie is not None:
+                self._kategorie._gepackt_zaehlen(1 if wert else -1)
 
     def als_gepackt_markieren(self):  # Markiert den Gegenstand als gepackt.
         self.gepackt = True
@@ -19,19 +52,35 @@ class Gegenstand:  # Repräsentiert einen einzelnen Gegenstand, der eingepackt w
 
 
 class Kategorie:  # Fasst mehrere Gegenstände einer bestimmten Art zusammen (z. B. Kleidung, Technik)
+    __slots__ = ("name", "gegenstaende", "_gepackt", "_reise", "_position")
+
     def __init__(self, name: str):
         self.name = name
         self.gegenstaende: List[Gegenstand] = []
+        self._gepackt = 0  # Anzahl gepackter Gegenstände, laufend mitgezählt
+        self._reise: Optional["Reise"] = None
+        self._position = 0  # Stelle in reise.kategorien, für das Journal
 
     def gegenstand_hinzufuegen(
         self, gegenstand: Gegenstand
     ):  # Fügt der Kategorie einen neuen Gegenstand hinzu
+        gegenstand._position = len(self.gegenstaende)
         self.gegenstaende.append(gegenstand)
+        gegenstand._kategorie = self
+        if self._reise is not None:
+            self._reise._gegenstand_eintragen(gegenstand)
+        if gegenstand.gepackt:
+            self._gepackt_zaehlen(1)
+
+    def _gepackt_zaehlen(self, differenz: int):
+        self._gepackt += differenz
+        if self._reise is not None:
+            self._reise._gepackt += differenz
 
     def anzahl_gepackt(
         self,
-    ) -> int:  # Zählt, wie viele Gegenstände in dieser Kategorie gepackt sind
-        return sum(1 for g in self.gegenstaende if g.gepackt)
+    ) -> int:  # Anzahl gepackter Gegenstände in dieser Kategorie (O(1) über den Zähler)
+        return self._gepackt
 
     def anzahl_gesamt(
         self,
@@ -43,6 +92,8 @@ class Kategorie:  # Fasst mehrere Gegenstände einer bestimmten Art zusammen (z.
 
 
 class Reise:  # Repräsentiert eine Reise mit verschiedenen Kategorien und Gegenständen
+    __slots__ = ("name", "startdatum", "enddatum", "beschreibung", "kategorien", "_gesamt", "_gepackt", "_nach_name")
+
     def __init__(
         self, name: str, startdatum: date, enddatum: date, beschreibung: str = ""
     ):
@@ -51,44 +102,250 @@ class Reise:  # Repräsentiert eine Reise mit verschiedenen Kategorien und Gegen
         self.enddatum = enddatum
         self.beschreibung = beschreibung
         self.kategorien: List[Kategorie] = []
+        # Laufende Zähler und Index Name -> Gegenstände, statt bei jeder Abfrage alles zu durchlaufen
+        self._gesamt = 0
+        self._gepackt = 0
+        self._nach_name: dict = {}
 
     def kategorie_hinzufuegen(
         self, kategorie: Kategorie
     ):  # Fügt der Reise eine neue Kategorie hinzu
+        kategorie._position = len(self.kategorien)
         self.kategorien.append(kategorie)
+        kategorie._reise = self
+        for g in kategorie.gegenstaende:
+            self._gegenstand_eintragen(g)
+        self._gepackt += kategorie._gepackt
+
+    def _gegenstand_eintragen(self, gegenstand: Gegenstand):
+        self._gesamt += 1
+        self._nach_name.setdefault(gegenstand.name, []).append(gegenstand)
+
+    def _gegenstand_austragen(self, gegenstand: Gegenstand, name: str):
+        gleichnamige = self._nach_name[name]
+        gleichnamige.remove(gegenstand)
+        if not gleichnamige:
+            del self._nach_name[name]
+
+    def _neu_aufbauen(self):  # Zähler, Positionen und Namens-Index nach direkten Änderungen an den Listen neu berechnen
+        self._gesamt = 0
+        self._gepackt = 0
+        self._nach_name = {}
+        for k_pos, kategorie in enumerate(self.kategorien):
+            kategorie._position = k_pos
+            kategorie._reise = self
+            kategorie._gepackt = 0
+            for g_pos, gegenstand in enumerate(kategorie.gegenstaende):
+                gegenstand._position = g_pos
+                gegenstand._kategorie = kategorie
+                kategorie._gepackt += int(gegenstand.gepackt)
+                self._gegenstand_eintragen(gegenstand)
+            self._gepackt += kategorie._gepackt
+
+    def gegenstaende_finden(self, name: str) -> List[Gegenstand]:  # Alle Gegenstände mit diesem Namen
+        return list(self._nach_name.get(name, ()))
 
     def fortschritt_berechnen(
         self,
-    ) -> float:  # Berechnet den Packfortschritt in Prozent
-        alle_gegenstaende = [g for k in self.kategorien for g in k.gegenstaende]
-        if not alle_gegenstaende:
+    ) -> float:  # Berechnet den Packfortschritt in Prozent (O(1) über die Zähler)
+        if not self._gesamt:
             return 0.0
-        gepackt = sum(1 for g in alle_gegenstaende if g.gepackt)
-        return round((gepackt / len(alle_gegenstaende)) * 100, 2)
+        return round((self._gepackt / self._gesamt) * 100, 2)
 
     def __repr__(self):
         return f"Reise({self.name}, {len(self.kategorien)} Kategorien, {self.fortschritt_berechnen()}% gepackt)"
 
 
 class ReiseManager:
-    def __init__(self, dateipfad: str = "reisen.json"):
+    # Persistenz: reisen.json ist der Snapshot (Stand nach Kompaktierung), jede
+    # Änderung danach wird als eine Zeile an reisen.json.journal angehängt.
+    # Speichern kostet so nur die Änderung statt aller Reisen; beim Start wird
+    # der Snapshot gelesen und nur das Journal-Ende nachgespielt.
+    # Jede Reise bekommt beim Eintragen eine feste Nummer, über die das Journal
+    # sie anspricht; Löschen verschiebt so keine anderen Reisen.
+    def __init__(self, dateipfad: str = "reisen.json", kompaktieren_ab: int = 500):
         self.dateipfad = Path(dateipfad)
-        self.reisen: list[Reise] = []
+        self.journalpfad = self.dateipfad.with_name(self.dateipfad.name + ".journal")
+        self.kompaktieren_ab = kompaktieren_ab  # Journal-Einträge bis zur automatischen Kompaktierung
+        self._reisen: dict = {}  # Nummer -> Reise, in Einfüge-Reihenfolge
+        # Indizes statt linearer Suche: Name -> Reisen und id(Reise) -> [Nummer, Name beim Eintragen]
+        self._nach_name: dict = {}
+        self._eintraege: dict = {}
+        self._naechste_nr = 1
+        self._stand = 0  # Nummer des letzten Journal-Eintrags
+        self._journal_eintraege = 0  # Einträge seit dem letzten Snapshot
         self.laden()
 
+    @property
+    def reisen(self) -> Tuple[Reise, ...]:  # Alle Reisen in Einfüge-Reihenfolge (nur lesen, neue über reise_hinzufuegen)
+        return tuple(self._reisen.values())
+
     # Laden und Speichern
     def laden(self):
-        if not self.dateipfad.exists():
-            self.reisen = []
+        self._reisen = {}
+        self._nach_name = {}
+        self._eintraege = {}
+        self._naechste_nr = 1
+        self._stand = 0
+        self._journal_eintraege = 0
+        if self.dateipfad.exists():
+            with open(self.dateipfad, "r", encoding="utf-8") as f:
+                daten = json.load(f)
+            if isinstance(daten, list):  # altes Format ohne Journal-Stand
+                daten = {"stand": 0, "reisen": daten}
+            self._stand = daten["stand"]
+            for r in daten["reisen"]:
+                self._anhaengen(self._reise_aus_dict(r), r.get("reise_nr"))
+        self._journal_nachspielen()
+
+    # Spielt alle Journal-Einträge nach dem Snapshot-Stand ab
+    def _journal_nachspielen(self):
+        if not self.journalpfad.exists():
             return
-        with open(self.dateipfad, "r", encoding="utf-8") as f:
-            daten = json.load(f)
-        self.reisen = [self._reise_aus_dict(r) for r in daten]
+        gueltig = 0  # Byte-Offset hinter dem letzten vollständigen Eintrag
+        with open(self.journalpfad, "rb") as f:
+            for zeile in f:
+                try:
+                    if not zeile.endswith(b"\n"):
+                        raise ValueError("Zeilenende fehlt")
+                    eintrag = json.loads(zeile)
+                except ValueError:
+                    break  # unvollständig geschriebene letzte Zeile (Absturz beim Speichern)
+                gueltig += len(zeile)
+                if eintrag["nr"] <= self._stand:
+                    continue  # bereits im Snapshot enthalten
+                self._anwenden(eintrag)
+                self._stand = eintrag["nr"]
+                self._journal_eintraege += 1
+        # Den Rest abschneiden, sonst landen neue Einträge hinter der kaputten
+        # Zeile und werden beim nächsten Laden nicht mehr gelesen
+        if gueltig < self.journalpfad.stat().st_size:
+            with open(self.journalpfad, "r+b") as f:
+                f.truncate(gueltig)
 
-    def speichern(self):
-        daten = [self._reise_zu_dict(r) for r in self.reisen]
-        with open(self.dateipfad, "w", encoding="utf-8") as f:
+    # Führt einen Journal-Eintrag auf den Reisen im Speicher aus
+    def _anwenden(self, eintrag: dict):
+        op = eintrag["op"]
+        if op == "reise_hinzufuegen":
+            self._anhaengen(self._reise_aus_dict(eintrag["reise"]), eintrag.get("reise_nr"))
+        elif op == "reise_ersetzen":
+            self._ersetzen(eintrag["reise_nr"], self._reise_aus_dict(eintrag["reise"]))
+        elif op == "reise_entfernen":
+            self._loeschen(eintrag["reise_nr"])
+        elif op == "gepackt":
+            gegenstand = self._gegenstand_an(eintrag["reise_nr"], eintrag["kategorie"], eintrag["gegenstand"])
+            if gegenstand is None:
+                log.warning("Journal-Eintrag %s übersprungen: kein Gegenstand an dieser Stelle", eintrag["nr"])
+                return
+            gegenstand.gepackt = eintrag["wert"]
+        else:
+            raise ValueError(f"Unbekannter Journal-Eintrag: {op}")
+
+    # Gegenstand an einer Journal-Position (None, wenn es sie nicht gibt)
+    def _gegenstand_an(self, nr: int, k_pos: int, g_pos: int) -> Optional[Gegenstand]:
+        reise = self._reisen.get(nr)
+        if reise is None or not 0 <= k_pos < len(reise.kategorien):
+            return None
+        gegenstaende = reise.kategorien[k_pos].gegenstaende
+        return gegenstaende[g_pos] if 0 <= g_pos < len(gegenstaende) else None
+
+    # Hängt eine Änderung an das Journal an und kompaktiert bei Bedarf
+    def _protokollieren(self, op: str, **daten):
+        self._stand += 1
+        zeile = json.dumps({"nr": self._stand, "op": op, **daten}, ensure_ascii=False, separators=(",", ":"))
+        with open(self.journalpfad, "a", encoding="utf-8") as f:
+            f.write(zeile + "\n")
+        self._journal_eintraege += 1
+        if self._journal_eintraege >= self.kompaktieren_ab:
+            self.kompaktieren()
+
+    # Schreibt alle Reisen als neuen Snapshot (über eine Temp-Datei und atomares
+    # Umbenennen) und leert danach das Journal
+    def kompaktieren(self):
+        daten = {
+            "stand": self._stand,
+            "reisen": [dict(self._reise_zu_dict(r), reise_nr=nr) for nr, r in self._reisen.items()],
+        }
+        tmp = self.dateipfad.with_name(self.dateipfad.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
             json.dump(daten, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.dateipfad)
+        # Stürzt das Programm vor dem Leeren ab, überspringt laden() die Einträge über "stand"
+        self.journalpfad.unlink(missing_ok=True)
+        self._journal_eintraege = 0
+
+    # Schreibt den kompletten Stand (für direkt an den Objekten vorgenommene Änderungen)
+    def speichern(self):
+        for reise in self._reisen.values():
+            reise._neu_aufbauen()
+        self.kompaktieren()
+
+    # Änderungen (jeweils sofort im Journal gespeichert)
+    def reise_hinzufuegen(self, reise: Reise):
+        nr = self._anhaengen(reise)
+        self._protokollieren("reise_hinzufuegen", reise_nr=nr, reise=self._reise_zu_dict(reise))
+
+    def reise_aktualisieren(self, reise: Reise):  # Nach Änderungen an einer einzelnen Reise aufrufen
+        nr = self._nr(reise)
+        reise._neu_aufbauen()  # Listen könnten direkt bearbeitet worden sein
+        self._ersetzen(nr, reise)  # Name könnte sich geändert haben
+        self._protokollieren("reise_ersetzen", reise_nr=nr, reise=self._reise_zu_dict(reise))
+
+    def reise_entfernen(self, reise: Reise):
+        nr = self._nr(reise)
+        self._loeschen(nr)
+        self._protokollieren("reise_entfernen", reise_nr=nr)
+
+    def gegenstand_gepackt_setzen(self, reise: Reise, gegenstand: Gegenstand, gepackt: bool = True):
+        kategorie = gegenstand._kategorie
+        if kategorie is None or kategorie._reise is not reise:
+            raise ValueError(f"{gegenstand.name} gehört nicht zur Reise {reise.name}")
+        gegenstand.gepackt = gepackt
+        self._protokollieren(
+            "gepackt",
+            reise_nr=self._nr(reise),
+            kategorie=kategorie._position,
+            gegenstand=gegenstand._position,
+            wert=gepackt,
+        )
+
+    def reise_finden(self, name: str) -> Optional[Reise]:  # Erste Reise mit diesem Namen (O(1))
+        reisen = self._nach_name.get(name)
+        return reisen[0] if reisen else None
+
+    # Pflege der Indizes (alle Änderungen an self._reisen laufen hierüber)
+    def _nr(self, reise: Reise) -> int:
+        eintrag = self._eintraege.get(id(reise))
+        if eintrag is None:
+            raise ValueError(f"Reise {reise.name} wird nicht verwaltet")
+        return eintrag[0]
+
+    def _anhaengen(self, reise: Reise, nr: Optional[int] = None) -> int:
+        if nr is None:
+            nr = self._naechste_nr
+        self._naechste_nr = max(self._naechste_nr, nr + 1)
+        self._eintraege[id(reise)] = [nr, reise.name]
+        self._nach_name.setdefault(reise.name, []).append(reise)
+        self._reisen[nr] = reise
+        return nr
+
+    def _austragen(self, reise: Reise):
+        _, name = self._eintraege.pop(id(reise))
+        gleichnamige = self._nach_name[name]
+        gleichnamige.remove(reise)
+        if not gleichnamige:
+            del self._nach_name[name]
+
+    def _ersetzen(self, nr: int, reise: Reise):
+        self._austragen(self._reisen[nr])
+        self._eintraege[id(reise)] = [nr, reise.name]
+        self._nach_name.setdefault(reise.name, []).append(reise)
+        self._reisen[nr] = reise  # bleibt an seiner Stelle in der Reihenfolge
+
+    def _loeschen(self, nr: int):
+        self._austragen(self._reisen.pop(nr))
 
     def _reise_zu_dict(self, reise: Reise) -> dict:
         """Wandelt ein Reise-Objekt in ein serialisierbares Dictionary um."""
@@ -0,0 +1,312 @@
+import sys
+import importlib.util
+import unittest
+from pathlib import Path
+from datetime import date
+from tempfile import TemporaryDirectory
+from unittest import mock
+from peewee import SqliteDatabase
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+NICEGUI_AVAILABLE = importlib.util.find_spec("nicegui") is not None
+if NICEGUI_AVAILABLE:
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from starlette.middleware.gzip import GZipMiddleware
+    import main
+    from main import api
+else:
+    raise unittest.SkipTest("NiceGUI not installed; skipping PackAttack tests.")
+
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel, reise_hashes  # noqa: E402
+from cache import reise_cache  # noqa: E402
+from statistik import MODELLE as STATISTIK_MODELLE, statistik_einrichten  # noqa: E402
+from vorlagen import MODELLE as VORLAGEN_MODELLE  # noqa: E402
+from sync import MODELLE as SYNC_MODELLE, sync_einrichten  # noqa: E402
+
+
+MODELS = (
+    [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+    + STATISTIK_MODELLE
+    + VORLAGEN_MODELLE
+    + SYNC_MODELLE
+)
+
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        # Datei-DB statt :memory:, da FastAPI Sync-Endpunkte in Worker-Threads ausführt
+        self._tmp = TemporaryDirectory()
+        self.db = SqliteDatabase(str(Path(self._tmp.name) / "test.db"), pragmas={"foreign_keys": 1})
+        self._ctx = self.db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        self.db.create_tables(MODELS)
+        statistik_einrichten()
+        reise_cache.leeren()
+        main.vorlagen_index.leeren()
+
+        app = FastAPI()
+        app.add_middleware(GZipMiddleware, minimum_size=500)
+        app.include_router(api)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.db.close()
+        self._ctx.__exit__(None, None, None)
+        reise_cache.leeren()
+        main.vorlagen_index.leeren()
+        self._tmp.cleanup()
+
+    def _reise(self, name="Trip", items=3) -> ReiseModel:
+        r = ReiseModel.create(name=name, ziel="Z", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 3))
+        kat = KategorieModel.create(name="K", reise=r)
+        for i in range(items):
+            GegenstandModel.create(name=f"G{i}", kategorie=kat, gepackt=(i == 0))
+        return r
+
+    def test_liste_mit_fortschritt_und_paginierung(self):
+        for i in range(5):
+            self._reise(f"R{i}", items=4)
+        resp = self.client.get("/api/reisen", params={"seite": 2, "pro_seite": 2})
+        self.assertEqual(resp.status_code, 200)
+        daten = resp.json()
+        self.assertEqual(daten["anzahl"], 5)
+        self.assertEqual([r["name"] for r in daten["reisen"]], ["R2", "R3"])
+        self.assertEqual(daten["reisen"][0]["fortschritt"], 25)
+        self.assertEqual(daten["reisen"][0]["fortschritt_menge"], 25)
+
+    def test_etag_und_304(self):
+        r = self._reise()
+        resp = self.client.get(f"/api/reisen/{r.id}")
+        etag = resp.headers["etag"]
+        resp2 = self.client.get(f"/api/reisen/{r.id}", headers={"If-None-Match": etag})
+        self.assertEqual(resp2.status_code, 304)
+        self.assertEqual(resp2.content, b"")
+
+    def test_fremder_prozess_aendert_reise(self):
+        # Schreibt z.B. python sync.py direkt in die Datenbank, ist der Cache
+        # dieses Prozesses veraltet: die gespeicherte Revision entscheidet
+        r = self._reise()
+        resp = self.client.get(f"/api/reisen/{r.id}")
+        etag = resp.headers["etag"]
+        ReiseModel.update(ziel="Neu", revision=ReiseModel.revision + 1).where(ReiseModel.id == r.id).execute()
+
+        resp = self.client.get(f"/api/reisen/{r.id}", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["ziel"], "Neu")
+        self.assertNotEqual(resp.headers["etag"], etag)
+        self.assertEqual(
+            self.client.get(f"/api/reisen/{r.id}", headers={"If-None-Match": resp.headers["etag"]}).status_code, 304
+        )
+
+    def test_bulk_packen_aendert_etag(self):
+        r = self._reise()
+        ids = [g["id"] for g in self.client.get(f"/api/reisen/{r.id}").json()["kategorien"][0]["gegenstaende"]]
+        etag = self.client.get(f"/api/reisen/{r.id}").headers["etag"]
+
+        resp = self.client.post(f"/api/reisen/{r.id}/gegenstaende/packen", json={"ids": ids, "gepackt": True})
+        self.assertEqual(resp.json()["geaendert"], 3)
+
+        resp = self.client.get(f"/api/reisen/{r.id}", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["fortschritt"], 100)
+
+    def test_bulk_packen_ignoriert_fremde_items(self):
+        r1 = self._reise("A")
+        r2 = self._reise("B")
+        fremd = GegenstandModel.select().join(KategorieModel).where(KategorieModel.reise == r2.id).first()
+        resp = self.client.post(f"/api/reisen/{r1.id}/gegenstaende/packen", json={"ids": [fremd.id], "gepackt": False})
+        self.assertEqual(resp.json()["geaendert"], 0)
+
+    def test_bulk_kategorie_und_reset(self):
+        r = self._reise()
+        kat_id = KategorieModel.get(KategorieModel.reise == r.id).id
+        resp = self.client.post(f"/api/reisen/{r.id}/kategorien/{kat_id}/packen", json={"gepackt": True})
+        self.assertEqual(resp.json()["geaendert"], 2)
+        self.assertEqual(self.client.get(f"/api/reisen/{r.id}").json()["gepackt"], 3)
+
+        self.assertEqual(self.client.post(f"/api/reisen/{r.id}/zuruecksetzen").json()["geaendert"], 3)
+        self.client.post(f"/api/reisen/{r.id}/kategorien/{kat_id}/packen")
+        self.assertEqual(self.client.delete(f"/api/reisen/{r.id}/gegenstaende/gepackt").json()["geloescht"], 3)
+        self.assertEqual(self.client.get(f"/api/reisen/{r.id}").json()["gesamt"], 0)
+
+    def test_packmenge(self):
+        r = self._reise(items=1)
+        g = GegenstandModel.get()
+        g.menge = 4
+        g.save()
+        url = f"/api/reisen/{r.id}/gegenstaende/{g.id}/packmenge"
+        self.assertEqual(self.client.post(url, json={"anzahl": 1}).json(), {"menge": 4, "menge_gepackt": 1, "gepackt": False})
+        reise = self.client.get(f"/api/reisen/{r.id}").json()
+        self.assertEqual((reise["fortschritt"], reise["fortschritt_menge"]), (0, 25))
+        self.assertEqual(self.client.post(url, json={"anzahl": "x"}).status_code, 422)
+        self.assertEqual(self.client.post(f"/api/reisen/{r.id}/gegenstaende/9999/packmenge", json={"anzahl": 1}).status_code, 404)
+        with mock.patch("main.packmenge_setzen", return_value=None):
+            self.assertEqual(self.client.post(url, json={"anzahl": 1}).status_code, 404)
+
+    def test_duplizieren(self):
+        r = self._reise()
+        resp = self.client.post(f"/api/reisen/{r.id}/duplizieren", json={"name": "Kopie", "startdatum": "2025-01-01"})
+        self.assertEqual(resp.status_code, 201)
+        kopie = resp.json()
+        self.assertEqual((kopie["name"], kopie["enddatum"], kopie["gesamt"], kopie["gepackt"]), ("Kopie", "2025-01-03", 3, 0))
+        self.assertEqual(self.client.post(f"/api/reisen/{r.id}/duplizieren", json={"zuruecksetzen": False}).json()["gepackt"], 1)
+        self.assertEqual(self.client.post(f"/api/reisen/{r.id}/duplizieren", json={"enddatum": "2023-01-01"}).status_code, 422)
+        self.assertEqual(self.client.post("/api/reisen/9999/duplizieren").status_code, 404)
+
+    def test_anlegen_aus_vorlage(self):
+        resp = self.client.post(
+            "/api/reisen",
+            json={"name": "Strand", "startdatum": "2024-07-01", "enddatum": "2024-07-04", "vorlage_id": "strandurlaub-v1"},
+        )
+        self.assertEqual(resp.status_code, 201)
+        baum = resp.json()
+        self.assertGreater(baum["gesamt"], 0)
+        socken = [g for k in baum["kategorien"] for g in k["gegenstaende"] if g["name"] == "Socken"]
+        self.assertEqual(socken[0]["menge"], 4)
+
+    def test_anlegen_validierung(self):
+        self.assertEqual(self.client.post("/api/reisen", json={"name": ""}).status_code, 422)
+        resp = self.client.post("/api/reisen", json={"name": "X", "vorlage_id": "gibt-es-nicht"})
+        self.assertEqual(resp.status_code, 422)
+
+    def test_export_import_und_gzip(self):
+        r = self._reise(items=200)
+        resp = self.client.get(f"/api/reisen/{r.id}/export", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.headers.get("content-encoding"), "gzip")
+        export = resp.json()
+
+        # Dieselbe Reise erneut importiert: wird zusammengeführt, nichts zu tun
+        resp = self.client.post("/api/import", json=export)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["id"], r.id)
+        self.assertEqual(resp.json()["zusammengefuehrt"]["unveraendert"], 200)
+
+        # Delta gegenüber dem Stand des Empfängers: nur das geänderte Item
+        hashes = reise_hashes(r.id)
+        offen = GegenstandModel.get(GegenstandModel.gepackt == False)  # noqa: E712
+        self.client.post(f"/api/reisen/{r.id}/gegenstaende/packen", json={"ids": [offen.id], "gepackt": True})
+        delta = self.client.post(f"/api/reisen/{r.id}/delta", json={"hashes": hashes}).json()
+        self.assertEqual([g["uid"] for k in delta["kategorien"] for g in k["gegenstaende"]], [offen.uid])
+        self.assertEqual(self.client.post("/api/reisen/999/delta", json={}).status_code, 404)
+
+        # Fehlt im Import etwas, wird ohne ausdrückliches loeschen=true nichts gelöscht
+        leer = {**export, "kategorien": []}
+        resp = self.client.post("/api/import", json=leer)
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()["detail"]["vorschau"]["entfernt"], 200)
+        self.assertEqual(self.client.get(f"/api/reisen/{r.id}").json()["gesamt"], 200)
+        resp = self.client.post("/api/import?loeschen=true", json=leer)
+        self.assertEqual(resp.json()["zusammengefuehrt"]["entfernt"], 200)
+        self.assertEqual(self.client.get(f"/api/reisen/{r.id}").json()["gesamt"], 0)
+
+        # Ohne uid (z.B. Export einer älteren Version) entsteht eine neue Reise
+        del export["uid"]
+        resp = self.client.post("/api/import", json=export)
+        self.assertEqual(resp.status_code, 201)
+        neu = self.client.get(f"/api/reisen/{resp.json()['id']}").json()
+        self.assertEqual(neu["gesamt"], 200)
+        self.assertEqual(neu["gepackt"], 1)
+
+    def test_export_revision_etag_und_cache(self):
+        r = self._reise()
+        resp = self.client.get(f"/api/reisen/{r.id}/export")
+        etag, last_modified = resp.headers["etag"], resp.headers["last-modified"]
+
+        # Unveränderte Reise: nur Revisions-Lookup, kein erneutes Serialisieren
+        with mock.patch("main.export_reise_to_dict", wraps=main.export_reise_to_dict) as export:
+            self.assertEqual(
+                self.client.get(f"/api/reisen/{r.id}/export", headers={"If-None-Match": etag}).status_code, 304
+            )
+            self.assertEqual(
+                self.client.get(f"/api/reisen/{r.id}/export", headers={"If-Modified-Since": last_modified}).status_code,
+                304,
+            )
+            self.assertEqual(self.client.get(f"/api/reisen/{r.id}/export").status_code, 200)
+            self.assertEqual(export.call_count, 0)
+
+        # Änderung zählt die Revision hoch -> neuer ETag, neuer Export
+        main.reise_aendern(r.id, lambda: None)
+        resp = self.client.get(f"/api/reisen/{r.id}/export", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers["etag"], etag)
+
+    def test_if_modified_since_asctime(self):
+        # asctime ohne Zeitzone wird als UTC gelesen statt mit 500 abzubrechen
+        r = self._reise()
+        url = f"/api/reisen/{r.id}/export"
+        self.assertEqual(self.client.get(url, headers={"If-Modified-Since": "Sun Nov  6 08:49:37 2094"}).status_code, 304)
+        self.assertEqual(self.client.get(url, headers={"If-Modified-Since": "Sun Nov  6 08:49:37 1994"}).status_code, 200)
+        self.assertEqual(self.client.get(url, headers={"If-Modified-Since": "Sun, 06 Nov 2094 08:49:37 -0000"}).status_code, 304)
+
+    def test_aenderung_und_revision_in_einer_transaktion(self):
+        r = self._reise()
+        ids = [g.id for g in GegenstandModel.select()]
+        with mock.patch("main.revision_erhoehen", side_effect=RuntimeError("kaputt")):
+            with self.assertRaises(RuntimeError):
+                main.reise_aendern(r.id, lambda: main.gegenstaende_packen(r.id, ids, True))
+        # Ohne neue Revision bleibt auch der Schreibzugriff aus
+        self.assertEqual(GegenstandModel.select().where(GegenstandModel.gepackt).count(), 1)
+        self.assertEqual(ReiseModel.get_by_id(r.id).revision, 0)
+
+    def test_eigene_vorlage(self):
+        r = self._reise()
+        etag = self.client.get("/api/vorlagen").headers["etag"]
+        resp = self.client.post(f"/api/reisen/{r.id}/als-vorlage", json={"name": "Meine"})
+        self.assertEqual(resp.status_code, 201)
+        vorlage_id = resp.json()["id"]
+
+        resp = self.client.get("/api/vorlagen", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn({"id": vorlage_id, "name": "Meine", "eigene": True}, resp.json())
+        neu = self.client.post("/api/reisen", json={"name": "Neu", "vorlage_id": vorlage_id}).json()
+        self.assertEqual((neu["gesamt"], neu["gepackt"]), (3, 0))
+
+        self.assertEqual(self.client.delete(f"/api/vorlagen/{vorlage_id}").status_code, 200)
+        self.assertEqual(self.client.delete(f"/api/vorlagen/{vorlage_id}").status_code, 404)
+        self.assertEqual(self.client.delete("/api/vorlagen/strandurlaub-v1").status_code, 404)
+        self.assertEqual(self.client.post("/api/reisen/9999/als-vorlage").status_code, 404)
+
+    def test_vorlagen_etag(self):
+        etag = self.client.get("/api/vorlagen").headers["etag"]
+        self.assertEqual(self.client.get("/api/vorlagen", headers={"If-None-Match": etag}).status_code, 304)
+
+    def test_statistik(self):
+        self.client.post("/api/reisen", json={"name": "S", "ziel": "Nizza", "vorlage_id": "strandurlaub-v1"})
+        daten = self.client.get("/api/statistik", params={"limit": 3}).json()
+        self.assertEqual(len(daten["haeufigste"]["strandurlaub-v1"]), 3)
+        self.assertEqual(daten["ziele"], [{"ziel": "Nizza", "reisen": 1, "fortschritt": 0}])
+        self.assertEqual(daten["oft_vergessen"], [])
+
+    def test_sync_aenderungen(self):
+        sync_einrichten()
+        r = self._reise(items=3)
+        erste = self.client.get("/api/sync/aenderungen", params={"seit": 0}).json()
+        self.assertEqual([x["uid"] for x in erste["reisen"]], [r.uid])
+        self.assertFalse(erste["weitere"])
+
+        item = GegenstandModel.get(GegenstandModel.gepackt == False)  # noqa: E712
+        self.client.post(f"/api/reisen/{r.id}/gegenstaende/packen", json={"ids": [item.id]})
+        (delta,) = self.client.get("/api/sync/aenderungen", params={"seit": erste["stand"]}).json()["reisen"]
+        self.assertEqual(delta["kategorien"][0]["gegenstaende"][0]["uid"], item.uid)
+        self.assertEqual(delta["entfernt"], [])
+
+    def test_unbekannte_reise(self):
+        self.assertEqual(self.client.get("/api/reisen/999").status_code, 404)
+
+    def test_verbindung_pro_aufruf(self):
+        # Jeder Aufruf öffnet die Verbindung und schließt sie wieder, auch bei 404
+        r = self._reise()
+        with mock.patch.object(self.db, "connect", wraps=self.db.connect) as connect, \
+                mock.patch.object(self.db, "close", wraps=self.db.close) as close:
+            self.assertEqual(self.client.get(f"/api/reisen/{r.id}").status_code, 200)
+            self.assertEqual(self.client.get("/api/reisen/999").status_code, 404)
+        self.assertEqual((connect.call_count, close.call_count), (2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
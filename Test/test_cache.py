@@ -0,0 +1,138 @@
+import sys
+import unittest
+from pathlib import Path
+from datetime import date
+from peewee import SqliteDatabase
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from database import (  # noqa: E402
+    ReiseModel,
+    KategorieModel,
+    GegenstandNameModel,
+    GegenstandModel,
+    gegenstand_packen,
+    packmenge_setzen,
+)
+from cache import ReiseBaumCache, reise_baum_laden, baum_fortschritt  # noqa: E402
+
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+
+
+class TestReiseBaumCache(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def _reise(self, name="Trip"):
+        r = ReiseModel.create(
+            name=name, ziel="B", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 2)
+        )
+        kat = KategorieModel.create(name="K1", reise=r)
+        a = GegenstandModel.create(name="A", menge=2, gepackt=True, kategorie=kat)
+        b = GegenstandModel.create(name="B", menge=1, gepackt=False, kategorie=kat)
+        return r, kat, a, b
+
+    def test_baum_laden_mit_zaehlern(self):
+        r, kat, a, b = self._reise()
+        baum = reise_baum_laden(r.id)
+        self.assertEqual(baum["name"], "Trip")
+        self.assertEqual(baum["gesamt"], 2)
+        self.assertEqual(baum["gepackt"], 1)
+        self.assertEqual(baum_fortschritt(baum), r.fortschritt_berechnen())
+        self.assertEqual([g["name"] for g in baum["kategorien"][0]["gegenstaende"]], ["A", "B"])
+        self.assertIsNone(reise_baum_laden(9999))
+
+    def test_treffer_und_fehlschlaege(self):
+        r, *_ = self._reise()
+        cache = ReiseBaumCache(max_eintraege=4)
+        self.assertIs(cache.holen(r.id), cache.holen(r.id))
+        stats = cache.statistik()
+        self.assertEqual(stats["treffer"], 1)
+        self.assertEqual(stats["fehlschlaege"], 1)
+
+    def test_lru_verdraengung(self):
+        ids = [self._reise(f"T{i}")[0].id for i in range(3)]
+        cache = ReiseBaumCache(max_eintraege=2)
+        cache.holen(ids[0])
+        cache.holen(ids[1])
+        cache.holen(ids[0])  # ids[0] ist jetzt zuletzt benutzt
+        cache.holen(ids[2])  # verdrängt ids[1]
+        self.assertEqual(cache.statistik()["verdraengungen"], 1)
+        cache.holen(ids[0])
+        self.assertEqual(cache.statistik()["treffer"], 2)
+
+    def test_patchen_aktualisiert_zaehler(self):
+        r, kat, a, b = self._reise()
+        cache = ReiseBaumCache()
+        cache.holen(r.id)
+        GegenstandModel.update(gepackt=True).where(GegenstandModel.id == b.id).execute()
+        cache.gegenstand_patchen(r.id, b.id, gepackt=True, menge=5)
+        baum = cache.holen(r.id)
+        self.assertEqual(baum["gepackt"], 2)
+        self.assertEqual(baum["kategorien"][0]["gepackt"], 2)
+        self.assertEqual(baum["kategorien"][0]["gegenstaende"][1]["menge"], 5)
+        self.assertEqual(cache.statistik()["fehlschlaege"], 1)
+
+    def test_mengen_gewichtung_bleibt_beim_patchen_konsistent(self):
+        r, kat, a, b = self._reise()  # A: 2x gepackt, B: 1x offen
+        cache = ReiseBaumCache()
+        baum = cache.holen(r.id)
+        self.assertEqual(baum_fortschritt(baum, "menge"), 67)
+        self.assertEqual(baum_fortschritt(baum, "menge"), r.fortschritt_berechnen("menge"))
+
+        b.menge = 6
+        b.save()
+        cache.gegenstand_patchen(r.id, b.id, menge=6)
+        cache.gegenstand_patchen(r.id, a.id, **gegenstand_packen(a.id, False))
+        cache.gegenstand_patchen(r.id, b.id, **packmenge_setzen(b.id, 3))
+
+        neu = reise_baum_laden(r.id)
+        for schluessel in ("gepackt", "menge_gesamt", "menge_gepackt"):
+            self.assertEqual(baum[schluessel], neu[schluessel])
+            self.assertEqual(baum["kategorien"][0][schluessel], neu["kategorien"][0][schluessel])
+        self.assertEqual(baum["kategorien"][0]["gegenstaende"], neu["kategorien"][0]["gegenstaende"])
+        self.assertEqual(baum_fortschritt(baum, "menge"), 38)
+        self.assertEqual(baum_fortschritt(baum), 0)
+
+    def test_invalidieren_laedt_neu(self):
+        r, kat, a, b = self._reise()
+        cache = ReiseBaumCache()
+        cache.holen(r.id)
+        GegenstandModel.create(name="C", kategorie=kat)
+        cache.invalidieren(r.id)
+        self.assertEqual(cache.holen(r.id)["gesamt"], 3)
+        self.assertEqual(cache.statistik()["fehlschlaege"], 2)
+
+
+    def test_waehrend_des_ladens_invalidiert_wird_nicht_gecacht(self):
+        r, kat, a, b = self._reise()
+
+        # Ein anderer Thread schreibt und invalidiert zwischen DB-Lesen und Einfügen
+        def loader(reise_id):
+            baum = reise_baum_laden(reise_id)
+            GegenstandModel.create(name="C", kategorie=kat)
+            cache.invalidieren(reise_id)
+            return baum
+
+        cache = ReiseBaumCache(loader=loader)
+        self.assertEqual(cache.holen(r.id)["gesamt"], 2)
+        self.assertEqual(cache.statistik()["eintraege"], 0)
+        cache._loader = reise_baum_laden
+        self.assertEqual(cache.holen(r.id)["gesamt"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,39 @@
 import unittest
 from unittest.mock import patch, mock_open
 import json
+from datetime import date
+from peewee import SqliteDatabase
 
 # Importieren der zu testenden Funktion direkt aus der main.py
-from main import lade_vorlagen
+from main import lade_vorlagen, reise_anlegen, export_reise_to_dict, export_delta, reise_importieren
+from austausch import import_vorschau
+from database import (
+    ReiseModel,
+    KategorieModel,
+    GegenstandNameModel,
+    GegenstandModel,
+    reise_als_geloescht_markieren,
+    geloeschte_reisen_purgen,
+    kategorie_packen,
+    reise_zuruecksetzen,
+    gepackte_loeschen,
+    revision_erhoehen,
+    reisen_mit_fortschritt,
+    reise_fortschritt,
+    gegenstand_name,
+    mit_katalog,
+    katalog_zuordnen,
+    namen_kompaktieren,
+    namen_haeufigkeit,
+    gegenstand_packen,
+    packmenge_setzen,
+    doppelte_zusammenfassen,
+    reise_duplizieren,
+    reise_hashes,
+)
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
 
 
 class TestMainFunktionen(unittest.TestCase):
@@ -74,5 +104,442 @@ class TestMainFunktionen(unittest.TestCase):
             self.assertIsInstance(erste_vorlage["kategorien"], list)
 
 
+class TestSoftDelete(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def _reise_mit_items(self, anzahl_items: int) -> ReiseModel:
+        r = ReiseModel.create(
+            name="Gross", ziel="X", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 1)
+        )
+        for k in range(2):
+            kat = KategorieModel.create(name=f"K{k}", reise=r)
+            GegenstandModel.insert_many(
+                [{"name": f"G{i}", "kategorie": kat} for i in range(anzahl_items)]
+            ).execute()
+        return r
+
+    def test_markieren_blendet_reise_sofort_aus(self):
+        r = self._reise_mit_items(3)
+        self.assertTrue(reise_als_geloescht_markieren(r.id))
+        self.assertEqual(ReiseModel.aktive().count(), 0)
+        # Die Zeilen existieren noch, bis der Purge läuft
+        self.assertEqual(GegenstandModel.select().count(), 6)
+
+    def test_purge_loescht_in_batches(self):
+        behalten = self._reise_mit_items(2)
+        r = self._reise_mit_items(25)
+        reise_als_geloescht_markieren(r.id)
+
+        schritte = []
+        while True:
+            n = geloeschte_reisen_purgen(batch=10)
+            if not n:
+                break
+            schritte.append(n)
+
+        self.assertTrue(all(n <= 10 for n in schritte))
+        self.assertEqual(sum(schritte), 50 + 2 + 1)
+        self.assertIsNone(ReiseModel.get_or_none(ReiseModel.id == r.id))
+        self.assertEqual(GegenstandModel.select().count(), 4)
+        self.assertEqual(ReiseModel.aktive().get().id, behalten.id)
+
+
+class TestBulkOperationen(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        self.r = ReiseModel.create(name="R", ziel="", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 1))
+        self.k1 = KategorieModel.create(name="K1", reise=self.r)
+        self.k2 = KategorieModel.create(name="K2", reise=self.r)
+        for kat in (self.k1, self.k2):
+            GegenstandModel.insert_many(
+                [{"name": f"G{i}", "kategorie": kat, "gepackt": i == 0} for i in range(4)]
+            ).execute()
+        andere = ReiseModel.create(name="A", ziel="", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 1))
+        self.k_fremd = KategorieModel.create(name="F", reise=andere)
+        GegenstandModel.create(name="Fremd", kategorie=self.k_fremd, gepackt=True)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def _gepackt(self, kat) -> int:
+        return kat.anzahl_gepackt()
+
+    def test_kategorie_packen_ein_statement(self):
+        with patch.object(test_db, "execute_sql", wraps=test_db.execute_sql) as sql:
+            self.assertEqual(kategorie_packen(self.r.id, self.k1.id), 3)
+        self.assertEqual(sql.call_count, 1)
+        self.assertEqual(self._gepackt(self.k1), 4)
+        self.assertEqual(self._gepackt(self.k2), 1)
+
+    def test_kategorie_fremder_reise_bleibt_unveraendert(self):
+        self.assertEqual(kategorie_packen(self.r.id, self.k_fremd.id, False), 0)
+        self.assertEqual(self._gepackt(self.k_fremd), 1)
+
+    def test_reise_zuruecksetzen(self):
+        self.assertEqual(reise_zuruecksetzen(self.r.id), 2)
+        self.assertEqual(self.r.fortschritt_berechnen(), 0)
+        self.assertEqual(self._gepackt(self.k_fremd), 1)
+
+    def test_revision_erhoehen(self):
+        self.assertEqual(self.r.revision, 0)
+        self.assertEqual(revision_erhoehen(self.r.id), 1)
+        self.assertEqual(revision_erhoehen(self.r.id), 2)
+        self.assertIsNone(revision_erhoehen(9999))
+
+    def test_fortschritt_nach_menge_in_einer_query(self):
+        GegenstandModel.update(menge=5).where(
+            (GegenstandModel.kategorie == self.k2.id) & (GegenstandModel.gepackt == True)  # noqa: E712
+        ).execute()
+        with patch.object(test_db, "execute_sql", wraps=test_db.execute_sql) as sql:
+            zeilen = {r.id: r for r in reisen_mit_fortschritt()}
+        self.assertEqual(sql.call_count, 1)
+        r = zeilen[self.r.id]
+        self.assertEqual(reise_fortschritt(r), self.r.fortschritt_berechnen())
+        self.assertEqual(reise_fortschritt(r, "menge"), self.r.fortschritt_berechnen("menge"))
+        self.assertNotEqual(reise_fortschritt(r), reise_fortschritt(r, "menge"))
+
+    def test_gepackte_loeschen(self):
+        self.assertEqual(gepackte_loeschen(self.r.id), 2)
+        self.assertEqual(self.k1.anzahl_gesamt(), 3)
+        self.assertEqual(self.k_fremd.anzahl_gesamt(), 1)
+
+
+class TestTeilweisePacken(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        self.r = ReiseModel.create(name="R", ziel="", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 1))
+        self.kat = KategorieModel.create(name="K", reise=self.r)
+        self.socken = GegenstandModel.create(name="Socken", menge=5, kategorie=self.kat)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def test_packmenge_wird_begrenzt(self):
+        self.assertEqual(packmenge_setzen(self.socken.id, 3), {"menge": 5, "menge_gepackt": 3, "gepackt": False})
+        self.assertEqual(packmenge_setzen(self.socken.id, 9), {"menge": 5, "menge_gepackt": 5, "gepackt": True})
+        self.assertEqual(packmenge_setzen(self.socken.id, -1), {"menge": 5, "menge_gepackt": 0, "gepackt": False})
+        self.assertIsNone(packmenge_setzen(9999, 1))
+
+    def test_ganz_packen_und_zuruecksetzen(self):
+        packmenge_setzen(self.socken.id, 2)
+        self.assertEqual(gegenstand_packen(self.socken.id), {"menge": 5, "menge_gepackt": 5, "gepackt": True})
+        packmenge_setzen(self.socken.id, 2)
+        # Auch nur teilweise gepackte Items werden zurückgesetzt
+        self.assertEqual(reise_zuruecksetzen(self.r.id), 1)
+        self.assertEqual(GegenstandModel.get_by_id(self.socken.id).menge_gepackt, 0)
+        self.assertEqual(kategorie_packen(self.r.id, self.kat.id), 1)
+        self.assertEqual(GegenstandModel.get_by_id(self.socken.id).menge_gepackt, 5)
+
+    def test_speichern_normalisiert(self):
+        g = GegenstandModel.create(name="Hemd", menge=3, menge_gepackt=7, kategorie=self.kat)
+        self.assertEqual((g.menge_gepackt, g.gepackt), (3, True))
+        g.menge = 4
+        g.save()
+        self.assertEqual((g.menge_gepackt, g.gepackt), (4, True))
+        g = GegenstandModel.create(name="Hose", menge=3, menge_gepackt=1, kategorie=self.kat)
+        self.assertEqual((g.menge_gepackt, g.gepackt), (1, False))
+
+    def test_fortschritt_nach_menge_zaehlt_teilmengen(self):
+        packmenge_setzen(self.socken.id, 2)
+        GegenstandModel.create(name="Hut", menge=5, gepackt=True, kategorie=self.kat)
+        r = next(r for r in reisen_mit_fortschritt() if r.id == self.r.id)
+        self.assertEqual(reise_fortschritt(r), 50)
+        self.assertEqual(reise_fortschritt(r, "menge"), 70)
+        self.assertEqual(self.r.fortschritt_berechnen("menge"), 70)
+
+    def test_doppelte_zusammenfassen(self):
+        packmenge_setzen(self.socken.id, 2)
+        GegenstandModel.create(name="Socken", menge=2, gepackt=True, kategorie=self.kat)
+        GegenstandModel.create(name="Socken", menge=1, kategorie=self.kat)
+        andere = KategorieModel.create(name="L", reise=self.r)
+        GegenstandModel.create(name="Socken", menge=1, kategorie=andere)
+
+        self.assertEqual(doppelte_zusammenfassen(self.r.id), 2)
+        g = GegenstandModel.get_by_id(self.socken.id)
+        self.assertEqual((g.menge, g.menge_gepackt, g.gepackt), (8, 4, False))
+        self.assertEqual(andere.anzahl_gesamt(), 1)
+        self.assertEqual(doppelte_zusammenfassen(self.r.id), 0)
+
+
+
+class TestDuplizieren(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        vorlage = {
+            "id": "ski",
+            "kategorien": [
+                {"name": "Kleidung", "gegenstaende": [
+                    {"name": "Socken", "menge_pro_tag": 1},
+                    {"name": "Shirts", "menge_pro_tag": 0.5},
+                ]},
+                {"name": "Leer", "gegenstaende": []},
+                {"name": "Technik", "gegenstaende": [{"name": "Ladekabel", "menge": 2}]},
+            ],
+        }
+        self.r = reise_anlegen("Ski", "Alpen", date(2024, 2, 1), date(2024, 2, 4), vorlage=vorlage)
+        socken = GegenstandModel.get(GegenstandModel.menge_pro_tag == 1)
+        packmenge_setzen(socken.id, 3)
+        kategorie_packen(self.r.id, KategorieModel.get(KategorieModel.name == "Technik").id)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def _items(self, r):
+        return [
+            (g["name"], g["menge"], g["gepackt"], g.get("menge_gepackt", 0))
+            for k in export_reise_to_dict(r)["kategorien"]
+            for g in k["gegenstaende"]
+        ]
+
+    def test_kopie_mit_status(self):
+        with patch.object(test_db, "execute_sql", wraps=test_db.execute_sql) as sql:
+            neu = reise_duplizieren(self.r.id, zuruecksetzen=False)
+        # Reise lesen, Reise anlegen, Kategorien, Items (unabhängig von der Anzahl Items)
+        self.assertLessEqual(sql.call_count, 6)
+        alt_export, neu_export = export_reise_to_dict(self.r), export_reise_to_dict(neu)
+        # Die Kopie ist eine eigene Reise, ihre Items behalten die uids
+        self.assertNotEqual(alt_export.pop("uid"), neu_export.pop("uid"))
+        self.assertEqual(alt_export, neu_export)
+        self.assertEqual(neu.vorlage_id, "ski")
+        self.assertEqual([k.name for k in neu.kategorien.order_by(KategorieModel.id)], ["Kleidung", "Leer", "Technik"])
+
+    def test_verschieben_und_zuruecksetzen(self):
+        neu = reise_duplizieren(self.r.id, name="Ski 2025", startdatum=date(2025, 2, 10))
+        self.assertEqual((neu.name, neu.enddatum), ("Ski 2025", date(2025, 2, 13)))
+        self.assertEqual(
+            self._items(neu), [("Socken", 4, False, 0), ("Shirts", 2, False, 0), ("Ladekabel", 2, False, 0)]
+        )
+        self.assertEqual(self.r.fortschritt_berechnen(), 33)
+
+    def test_mengen_pro_tag_neu_berechnen(self):
+        neu = reise_duplizieren(self.r.id, enddatum=date(2024, 2, 2), zuruecksetzen=False)
+        # Teilmengen werden auf die neue Menge begrenzt, feste Mengen bleiben
+        self.assertEqual(
+            self._items(neu), [("Socken", 2, True, 0), ("Shirts", 1, False, 0), ("Ladekabel", 2, True, 0)]
+        )
+        neu = reise_duplizieren(self.r.id, enddatum=date(2024, 2, 10))
+        self.assertEqual([m for _, m, _, _ in self._items(neu)], [10, 5, 2])
+
+    def test_geloeschte_und_ungueltige(self):
+        with self.assertRaises(ValueError):
+            reise_duplizieren(self.r.id, startdatum=date(2024, 3, 1), enddatum=date(2024, 2, 1))
+        reise_als_geloescht_markieren(self.r.id)
+        self.assertIsNone(reise_duplizieren(self.r.id))
+        self.assertEqual(ReiseModel.select().count(), 1)
+
+
+class TestZusammenfuehren(unittest.TestCase):
+    # Zwei Instanzen: test_db teilt die Reise, empfaenger_db importiert sie
+    def setUp(self):
+        self.empfaenger_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+        with self.empfaenger_db.bind_ctx(MODELS):
+            self.empfaenger_db.create_tables(MODELS)
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        self.r = ReiseModel.create(name="Rom", ziel="Rom", startdatum=date(2024, 5, 1), enddatum=date(2024, 5, 4))
+        kleidung = KategorieModel.create(name="Kleidung", reise=self.r)
+        technik = KategorieModel.create(name="Technik", reise=self.r)
+        for i in range(5):
+            GegenstandModel.create(name=f"Shirt {i}", kategorie=kleidung)
+        GegenstandModel.create(name="Kabel", menge=2, kategorie=technik)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+        self.empfaenger_db.close()
+
+    def _empfangen(self, daten):
+        with self.empfaenger_db.bind_ctx(MODELS):
+            r, zaehler = reise_importieren(json.loads(json.dumps(daten)))
+            return r.id, zaehler, export_reise_to_dict(r)
+
+    def test_erneutes_teilen_schreibt_nur_unterschiede(self):
+        rid, zaehler, _ = self._empfangen(export_reise_to_dict(self.r))
+        self.assertIsNone(zaehler)
+        with self.empfaenger_db.bind_ctx(MODELS):
+            ids_vorher = {g.name: g.id for g in GegenstandModel.select()}
+
+        GegenstandModel.update(gepackt=True).where(GegenstandModel.name == "Shirt 1").execute()
+        GegenstandModel.delete().where(GegenstandModel.name == "Shirt 4").execute()
+        GegenstandModel.create(name="Adapter", kategorie=KategorieModel.get(KategorieModel.name == "Technik"))
+        ReiseModel.update(ziel="Neapel").where(ReiseModel.id == self.r.id).execute()
+
+        rid2, zaehler, empfangen = self._empfangen(export_reise_to_dict(self.r))
+        self.assertEqual(rid2, rid)
+        self.assertEqual(zaehler, {"neu": 1, "geaendert": 1, "entfernt": 1, "unveraendert": 4})
+        self.assertEqual(empfangen, export_reise_to_dict(self.r))
+        with self.empfaenger_db.bind_ctx(MODELS):
+            self.assertEqual(ReiseModel.select().count(), 1)
+            self.assertEqual(ReiseModel.get_by_id(rid).revision, 1)
+            # Unveränderte Items bleiben dieselben Zeilen
+            self.assertEqual(GegenstandModel.get(GegenstandModel.name == "Shirt 0").id, ids_vorher["Shirt 0"])
+
+        # Nochmal dasselbe: nichts zu schreiben, Revision bleibt
+        _, zaehler, _ = self._empfangen(export_reise_to_dict(self.r))
+        self.assertEqual(zaehler["unveraendert"], 6)
+        with self.empfaenger_db.bind_ctx(MODELS):
+            self.assertEqual(ReiseModel.get_by_id(rid).revision, 1)
+
+    def test_delta_export(self):
+        _, _, _ = self._empfangen(export_reise_to_dict(self.r))
+        with self.empfaenger_db.bind_ctx(MODELS):
+            bekannte = reise_hashes(ReiseModel.get().id)
+        self.assertEqual(bekannte, reise_hashes(self.r.id))
+
+        kabel = GegenstandModel.get(GegenstandModel.name == "Kabel")
+        GegenstandModel.update(menge=3).where(GegenstandModel.id == kabel.id).execute()
+        GegenstandModel.delete().where(GegenstandModel.name == "Shirt 0").execute()
+        delta = export_delta(self.r, bekannte)
+        self.assertEqual([g["name"] for k in delta["kategorien"] for g in k["gegenstaende"]], ["Kabel"])
+        self.assertEqual(len(delta["entfernt"]), 1)
+
+        _, zaehler, empfangen = self._empfangen(delta)
+        self.assertEqual(zaehler, {"neu": 0, "geaendert": 1, "entfernt": 1, "unveraendert": 0})
+        self.assertEqual(empfangen, export_reise_to_dict(self.r))
+
+    def test_vorschau_schreibt_nichts_und_kopie(self):
+        rid, _, _ = self._empfangen(export_reise_to_dict(self.r))
+        daten = json.loads(json.dumps(export_reise_to_dict(self.r)))
+        ohne_uid = export_reise_to_dict(self.r, mit_uid=False)
+        # Beim Empfänger kam lokal etwas dazu, das in der geteilten Fassung fehlt
+        with self.empfaenger_db.bind_ctx(MODELS):
+            extra = KategorieModel.create(name="Extra", reise=rid)
+            GegenstandModel.create(name="Buch", kategorie=extra)
+            vorher = (export_reise_to_dict(ReiseModel.get_by_id(rid)), ReiseModel.get_by_id(rid).revision)
+            self.assertEqual(
+                import_vorschau(daten),
+                {"neu": 0, "geaendert": 0, "entfernt": 1, "unveraendert": 6, "kategorien_entfernt": 1},
+            )
+            self.assertEqual((export_reise_to_dict(ReiseModel.get_by_id(rid)), ReiseModel.get_by_id(rid).revision), vorher)
+
+            kopie, zaehler = reise_importieren(daten, als_kopie=True)
+            self.assertIsNone(zaehler)
+            self.assertNotEqual(kopie.id, rid)
+            self.assertEqual(export_reise_to_dict(ReiseModel.get_by_id(rid)), vorher[0])
+            self.assertIsNone(import_vorschau(ohne_uid))
+
+            # Die Vorschau (nur Hashes) zählt genau wie das echte Zusammenführen
+            GegenstandModel.update(gepackt=True).where(GegenstandModel.name == "Shirt 2").execute()
+            vorschau = import_vorschau(daten)
+            self.assertEqual((vorschau["geaendert"], vorschau["entfernt"]), (1, 1))
+            vorschau.pop("kategorien_entfernt")
+            self.assertEqual(reise_importieren(daten)[1], vorschau)
+
+    def test_neue_reise_ohne_uid_und_delta_ohne_reise(self):
+        daten = export_reise_to_dict(self.r, mit_uid=False)
+        self.assertNotIn("uid", daten)
+        r, zaehler = reise_importieren(daten)
+        self.assertIsNone(zaehler)
+        self.assertNotEqual(r.id, self.r.id)
+        with self.assertRaises(ValueError):
+            self._empfangen(export_delta(self.r, {}))
+
+
+class TestNamenskatalog(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        self.r = ReiseModel.create(name="R", ziel="X", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 1))
+        self.kat = KategorieModel.create(name="K", reise=self.r)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def _namen(self):
+        query = GegenstandModel.select(gegenstand_name()).order_by(GegenstandModel.id)
+        return [row[0] for row in mit_katalog(query).tuples()]
+
+    def test_namen_werden_einmal_gespeichert(self):
+        for name in ["Socken", "Socken", "Hut", "Socken"]:
+            GegenstandModel.create(name=name, kategorie=self.kat)
+        self.assertEqual(GegenstandNameModel.select().count(), 2)
+        ids = {g.katalog_id for g in GegenstandModel.select().where(GegenstandModel.name == "Socken")}
+        self.assertEqual(len(ids), 1)
+        self.assertEqual([(r.name, r.anzahl) for r in namen_haeufigkeit()], [("Socken", 3), ("Hut", 1)])
+
+    def test_kompakt_liest_transparent(self):
+        with patch("database.NAMENSKATALOG", "kompakt"):
+            GegenstandModel.create(name="Socken", kategorie=self.kat)
+        GegenstandModel.create(name="Hut", kategorie=self.kat)
+        self.assertEqual(GegenstandModel.get_by_id(1).name, "")
+        self.assertEqual(self._namen(), ["Socken", "Hut"])
+
+    def test_kompakt_behaelt_namen_im_objekt(self):
+        with patch("database.NAMENSKATALOG", "kompakt"):
+            g = GegenstandModel.create(name="Socken", kategorie=self.kat)
+            self.assertEqual(g.name, "Socken")
+            g.menge = 3
+            g.save()
+        self.assertEqual(self._namen(), ["Socken"])
+        self.assertEqual(GegenstandModel.get_by_id(g.id).name, "")
+
+    def test_speichern_ohne_namensaenderung_ohne_katalogabfrage(self):
+        g = GegenstandModel.create(name="Socken", kategorie=self.kat)
+        g = GegenstandModel.get_by_id(g.id)
+        with patch.object(test_db, "execute_sql", wraps=test_db.execute_sql) as sql:
+            g.menge = 2
+            g.save()
+            self.assertEqual([c.args[0].split()[0] for c in sql.call_args_list], ["UPDATE"])
+            g.name = "Wollsocken"
+            g.save()
+        self.assertEqual(self._namen(), ["Wollsocken"])
+
+    def test_kopien_und_vorlagen_werden_katalogisiert(self):
+        # Items aus der Zeit vor dem Katalog: Die Kopie trägt sie nach
+        GegenstandModel.insert_many([{"name": n, "kategorie": self.kat} for n in ("Socken", "Hut")]).execute()
+        kopie = reise_duplizieren(self.r.id)
+        items = GegenstandModel.select().join(KategorieModel).where(KategorieModel.reise == kopie.id)
+        self.assertTrue(all(g.katalog_id for g in items))
+
+        with patch("database.NAMENSKATALOG", "kompakt"):
+            neu = reise_anlegen("V", "", date(2024, 1, 1), date(2024, 1, 3), vorlage=lade_vorlagen()[0])
+        items = GegenstandModel.select().join(KategorieModel).where(KategorieModel.reise == neu.id)
+        self.assertTrue(all(g.katalog_id and g.name == "" for g in items))
+
+    def test_nachtraeglich_zuordnen_und_kompaktieren(self):
+        GegenstandModel.insert_many(
+            [{"name": f"G{i % 3}", "kategorie": self.kat} for i in range(10)]
+        ).execute()
+        self.assertEqual(katalog_zuordnen([g.id for g in GegenstandModel.select()]), 10)
+        self.assertEqual(GegenstandNameModel.select().count(), 3)
+
+        self.assertEqual(namen_kompaktieren(batch=4), 4)
+        while namen_kompaktieren(batch=4):
+            pass
+        self.assertEqual(GegenstandModel.select().where(GegenstandModel.name != "").count(), 0)
+        self.assertEqual(self._namen(), [f"G{i % 3}" for i in range(10)])
+
+
 if __name__ == "__main__":
     unittest.main()
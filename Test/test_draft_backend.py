@@ -0,0 +1,171 @@
+import sys
+import json
+import unittest
+from pathlib import Path
+from datetime import date
+from tempfile import TemporaryDirectory
+
+# Der Draft-Backend liegt nicht im Projekt-Root, sondern unter Draft/Backend.
+BACKEND = Path(__file__).resolve().parents[1] / "Draft" / "Backend"
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from backend import Reise, Kategorie, Gegenstand, ReiseManager  # noqa: E402
+
+
+def _reise(name: str) -> Reise:
+    reise = Reise(name, date(2026, 5, 10), date(2026, 5, 14), "Kurztrip")
+    kleidung = Kategorie("Kleidung")
+    kleidung.gegenstand_hinzufuegen(Gegenstand("Hose", 2))
+    kleidung.gegenstand_hinzufuegen(Gegenstand("T-Shirt", 3))
+    reise.kategorie_hinzufuegen(kleidung)
+    return reise
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.pfad = Path(self._tmp.name) / "reisen.json"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _neu_laden(self, **kwargs) -> ReiseManager:
+        return ReiseManager(str(self.pfad), **kwargs)
+
+    def test_aenderungen_landen_im_journal(self):
+        manager = self._neu_laden()
+        stadt, berg = _reise("Stadt"), _reise("Berg")
+        manager.reise_hinzufuegen(stadt)
+        manager.reise_hinzufuegen(berg)
+        manager.gegenstand_gepackt_setzen(berg, berg.kategorien[0].gegenstaende[1])
+        manager.reise_entfernen(stadt)
+
+        self.assertFalse(self.pfad.exists())
+        self.assertEqual(len(manager.journalpfad.read_text(encoding="utf-8").splitlines()), 4)
+        geladen = self._neu_laden()
+        self.assertEqual([r.name for r in geladen.reisen], ["Berg"])
+        self.assertEqual([g.gepackt for g in geladen.reisen[0].kategorien[0].gegenstaende], [False, True])
+
+    def test_kompaktierung(self):
+        manager = self._neu_laden(kompaktieren_ab=3)
+        for name in ("A", "B", "C", "D"):
+            manager.reise_hinzufuegen(_reise(name))
+        # Nach dem dritten Eintrag Snapshot geschrieben, nur "D" steht noch im Journal
+        self.assertEqual(json.loads(self.pfad.read_text(encoding="utf-8"))["stand"], 3)
+        self.assertEqual(len(manager.journalpfad.read_text(encoding="utf-8").splitlines()), 1)
+        self.assertEqual([r.name for r in self._neu_laden().reisen], ["A", "B", "C", "D"])
+
+    def test_absturz_waehrend_kompaktierung_und_schreiben(self):
+        manager = self._neu_laden()
+        manager.reise_hinzufuegen(_reise("A"))
+        journal = manager.journalpfad.read_text(encoding="utf-8")
+        manager.kompaktieren()
+        # Journal wurde nicht mehr geleert und die letzte Zeile nur halb geschrieben
+        manager.journalpfad.write_text(journal + '{"nr":2,"op":"reise_hin', encoding="utf-8")
+        geladen = self._neu_laden()
+        self.assertEqual([r.name for r in geladen.reisen], ["A"])
+
+        # Weitere Änderungen nach dem Neustart überleben das nächste Laden
+        geladen.reise_hinzufuegen(_reise("B"))
+        geladen.gegenstand_gepackt_setzen(geladen.reisen[1], geladen.reisen[1].kategorien[0].gegenstaende[0])
+        nochmal = self._neu_laden()
+        self.assertEqual([r.name for r in nochmal.reisen], ["A", "B"])
+        self.assertEqual(nochmal.reisen[1].fortschritt_berechnen(), 50.0)
+
+    def test_direkte_aenderung_speichern_und_laden(self):
+        manager = self._neu_laden()
+        reise = Reise("Abc", date(2026, 5, 10), date(2026, 5, 14))
+        k = Kategorie("K")
+        for name in ("a", "b", "c"):
+            k.gegenstand_hinzufuegen(Gegenstand(name))
+        reise.kategorie_hinzufuegen(k)
+        manager.reise_hinzufuegen(reise)
+        manager.gegenstand_gepackt_setzen(reise, k.gegenstaende[2])
+
+        # Direkt an der Liste bearbeitet: Zähler, Positionen und Namens-Index neu
+        k.gegenstaende.pop(0)
+        manager.reise_aktualisieren(reise)
+        self.assertEqual(reise.fortschritt_berechnen(), 50.0)
+        self.assertEqual(reise.gegenstaende_finden("a"), [])
+        manager.gegenstand_gepackt_setzen(reise, k.gegenstaende[0])
+
+        geladen = self._neu_laden()
+        self.assertEqual([(g.name, g.gepackt) for g in geladen.reisen[0].kategorien[0].gegenstaende], [("b", True), ("c", True)])
+        self.assertEqual(geladen.reisen[0].fortschritt_berechnen(), 100.0)
+
+    def test_ungueltige_position_wird_uebersprungen(self):
+        manager = self._neu_laden()
+        manager.reise_hinzufuegen(_reise("A"))
+        with open(manager.journalpfad, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"nr": 2, "op": "gepackt", "reise_nr": 1, "kategorie": 0, "gegenstand": 5, "wert": True}) + "\n")
+        with self.assertLogs("backend", level="WARNING"):
+            geladen = self._neu_laden()
+        self.assertEqual(geladen.reisen[0].fortschritt_berechnen(), 0.0)
+
+    def test_reisen_nur_lesen(self):
+        manager = self._neu_laden()
+        with self.assertRaises(AttributeError):
+            manager.reisen.append(_reise("A"))
+
+    def test_altes_format_wird_gelesen(self):
+        alt = self._neu_laden()
+        self.pfad.write_text(json.dumps([alt._reise_zu_dict(_reise("Alt"))]), encoding="utf-8")
+        manager = self._neu_laden()
+        manager.reise_aktualisieren(manager.reisen[0])
+        manager.reisen[0].name = "Neu"
+        manager.reise_aktualisieren(manager.reisen[0])
+        self.assertEqual(self._neu_laden().reise_finden("Neu").kategorien[0].anzahl_gesamt(), 2)
+
+
+class TestIndizesUndZaehler(unittest.TestCase):
+    def test_zaehler_folgen_dem_packstatus(self):
+        reise = _reise("Stadt")
+        kleidung = reise.kategorien[0]
+        self.assertEqual(reise.fortschritt_berechnen(), 0.0)
+        kleidung.gegenstaende[0].als_gepackt_markieren()
+        kleidung.gegenstaende[0].gepackt = True  # zweimal gepackt zählt nur einmal
+        self.assertEqual((kleidung.anzahl_gepackt(), reise.fortschritt_berechnen()), (1, 50.0))
+
+        # Kategorie mit bereits gepackten Items nachträglich anhängen
+        technik = Kategorie("Technik")
+        technik.gegenstand_hinzufuegen(Gegenstand("Kamera", gepackt=True))
+        reise.kategorie_hinzufuegen(technik)
+        technik.gegenstand_hinzufuegen(Gegenstand("Kabel"))
+        self.assertEqual(reise.fortschritt_berechnen(), 50.0)
+        kleidung.gegenstaende[0].gepackt = False
+        self.assertEqual(reise.fortschritt_berechnen(), 25.0)
+        self.assertEqual([g.name for g in reise.gegenstaende_finden("Kamera")], ["Kamera"])
+        self.assertEqual(reise.gegenstaende_finden("Zelt"), [])
+
+        # Umbenennen trägt den Gegenstand im Namens-Index um
+        technik.gegenstaende[1].name = "Ladekabel"
+        self.assertEqual(reise.gegenstaende_finden("Kabel"), [])
+        self.assertEqual(reise.gegenstaende_finden("Ladekabel"), [technik.gegenstaende[1]])
+
+    def test_manager_indizes(self):
+        with TemporaryDirectory() as tmp:
+            manager = ReiseManager(str(Path(tmp) / "reisen.json"))
+            a, b, c = _reise("A"), _reise("B"), _reise("C")
+            for r in (a, b, c):
+                manager.reise_hinzufuegen(r)
+            manager.reise_entfernen(a)
+            self.assertIsNone(manager.reise_finden("A"))
+            self.assertIs(manager.reise_finden("C"), c)
+            # Feste Nummern: Löschen verschiebt die anderen Reisen nicht
+            self.assertEqual((manager._nr(b), manager._nr(c)), (2, 3))
+
+            c.name = "C2"
+            manager.reise_aktualisieren(c)
+            self.assertIsNone(manager.reise_finden("C"))
+            manager.gegenstand_gepackt_setzen(c, c.kategorien[0].gegenstaende[0])
+            with self.assertRaises(ValueError):
+                manager.gegenstand_gepackt_setzen(b, c.kategorien[0].gegenstaende[1])
+
+            geladen = ReiseManager(str(Path(tmp) / "reisen.json"))
+            self.assertEqual([r.name for r in geladen.reisen], ["B", "C2"])
+            self.assertEqual(geladen.reise_finden("C2").fortschritt_berechnen(), 50.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
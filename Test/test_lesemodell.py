@@ -0,0 +1,79 @@
+import sys
+import unittest
+from pathlib import Path
+from datetime import date
+from peewee import SqliteDatabase
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from database import (  # noqa: E402
+    ReiseModel,
+    KategorieModel,
+    GegenstandNameModel,
+    GegenstandModel,
+    packmenge_setzen,
+    reise_als_geloescht_markieren,
+)
+from lesemodell import GegenstandLesen, reise_lesen, reisen_lesen  # noqa: E402
+
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+
+
+class TestLesemodell(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def _reise(self, name):
+        r = ReiseModel.create(name=name, ziel="Rom", startdatum=date(2024, 5, 1), enddatum=date(2024, 5, 4))
+        kleidung = KategorieModel.create(name="Kleidung", reise=r)
+        GegenstandModel.create(name="Socken", menge=4, menge_pro_tag=1, kategorie=kleidung)
+        GegenstandModel.create(name="Jacke", menge=1, gepackt=True, menge_gepackt=1, kategorie=kleidung)
+        KategorieModel.create(name="Leer", reise=r)
+        return r
+
+    def test_baum_und_fortschritt(self):
+        r = self._reise("Rom")
+        packmenge_setzen(GegenstandModel.get(GegenstandModel.name == "Socken").id, 2)
+        lesen = reise_lesen(r.id)
+        self.assertEqual([k.name for k in lesen.kategorien], ["Kleidung", "Leer"])
+        self.assertEqual([g.name for g in lesen.gegenstaende()], ["Socken", "Jacke"])
+        for modus in ("anzahl", "menge"):
+            self.assertEqual(lesen.fortschritt_berechnen(modus), ReiseModel.get_by_id(r.id).fortschritt_berechnen(modus))
+        self.assertEqual(
+            lesen.als_export(mit_uid=False)["kategorien"][0]["gegenstaende"],
+            [
+                {"name": "Socken", "menge": 4, "gepackt": False, "menge_gepackt": 2, "menge_pro_tag": 1.0},
+                {"name": "Jacke", "menge": 1, "gepackt": True},
+            ],
+        )
+
+    def test_mehrere_reisen_und_geloeschte(self):
+        a, b, c = self._reise("A"), self._reise("B"), self._reise("C")
+        reise_als_geloescht_markieren(b.id)
+        self.assertEqual([r.name for r in reisen_lesen()], ["A", "C"])
+        self.assertEqual([r.name for r in reisen_lesen([b.id, c.id])], ["B", "C"])
+        self.assertEqual(sum(1 for _ in reisen_lesen()[1].gegenstaende()), 2)
+        self.assertIsNone(reise_lesen(999))
+
+    def test_kein_dict_pro_objekt(self):
+        g = GegenstandLesen(1, "Socken", 1, False, 0)
+        self.assertFalse(hasattr(g, "__dict__"))
+        with self.assertRaises(AttributeError):
+            g.farbe = "rot"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,12 @@
 import sys
 import json
+import subprocess
 import importlib.util
 import unittest
 from unittest import mock
 from pathlib import Path
 from datetime import date
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 from peewee import SqliteDatabase
 
 # Ensure project root is on the import path for test runs.
@@ -24,13 +25,18 @@ if NICEGUI_AVAILABLE:
         lade_vorlagen,
         finde_vorlage,
         export_reise_to_dict,
-        import_reise_from_dict,
+        run_modus,
+        run_optionen,
+        BestaetigungsDialog,
+        import_rueckfrage,
     )
+    from nicegui import events
 else:
     # Raise SkipTest at import time so unittest discovery still registers the module.
     raise unittest.SkipTest("NiceGUI not installed; skipping PackAttack tests.")
 
-from database import db, ReiseModel, KategorieModel, GegenstandModel
+from austausch import import_reise_from_dict  # noqa: E402
+from database import db, ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel
 
 
 # Use an in-memory SQLite database for isolated tests.
@@ -41,13 +47,13 @@ test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
 class TestPackAttack(unittest.TestCase):
     def setUp(self):
         # Bind models to the in-memory DB for each test, connect, and create fresh tables.
-        self._ctx = test_db.bind_ctx([ReiseModel, KategorieModel, GegenstandModel])
+        self._ctx = test_db.bind_ctx([ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel])
         self._ctx.__enter__()
         test_db.connect(reuse_if_open=True)
-        test_db.create_tables([ReiseModel, KategorieModel, GegenstandModel])
+        test_db.create_tables([ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel])
 
     def tearDown(self):
-        test_db.drop_tables([ReiseModel, KategorieModel, GegenstandModel])
+        test_db.drop_tables([ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel])
         test_db.close()
         self._ctx.__exit__(None, None, None)
 
@@ -152,3 +158,175 @@ class TestPackAttack(unittest.TestCase):
         self.assertEqual(kat.anzahl_gepackt(), 1)
         # 1 von 2 gepackt -> 50%
         self.assertEqual(r.fortschritt_berechnen(), 50)
+
+
+# Module, die ein Import nicht mitladen darf: hält den Import schlank, auch wenn
+# das Zeitbudget unten auf schnellen Maschinen noch nicht anschlägt
+NICHT_MITLADEN = {
+    "database": {"nicegui", "fastapi", "main", "migrationen"},
+    "main": {"migrationen", "numpy", "snapshot", "playhouse.migrate"},
+    # Import, Abgleich und Sicherung laufen auch ohne UI
+    "austausch": {"nicegui", "main"},
+    "sync": {"nicegui", "main"},
+    "snapshot": {"nicegui", "main"},
+}
+
+# Zeitbudget für den Import in Sekunden (bestes von IMPORT_LAEUFE Läufen in einem
+# frischen Prozess). Gemessen: database ~0,07 s, main ~1 s (davon fast alles
+# NiceGUI/FastAPI); die Grenzen lassen Luft für langsame CI-Maschinen.
+IMPORT_BUDGET = {"database": 0.5, "main": 5.0}
+IMPORT_LAEUFE = 3
+
+_IMPORT_PRUEFUNG = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {modul}
+dauer = time.perf_counter() - start
+import database
+print(json.dumps({{"module": sorted(sys.modules), "db_offen": not database.db.is_closed(), "dauer": dauer}}))
+"""
+
+
+@unittest.skipUnless(NICEGUI_AVAILABLE, "NiceGUI not installed")
+class TestStartzeit(unittest.TestCase):
+    def _importieren(self, modul: str, cwd: str) -> dict:
+        code = _IMPORT_PRUEFUNG.format(root=str(ROOT), modul=modul)
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True
+        )
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+    def test_import_laedt_nur_noetige_module(self):
+        with TemporaryDirectory() as tmp:
+            for modul, verboten in NICHT_MITLADEN.items():
+                geladen = set(self._importieren(modul, tmp)["module"])
+                self.assertEqual(geladen & verboten, set(), f"import {modul}")
+
+    def test_import_im_zeitbudget(self):
+        with TemporaryDirectory() as tmp:
+            for modul, budget in IMPORT_BUDGET.items():
+                beste = min(self._importieren(modul, tmp)["dauer"] for _ in range(IMPORT_LAEUFE))
+                self.assertLess(beste, budget, f"import {modul} dauerte {beste:.2f} s")
+
+    def test_import_ohne_datenbankzugriff(self):
+        # Der Import darf weder app.db anlegen noch eine Verbindung öffnen
+        with TemporaryDirectory() as tmp:
+            self.assertFalse(self._importieren("main", tmp)["db_offen"])
+            self.assertFalse((Path(tmp) / "app.db").exists())
+
+
+@unittest.skipUnless(NICEGUI_AVAILABLE, "NiceGUI not installed")
+class TestRunModus(unittest.TestCase):
+    def test_modus_erkennung(self):
+        with mock.patch.dict("os.environ", {}, clear=True):
+            self.assertEqual(run_modus([]), "dev")
+            self.assertEqual(run_modus(["--prod"]), "prod")
+        with mock.patch.dict("os.environ", {"PACKATTACK_MODUS": "prod"}):
+            self.assertEqual(run_modus([]), "prod")
+
+    def test_dev_nutzt_reload(self):
+        self.assertTrue(run_optionen("dev")["reload"])
+
+    def test_prod_ohne_reload_mit_umgebung(self):
+        env = {"PACKATTACK_HOST": "127.0.0.1", "PACKATTACK_PORT": "9000", "NICEGUI_STORAGE_SECRET": "x" * 32}
+        with mock.patch.dict("os.environ", env):
+            optionen = run_optionen("prod")
+        self.assertFalse(optionen["reload"])
+        self.assertFalse(optionen["show"])
+        self.assertEqual(optionen["host"], "127.0.0.1")
+        self.assertEqual(optionen["port"], 9000)
+        self.assertNotIn("workers", optionen)
+
+    def test_konfigurationswarnungen_ueber_logging(self):
+        with mock.patch.dict("os.environ", {"PACKATTACK_WORKERS": "4"}, clear=True):
+            with self.assertLogs("main", level="WARNING") as logs:
+                run_optionen("prod")
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("PACKATTACK_WORKERS=4", logs.output[0])
+
+
+# Löst einen Klick so aus wie nicegui.testing (alle gebundenen click-Handler)
+def _klicken(element):
+    for listener in list(element._event_listeners.values()):
+        if listener.element_id == element.id and listener.type == "click":
+            args = events.GenericEventArguments(sender=element, client=element.client, args=None)
+            events.handle_event(listener.handler, args)
+
+
+@unittest.skipUnless(NICEGUI_AVAILABLE, "NiceGUI not installed")
+class TestBestaetigungsDialog(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx([ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel])
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables([ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel])
+
+    def tearDown(self):
+        test_db.drop_tables([ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel])
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def test_jede_bestaetigung_genau_ein_delete_und_refresh(self):
+        r = ReiseModel.create(name="T", ziel="", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 1))
+        kat = KategorieModel.create(name="K", reise=r)
+        ids = [GegenstandModel.create(name=f"G{i}", kategorie=kat).id for i in range(40)]
+
+        dialog = BestaetigungsDialog()
+        refreshs = []
+
+        # Wie delete_item() auf der Detailseite: ein DELETE + ein refresh()
+        def delete_item(item_id: int):
+            GegenstandModel.delete_by_id(item_id)
+            refreshs.append(item_id)
+
+        with mock.patch.object(test_db, "execute_sql", wraps=test_db.execute_sql) as sql:
+            for n, iid in enumerate(ids, start=1):
+                # Zwischendurch abgebrochene Nachfragen dürfen nichts hinterlassen
+                if n % 3 == 0:
+                    dialog.fragen(lambda: delete_item(-1))
+                    dialog.abbrechen()
+                sql.reset_mock()
+                refreshs.clear()
+
+                dialog.fragen(lambda iid=iid: delete_item(iid), text=f"{iid} löschen?")
+                _klicken(dialog.button_ja)
+                # Doppelklick auf "Löschen" führt die Aktion nicht erneut aus
+                _klicken(dialog.button_ja)
+
+                deletes = [c for c in sql.call_args_list if c.args[0].startswith("DELETE")]
+                self.assertEqual(len(deletes), 1, f"Bestätigung {n}")
+                self.assertEqual(refreshs, [iid], f"Bestätigung {n}")
+
+        self.assertEqual(GegenstandModel.select().count(), 0)
+
+    def test_button_text_pro_frage(self):
+        dialog = BestaetigungsDialog()
+        dialog.fragen(lambda: None, text="Zurücksetzen?", button_text="Zurücksetzen")
+        self.assertEqual(dialog.button_ja.text, "Zurücksetzen")
+        dialog.abbrechen()
+        # Die nächste Frage ohne eigene Beschriftung bekommt wieder den Standard
+        dialog.fragen(lambda: None)
+        self.assertEqual(dialog.button_ja.text, "Löschen")
+
+    def test_import_rueckfrage_nur_beim_loeschen(self):
+        zaehler = {"neu": 2, "geaendert": 1, "entfernt": 0, "unveraendert": 5, "kategorien_entfernt": 0}
+        self.assertIsNone(import_rueckfrage(None))
+        self.assertIsNone(import_rueckfrage(zaehler))
+        frage = import_rueckfrage({**zaehler, "entfernt": 3, "kategorien_entfernt": 1})
+        self.assertIn("3 Gegenstände", frage)
+        self.assertIn("1 Kategorien", frage)
+
+    def test_alternative_nur_fuer_diese_frage(self):
+        dialog = BestaetigungsDialog()
+        gewaehlt = []
+        dialog.fragen(
+            lambda: gewaehlt.append("ja"), text="Zusammenführen?", alternative=("Als Kopie", lambda: gewaehlt.append("kopie"))
+        )
+        self.assertEqual((dialog.button_alternativ.text, dialog.button_alternativ.visible), ("Als Kopie", True))
+        dialog.alternativ_waehlen()
+        self.assertEqual(gewaehlt, ["kopie"])
+        dialog.fragen(lambda: gewaehlt.append("ja"))
+        self.assertFalse(dialog.button_alternativ.visible)
+        dialog.bestaetigen()
+        self.assertEqual(gewaehlt, ["kopie", "ja"])
@@ -0,0 +1,178 @@
+import sys
+import unittest
+from unittest import mock
+from pathlib import Path
+from datetime import date
+from peewee import SqliteDatabase, IntegerField
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel  # noqa: E402
+from migrationen import (  # noqa: E402
+    Migration,
+    SchemaMigrationModel,
+    aktuelle_version,
+    batch_update,
+    migrationen_ausfuehren,
+    spalte_hinzufuegen,
+    MIGRATIONEN,
+)
+from statistik import MODELLE as STATISTIK_MODELLE, StatistikNameModel  # noqa: E402
+from vorlagen import MODELLE as VORLAGEN_MODELLE  # noqa: E402
+from sync import MODELLE as SYNC_MODELLE, AenderungModel  # noqa: E402
+
+
+MODELS = (
+    [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel, SchemaMigrationModel]
+    + STATISTIK_MODELLE
+    + VORLAGEN_MODELLE
+    + SYNC_MODELLE
+)
+test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+
+
+class TestMigrationen(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        # migrationen.py nutzt die globale db für DDL -> ebenfalls umbiegen
+        self._db_patch = mock.patch("migrationen.db", test_db)
+        self._db_patch.start()
+        test_db.connect(reuse_if_open=True)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._db_patch.stop()
+        self._ctx.__exit__(None, None, None)
+
+    def test_alte_datenbank_bekommt_spalte(self):
+        # Schema wie vor dem Soft-Delete: reisen ohne geloescht-Spalte
+        test_db.execute_sql(
+            'CREATE TABLE "reisen" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(200) NOT NULL, '
+            '"ziel" VARCHAR(200) NOT NULL, "startdatum" DATE NOT NULL, "enddatum" DATE NOT NULL, '
+            '"beschreibung" TEXT NOT NULL)'
+        )
+        test_db.execute_sql("INSERT INTO reisen VALUES (1, 'Alt', 'X', '2024-01-01', '2024-01-02', '')")
+
+        migrationen_ausfuehren()
+
+        self.assertIn("geloescht", {c.name for c in test_db.get_columns("reisen")})
+        self.assertEqual(ReiseModel.aktive().get().name, "Alt")
+        self.assertEqual(aktuelle_version(), max(m.version for m in MIGRATIONEN))
+        # Zweiter Lauf hat nichts mehr zu tun
+        self.assertEqual(migrationen_ausfuehren(), [])
+
+    def test_alte_kategorien_und_items_bleiben_erhalten(self):
+        # Schema vor allen Migrationen, inkl. Kategorien und Items
+        test_db.execute_sql(
+            'CREATE TABLE "reisen" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(200) NOT NULL, '
+            '"ziel" VARCHAR(200) NOT NULL, "startdatum" DATE NOT NULL, "enddatum" DATE NOT NULL, '
+            '"beschreibung" TEXT NOT NULL)'
+        )
+        test_db.execute_sql(
+            'CREATE TABLE "kategorien" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(200) NOT NULL, '
+            '"reise_id" INTEGER NOT NULL REFERENCES "reisen" ("id") ON DELETE CASCADE)'
+        )
+        test_db.execute_sql(
+            'CREATE TABLE "gegenstaende" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(200) NOT NULL, '
+            '"menge" INTEGER NOT NULL, "gepackt" INTEGER NOT NULL, '
+            '"kategorie_id" INTEGER NOT NULL REFERENCES "kategorien" ("id") ON DELETE CASCADE)'
+        )
+        test_db.execute_sql("INSERT INTO reisen VALUES (1, 'Alt', 'X', '2024-01-01', '2024-01-02', '')")
+        test_db.execute_sql("INSERT INTO kategorien VALUES (1, 'K', 1)")
+        test_db.execute_sql("INSERT INTO gegenstaende VALUES (1, 'Socken', 2, 0, 1)")
+
+        migrationen_ausfuehren()
+
+        # Neue Spalten an reisen dürfen die Kategorien nicht per CASCADE mitreißen
+        self.assertEqual(KategorieModel.select().count(), 1)
+        self.assertEqual(GegenstandModel.get().name, "Socken")
+        self.assertFalse(ReiseModel.get().geloescht)
+        self.assertEqual(test_db.execute_sql("PRAGMA foreign_key_check").fetchall(), [])
+
+    def test_neue_datenbank(self):
+        test_db.create_tables([ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel])
+        self.assertEqual(migrationen_ausfuehren(), sorted(m.version for m in MIGRATIONEN))
+
+    def test_backfill_ist_fortsetzbar(self):
+        test_db.create_tables([ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel])
+        for i in range(25):
+            ReiseModel.create(name=f"R{i}", ziel="", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 1))
+
+        aufrufe = []
+
+        def schritt(cursor, batch):
+            spalte_hinzufuegen("reisen", "zaehler", IntegerField(default=0))
+            aufrufe.append(cursor)
+            if len(aufrufe) == 3:
+                raise RuntimeError("Abbruch mitten in der Migration")
+            return batch_update(ReiseModel, {ReiseModel.beschreibung: "neu"}, cursor, batch)
+
+        m = Migration(100, "Backfill", schritt)
+        with self.assertRaises(RuntimeError):
+            migrationen_ausfuehren([m], batch=10)
+
+        stand = SchemaMigrationModel.get_by_id(100)
+        self.assertFalse(stand.fertig)
+        self.assertEqual(stand.cursor, 20)
+        self.assertEqual(ReiseModel.select().where(ReiseModel.beschreibung == "neu").count(), 20)
+
+        # Neustart: macht ab Cursor 20 weiter und wird fertig
+        self.assertEqual(migrationen_ausfuehren([m], batch=10), [100])
+        self.assertEqual(aufrufe[3], 20)
+        self.assertEqual(ReiseModel.select().where(ReiseModel.beschreibung == "neu").count(), 25)
+        self.assertTrue(SchemaMigrationModel.get_by_id(100).fertig)
+
+    def test_alte_items_bleiben_erhalten_und_werden_katalogisiert(self):
+        # Schema vor allen Migrationen, inkl. Kategorien und Items
+        test_db.execute_sql(
+            'CREATE TABLE "reisen" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(200) NOT NULL, '
+            '"ziel" VARCHAR(200) NOT NULL, "startdatum" DATE NOT NULL, "enddatum" DATE NOT NULL, '
+            '"beschreibung" TEXT NOT NULL)'
+        )
+        test_db.execute_sql(
+            'CREATE TABLE "kategorien" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(200) NOT NULL, '
+            '"reise_id" INTEGER NOT NULL REFERENCES "reisen" ("id") ON DELETE CASCADE)'
+        )
+        test_db.execute_sql(
+            'CREATE TABLE "gegenstaende" ("id" INTEGER NOT NULL PRIMARY KEY, "name" VARCHAR(200) NOT NULL, '
+            '"menge" INTEGER NOT NULL, "gepackt" INTEGER NOT NULL, '
+            '"kategorie_id" INTEGER NOT NULL REFERENCES "kategorien" ("id") ON DELETE CASCADE)'
+        )
+        test_db.execute_sql("INSERT INTO reisen VALUES (1, 'Alt', 'X', '2024-01-01', '2024-01-02', '')")
+        test_db.execute_sql("INSERT INTO kategorien VALUES (1, 'K', 1)")
+        for i in range(5):
+            test_db.execute_sql(
+                "INSERT INTO gegenstaende VALUES (?, ?, 2, ?, 1)", (i + 1, ["Socken", "Hut"][i % 2], i == 0)
+            )
+
+        migrationen_ausfuehren(batch=2)
+
+        # Neue Spalten an reisen dürfen die Kategorien nicht per CASCADE mitreißen
+        self.assertEqual(GegenstandModel.select().count(), 5)
+        self.assertEqual(GegenstandNameModel.select().count(), 2)
+        self.assertEqual(GegenstandModel.select().where(GegenstandModel.katalog.is_null()).count(), 0)
+        # Statistik wurde aufgebaut (alte Reisen ohne Vorlage)
+        self.assertEqual(StatistikNameModel.get(StatistikNameModel.name == "Socken").anzahl, 3)
+        # Bisher gepackte Items gelten als vollständig gepackt
+        self.assertEqual(
+            list(GegenstandModel.select(GegenstandModel.menge_gepackt).order_by(GegenstandModel.id).tuples()),
+            [(2,), (0,), (0,), (0,), (0,)],
+        )
+        # Jede Reise und jedes Item hat eine eigene uid
+        self.assertEqual(len({g.uid for g in GegenstandModel.select() if g.uid}), 5)
+        self.assertEqual(len(ReiseModel.get_by_id(1).uid), 32)
+        # Bestehende Reise steht mit Kopf, Kategorien und Items im Änderungsprotokoll
+        eintraege = list(AenderungModel.select().order_by(AenderungModel.nr))
+        self.assertEqual({a.reise_uid for a in eintraege}, {ReiseModel.get_by_id(1).uid})
+        self.assertEqual((eintraege[0].gegenstand_uid, eintraege[0].kategorie), ("", ""))
+        self.assertEqual({a.kategorie for a in eintraege if a.kategorie}, {k.name for k in KategorieModel.select()})
+        self.assertEqual({a.gegenstand_uid for a in eintraege if a.gegenstand_uid}, {g.uid for g in GegenstandModel.select()})
+
+
+if __name__ == "__main__":
+    unittest.main()
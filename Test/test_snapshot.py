@@ -0,0 +1,102 @@
+import sys
+import json
+import zlib
+import importlib.util
+import unittest
+from pathlib import Path
+from datetime import date
+from peewee import SqliteDatabase
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+NICEGUI_AVAILABLE = importlib.util.find_spec("nicegui") is not None
+if NICEGUI_AVAILABLE:
+    from main import export_reise_to_dict
+else:
+    raise unittest.SkipTest("NiceGUI not installed; skipping PackAttack tests.")
+
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel  # noqa: E402
+from snapshot import MAGIC, _SPALTEN, snapshot_erstellen, snapshot_laden, snapshot_importieren  # noqa: E402
+
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        for i in range(3):
+            r = ReiseModel.create(
+                name=f"Reise {i}", ziel="Zürich", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 5),
+                beschreibung="Ümlaute ✓", vorlage_id="sommer" if i == 1 else None,
+            )
+            for k in ("Dokumente", "Kleidung", "Leer"):
+                kat = KategorieModel.create(name=k, reise=r)
+                if k == "Leer":
+                    continue
+                for j in range(5):
+                    GegenstandModel.create(
+                        name=f"{k} {j}", menge=j + 1, gepackt=(j + i) % 2 == 0, menge_gepackt=j // 2,
+                        menge_pro_tag=0.5 if j == 1 else None, kategorie=kat,
+                    )
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def test_roundtrip_entspricht_json_export(self):
+        # Mit uids und Vorlage, damit eine eingespielte Sicherung zusammenführbar bleibt
+        erwartet = [
+            {**export_reise_to_dict(r), **({"vorlage_id": r.vorlage_id} if r.vorlage_id else {})}
+            for r in ReiseModel.select().order_by(ReiseModel.id)
+        ]
+        self.assertEqual(snapshot_laden(snapshot_erstellen()), erwartet)
+
+    def test_auswahl_und_geloeschte(self):
+        ReiseModel.update(geloescht=True).where(ReiseModel.name == "Reise 0").execute()
+        r2 = ReiseModel.get(ReiseModel.name == "Reise 2")
+        self.assertEqual([r["name"] for r in snapshot_laden(snapshot_erstellen())], ["Reise 1", "Reise 2"])
+        self.assertEqual([r["name"] for r in snapshot_laden(snapshot_erstellen([r2.id]))], ["Reise 2"])
+
+    def test_einspielen_behaelt_identitaet(self):
+        daten = snapshot_erstellen()
+        gesichert = snapshot_laden(daten)
+        # In eine leere Datenbank: gleiche uids und Vorlage wie vorher
+        test_db.drop_tables(MODELS)
+        test_db.create_tables(MODELS)
+        neu = snapshot_importieren(daten)
+        self.assertEqual(snapshot_laden(snapshot_erstellen()), gesichert)
+        self.assertEqual(neu[1].vorlage_id, "sommer")
+
+    def test_einspielen_in_dieselbe_datenbank_legt_kopien_an(self):
+        daten = snapshot_erstellen()
+        neu = snapshot_importieren(daten)
+        self.assertEqual(len(neu), 3)
+        self.assertEqual(ReiseModel.select().count(), 6)
+        self.assertNotEqual(neu[1].uid, snapshot_laden(daten)[1]["uid"])
+        self.assertEqual(export_reise_to_dict(neu[1], mit_uid=False), export_reise_to_dict(ReiseModel.get_by_id(2), mit_uid=False))
+
+    def test_feste_breite(self):
+        # Die Spalten belegen unabhängig von der Plattform immer 4 / 1 / 8 Byte pro Wert
+        nutzdaten = zlib.decompress(snapshot_erstellen()[len(MAGIC) + 1:])
+        meta_len = int.from_bytes(nutzdaten[:4], "little")
+        meta = json.loads(nutzdaten[4:4 + meta_len])
+        breite = {"I": 4, "B": 1, "d": 8}
+        erwartet = sum(laenge * breite[typ] for (_, typ), laenge in zip(_SPALTEN, meta["laengen"]))
+        self.assertEqual(len(nutzdaten) - 4 - meta_len, erwartet)
+
+    def test_kein_snapshot(self):
+        with self.assertRaises(ValueError):
+            snapshot_laden(b'{"name": "x"}')
+
+
+if __name__ == "__main__":
+    unittest.main()
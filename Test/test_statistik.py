@@ -0,0 +1,173 @@
+import sys
+import importlib.util
+import unittest
+from pathlib import Path
+from datetime import date
+from peewee import SqliteDatabase
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from database import (  # noqa: E402
+    ReiseModel,
+    KategorieModel,
+    GegenstandNameModel,
+    GegenstandModel,
+    gegenstaende_packen,
+    gepackte_loeschen,
+    geloeschte_reisen_purgen,
+    reise_als_geloescht_markieren,
+)
+from statistik import (  # noqa: E402
+    StatistikNameModel,
+    StatistikReiseModel,
+    MODELLE,
+    fortschritt_auswerten,
+    fortschritt_pro_ziel,
+    haeufigste_gegenstaende,
+    oft_vergessen,
+    statistik_einrichten,
+    statistik_neu_aufbauen,
+)
+
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel] + MODELLE
+test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+
+class TestStatistik(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        statistik_einrichten()
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def _reise(self, ziel, vorlage_id, items):
+        r = ReiseModel.create(
+            name="R", ziel=ziel, startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 2), vorlage_id=vorlage_id
+        )
+        kat = KategorieModel.create(name="K", reise=r)
+        for name, gepackt in items:
+            GegenstandModel.create(name=name, gepackt=gepackt, kategorie=kat)
+        return r, kat
+
+    def _stand(self):
+        reisen = list(StatistikReiseModel.select().order_by(StatistikReiseModel.reise_id).tuples())
+        namen = sorted(StatistikNameModel.select().where(StatistikNameModel.anzahl != 0).tuples())
+        return reisen, namen
+
+    # Die per Trigger gepflegten Zähler müssen einem kompletten Neuaufbau entsprechen
+    def assertKonsistent(self):
+        vorher = self._stand()
+        statistik_neu_aufbauen()
+        self.assertEqual(vorher, self._stand())
+
+    def test_trigger_entsprechen_neuaufbau(self):
+        r1, k1 = self._reise("Rom", "staedtetrip", [("Socken", False), ("Hut", True), ("Socken", True)])
+        r2, k2 = self._reise("Rom", None, [("Hut", True)])
+        self.assertKonsistent()
+
+        gegenstaende_packen(r1.id, [g.id for g in k1.gegenstaende])
+        self.assertKonsistent()
+        GegenstandModel.update(name="Mütze").where(GegenstandModel.kategorie == k2.id).execute()
+        self.assertKonsistent()
+
+        # Soft-Delete nimmt die Items sofort aus den Auswertungen
+        reise_als_geloescht_markieren(r2.id)
+        self.assertKonsistent()
+        self.assertEqual(haeufigste_gegenstaende(), {"staedtetrip": [
+            {"name": "Socken", "anzahl": 2}, {"name": "Hut", "anzahl": 1},
+        ]})
+
+        # Löschen per CASCADE (Kategorie, Reise) und Purge
+        KategorieModel.create(name="Leer", reise=r1)
+        gepackte_loeschen(r1.id)
+        KategorieModel.delete_by_id(k1.id)
+        self.assertKonsistent()
+        while geloeschte_reisen_purgen(batch=1):
+            pass
+        ReiseModel.delete_by_id(r1.id)
+        self.assertKonsistent()
+        self.assertEqual(self._stand(), ([], []))
+
+    def test_oft_vergessen(self):
+        for _ in range(3):
+            self._reise("A", "v", [("Ladekabel", False), ("Socken", True)])
+        self._reise("A", "w", [("Ladekabel", True), ("Socken", True), ("Selten", False)])
+        self.assertEqual(
+            oft_vergessen(limit=2),
+            [
+                {"name": "Ladekabel", "anzahl": 4, "ungepackt": 3, "quote": 75},
+                {"name": "Socken", "anzahl": 4, "ungepackt": 0, "quote": 0},
+            ],
+        )
+
+    def test_fortschritt_pro_ziel(self):
+        self._reise("Rom", None, [("A", True), ("B", False)])
+        self._reise("Rom", None, [("A", True)])
+        self._reise("Oslo", None, [])
+        self.assertEqual(
+            fortschritt_pro_ziel(),
+            [{"ziel": "Oslo", "reisen": 1, "fortschritt": 0}, {"ziel": "Rom", "reisen": 2, "fortschritt": 75}],
+        )
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "NumPy not installed")
+class TestFortschrittVektorisiert(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def test_entspricht_fortschritt_berechnen(self):
+        reisen = []
+        for i in range(6):
+            r = ReiseModel.create(name=f"R{i}", ziel="Z", startdatum=date(2024, 1, 1), enddatum=date(2024, 1, 1))
+            for k in range(i % 3):
+                kat = KategorieModel.create(name=f"K{k}", reise=r)
+                for j in range(i + k + 1):
+                    GegenstandModel.create(
+                        name=f"G{j}", menge=j + 1, gepackt=(j + i) % 3 == 0, menge_gepackt=j // 2, kategorie=kat
+                    )
+            reisen.append(r)
+        reise_als_geloescht_markieren(reisen[-1].id)
+
+        bericht = fortschritt_auswerten()
+        aktiv = reisen[:-1]
+        self.assertEqual(bericht["reisen"]["id"].tolist(), [r.id for r in aktiv])
+        self.assertEqual(bericht["reisen"]["fortschritt"].tolist(), [r.fortschritt_berechnen() for r in aktiv])
+        self.assertEqual(sum(bericht["verteilung"]["anzahl"]), len(aktiv))
+
+        # Kategorie-Werte und Mengen-Gewichtung gegen eine einfache Schleife prüfen
+        for kat_id, gesamt, menge_prozent in zip(
+            bericht["kategorien"]["id"], bericht["kategorien"]["gesamt"], bericht["kategorien"]["fortschritt_menge"]
+        ):
+            items = list(KategorieModel.get_by_id(int(kat_id)).gegenstaende)
+            self.assertEqual(gesamt, len(items))
+            menge = sum(g.menge for g in items)
+            self.assertEqual(menge_prozent, round(sum(g.menge_gepackt for g in items) * 100 / menge))
+
+    def test_leere_datenbank(self):
+        bericht = fortschritt_auswerten()
+        self.assertEqual(bericht["gesamt"], 0)
+        self.assertEqual(bericht["mittel"], 0.0)
+        self.assertEqual(len(bericht["kategorien"]["id"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+import sys
+import importlib.util
+import unittest
+from pathlib import Path
+from datetime import date
+from tempfile import TemporaryDirectory
+from peewee import SqliteDatabase
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+NICEGUI_AVAILABLE = importlib.util.find_spec("nicegui") is not None
+if NICEGUI_AVAILABLE:
+    from main import export_reise_to_dict, reise_anlegen
+else:
+    raise unittest.SkipTest("NiceGUI not installed; skipping PackAttack tests.")
+
+from database import (  # noqa: E402
+    ReiseModel,
+    KategorieModel,
+    GegenstandNameModel,
+    GegenstandModel,
+    gegenstand_packen,
+    geloeschte_reisen_purgen,
+    reise_als_geloescht_markieren,
+)
+from cache import reise_cache  # noqa: E402
+from sync import (  # noqa: E402
+    MODELLE,
+    AenderungModel,
+    SyncStandModel,
+    aenderungen_seit,
+    aktueller_stand,
+    aus_datei,
+    sync_einrichten,
+    synchronisieren,
+)
+
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel] + MODELLE
+
+VORLAGE = {
+    "id": "test",
+    "kategorien": [
+        {"name": "Kleidung", "gegenstaende": [{"name": f"Item {i}", "menge": 1} for i in range(30)]},
+        {"name": "Technik", "gegenstaende": [{"name": "Kabel", "menge": 2}]},
+    ],
+}
+
+
+# Zwei Instanzen als SQLite-Dateien: "heim" (Quelle) und "laptop" (Empfänger)
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.pfad = {name: Path(self._tmp.name) / f"{name}.db" for name in ("heim", "laptop")}
+        self.dbs = {name: SqliteDatabase(str(p), pragmas={"foreign_keys": 1}) for name, p in self.pfad.items()}
+        for name in self.dbs:
+            with self.auf(name):
+                self.dbs[name].create_tables(MODELS)
+                sync_einrichten()
+        with self.auf("heim"):
+            self.reise = reise_anlegen("Ski", "Alpen", date(2024, 2, 1), date(2024, 2, 4), vorlage=VORLAGE)
+
+    def tearDown(self):
+        for db in self.dbs.values():
+            db.close()
+        self._tmp.cleanup()
+
+    def auf(self, name):
+        return self.dbs[name].bind_ctx(MODELS)
+
+    def abgleichen(self, von, nach, batch=500):
+        with self.auf(nach):
+            return synchronisieren(von, aus_datei(self.pfad[von]), batch=batch)
+
+    def exporte(self, name, sortiert=False):
+        with self.auf(name):
+            exporte = [export_reise_to_dict(r) for r in ReiseModel.aktive().order_by(ReiseModel.uid)]
+        if sortiert:
+            for e in exporte:
+                e["kategorien"].sort(key=lambda k: k["name"])
+        return exporte
+
+    def test_erster_abgleich_und_nur_aenderungen(self):
+        ergebnis = self.abgleichen("heim", "laptop")
+        self.assertEqual(ergebnis["neu"], 1)
+        self.assertEqual(self.exporte("laptop"), self.exporte("heim"))
+
+        with self.auf("heim"):
+            stand = aktueller_stand()
+            items = list(GegenstandModel.select().order_by(GegenstandModel.id))
+            gegenstand_packen(items[0].id)
+            items[1].delete_instance()
+            items[2].menge = 5
+            items[2].save()
+            seite = aenderungen_seit(stand)
+        # Nur die drei Items, nicht die ganze Reise
+        (delta,) = seite["reisen"]
+        self.assertEqual([g["uid"] for k in delta["kategorien"] for g in k["gegenstaende"]], [items[0].uid, items[2].uid])
+        self.assertEqual(delta["entfernt"], [items[1].uid])
+        self.assertEqual((delta["kopf"], delta["kategorien_entfernt"]), (False, []))
+
+        with self.auf("laptop"):
+            unveraendert = GegenstandModel.get(GegenstandModel.uid == items[5].uid)
+        ergebnis = self.abgleichen("heim", "laptop")
+        self.assertEqual((ergebnis["aktualisiert"], ergebnis["stand"]), (1, seite["stand"]))
+        self.assertEqual(self.exporte("laptop"), self.exporte("heim"))
+        with self.auf("laptop"):
+            self.assertEqual(GegenstandModel.get(GegenstandModel.uid == items[5].uid).id, unveraendert.id)
+            self.assertEqual(SyncStandModel.get_by_id("heim").stand, seite["stand"])
+
+        # Nichts Neues: eine leere Seite
+        self.assertEqual(self.abgleichen("heim", "laptop")["aktualisiert"], 0)
+
+    def test_kopf_kategorien_und_loeschen(self):
+        self.abgleichen("heim", "laptop")
+        with self.auf("heim"):
+            ReiseModel.update(name="Ski 2024").where(ReiseModel.id == self.reise.id).execute()
+            KategorieModel.delete().where(KategorieModel.name == "Technik").execute()
+            zweite = reise_anlegen("Strand", "Meer", date(2024, 7, 1), date(2024, 7, 3), vorlage=VORLAGE)
+        self.abgleichen("heim", "laptop")
+        self.assertEqual(self.exporte("laptop"), self.exporte("heim"))
+
+        with self.auf("heim"):
+            reise_als_geloescht_markieren(zweite.id)
+        self.assertEqual(self.abgleichen("heim", "laptop")["geloescht"], 1)
+        with self.auf("laptop"):
+            self.assertEqual([r.name for r in ReiseModel.aktive()], ["Ski 2024"])
+
+        # Lokal gelöschte Reisen kommen durch spätere Änderungen nicht zurück
+        with self.auf("laptop"):
+            ReiseModel.update(geloescht=True).execute()
+        with self.auf("heim"):
+            gegenstand_packen(GegenstandModel.select().first().id)
+        self.assertEqual(self.abgleichen("heim", "laptop")["uebersprungen"], 1)
+        self.assertEqual(self.exporte("laptop"), [])
+
+    def test_purgen_hinterlaesst_nur_den_tombstone(self):
+        with self.auf("heim"):
+            reise_als_geloescht_markieren(self.reise.id)
+            while geloeschte_reisen_purgen(batch=7):
+                pass
+            zeilen = list(AenderungModel.select().where(AenderungModel.reise_uid == self.reise.uid).dicts())
+            self.assertEqual(len(zeilen), 1)
+            self.assertEqual((zeilen[0]["gegenstand_uid"], zeilen[0]["kategorie"]), ("", ""))
+            (delta,) = aenderungen_seit(0)["reisen"]
+        self.assertEqual((delta["uid"], delta["geloescht"]), (self.reise.uid, True))
+
+    def test_abgleich_invalidiert_beruehrte_reisen(self):
+        self.abgleichen("heim", "laptop")
+        with self.auf("laptop"):
+            reise_id = ReiseModel.get().id
+            self.assertEqual(reise_cache.holen(reise_id)["ziel"], "Alpen")
+        with self.auf("heim"):
+            ReiseModel.update(ziel="Dolomiten").execute()
+        self.abgleichen("heim", "laptop")
+        with self.auf("laptop"):
+            self.assertEqual(reise_cache.holen(reise_id)["ziel"], "Dolomiten")
+        reise_cache.leeren()
+
+    def test_kopf_aenderung_ohne_items(self):
+        self.abgleichen("heim", "laptop")
+        with self.auf("heim"):
+            stand = aktueller_stand()
+            ReiseModel.update(ziel="Dolomiten").where(ReiseModel.id == self.reise.id).execute()
+            (delta,) = aenderungen_seit(stand)["reisen"]
+        self.assertEqual(
+            (delta["ziel"], delta["kopf"], delta["kategorien"], delta["entfernt"], delta["kategorien_entfernt"]),
+            ("Dolomiten", True, [], [], []),
+        )
+
+        self.abgleichen("heim", "laptop")
+
+        # Item-Deltas tragen die Kopfdaten nur zum Anlegen, sie gelten nicht
+        with self.auf("laptop"):
+            ReiseModel.update(name="Ski (Laptop)").execute()
+        with self.auf("heim"):
+            stand = aktueller_stand()
+            gegenstand_packen(GegenstandModel.select().first().id)
+            (delta,) = aenderungen_seit(stand)["reisen"]
+        self.assertFalse(delta["kopf"])
+        self.abgleichen("heim", "laptop")
+        with self.auf("laptop"):
+            self.assertEqual((ReiseModel.get().name, ReiseModel.get().ziel), ("Ski (Laptop)", "Dolomiten"))
+
+    def test_kategorie_umbenennen_behaelt_items(self):
+        self.abgleichen("heim", "laptop")
+        with self.auf("heim"):
+            KategorieModel.update(name="Elektronik").where(KategorieModel.name == "Technik").execute()
+            KategorieModel.create(name="Leer", reise=self.reise)
+        self.abgleichen("heim", "laptop")
+        self.assertEqual(self.exporte("laptop"), self.exporte("heim"))
+        with self.auf("laptop"):
+            self.assertEqual(
+                sorted(k.name for k in KategorieModel.select()), ["Elektronik", "Kleidung", "Leer"]
+            )
+
+    def test_gleichzeitige_aenderungen_auf_beiden_seiten(self):
+        self.abgleichen("heim", "laptop")
+        with self.auf("heim"):
+            items = [g.uid for g in GegenstandModel.select().order_by(GegenstandModel.id)]
+            ReiseModel.update(ziel="Dolomiten").execute()
+            GegenstandModel.update(menge=3).where(GegenstandModel.uid == items[0]).execute()
+            GegenstandModel.delete().where(GegenstandModel.uid == items[1]).execute()
+            KategorieModel.create(name="Heim", reise=self.reise)
+        with self.auf("laptop"):
+            kleidung = KategorieModel.get(KategorieModel.name == "Kleidung")
+            GegenstandModel.update(gepackt=True).where(GegenstandModel.uid == items[2]).execute()
+            GegenstandModel.delete().where(GegenstandModel.uid == items[3]).execute()
+            GegenstandModel.create(name="Nur Laptop", kategorie=kleidung)
+            KategorieModel.create(name="Laptop", reise=KategorieModel.select().first().reise)
+
+        # Beide Richtungen: fehlende Items/Kategorien der Gegenseite sind kein Löschauftrag
+        self.abgleichen("heim", "laptop")
+        self.abgleichen("laptop", "heim")
+        # Gleichzeitig angelegte Kategorien stehen auf beiden Seiten in anderer Reihenfolge
+        (reise,) = self.exporte("heim", sortiert=True)
+        self.assertEqual(self.exporte("laptop", sortiert=True), [reise])
+
+        nach_uid = {g["uid"]: g for k in reise["kategorien"] for g in k["gegenstaende"]}
+        self.assertEqual(reise["ziel"], "Dolomiten")
+        self.assertEqual((nach_uid[items[0]]["menge"], nach_uid[items[2]]["gepackt"]), (3, True))
+        self.assertNotIn(items[1], nach_uid)
+        self.assertNotIn(items[3], nach_uid)
+        self.assertIn("Nur Laptop", [g["name"] for g in nach_uid.values()])
+        self.assertEqual(
+            sorted(k["name"] for k in reise["kategorien"]), ["Heim", "Kleidung", "Laptop", "Technik"]
+        )
+
+    def test_seitenweise_und_ohne_echo(self):
+        with self.auf("heim"):
+            for i in range(4):
+                reise_anlegen(f"R{i}", "", date(2024, 1, 1), date(2024, 1, 2), vorlage=VORLAGE)
+        ergebnis = self.abgleichen("heim", "laptop", batch=2)
+        self.assertEqual(ergebnis["neu"], 5)
+        self.assertGreater(ergebnis["seiten"], 2)
+        self.assertEqual(self.exporte("laptop"), self.exporte("heim"))
+
+        # Zurück zur Quelle: alles schon bekannt, es wird nichts geschrieben
+        with self.auf("heim"):
+            vorher = (aktueller_stand(), AenderungModel.select().count())
+        ergebnis = self.abgleichen("laptop", "heim")
+        self.assertEqual(ergebnis["aktualisiert"], 5)
+        with self.auf("heim"):
+            self.assertEqual((aktueller_stand(), AenderungModel.select().count()), vorher)
+
+
+if __name__ == "__main__":
+    unittest.main()
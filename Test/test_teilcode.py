@@ -0,0 +1,78 @@
+import sys
+import json
+import importlib.util
+import unittest
+from pathlib import Path
+from datetime import date
+from peewee import SqliteDatabase
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+NICEGUI_AVAILABLE = importlib.util.find_spec("nicegui") is not None
+if NICEGUI_AVAILABLE:
+    from main import export_reise_to_dict, export_text, lade_vorlagen, reise_anlegen
+else:
+    raise unittest.SkipTest("NiceGUI not installed; skipping PackAttack tests.")
+
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel  # noqa: E402
+from austausch import import_reise_from_dict  # noqa: E402
+from teilcode import MAX_ENTPACKT, PRAEFIX, import_text_lesen, ist_teilcode, teilcode_erstellen, teilcode_lesen  # noqa: E402
+
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+
+
+class TestTeilcode(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        vorlage = next(v for v in lade_vorlagen() if v["id"] == "wanderurlaub-v1")
+        self.r = reise_anlegen("Wandern", "Zermatt", date(2024, 7, 1), date(2024, 7, 7), vorlage=vorlage)
+        self.daten = export_reise_to_dict(self.r)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def test_hin_und_zurueck(self):
+        code = teilcode_erstellen(self.daten)
+        self.assertTrue(code.startswith(PRAEFIX))
+        self.assertTrue(ist_teilcode("\n  " + code))
+        self.assertEqual(teilcode_lesen(code), self.daten)
+        # Messenger brechen lange Zeilen um
+        umgebrochen = "\n".join(code[i:i + 40] for i in range(0, len(code), 40))
+        self.assertEqual(import_text_lesen(umgebrochen), self.daten)
+
+    def test_deutlich_kuerzer_als_json(self):
+        code = export_text(self.r.id, "teilcode")
+        lesbar = export_text(self.r.id)
+        self.assertEqual(lesbar, json.dumps(self.daten, ensure_ascii=False, indent=2))
+        self.assertLess(len(code.encode("utf-8")) * 4, len(lesbar.encode("utf-8")))
+        self.assertEqual(import_reise_from_dict(import_text_lesen(code)).name, "Wandern")
+
+    def test_json_und_fehler(self):
+        self.assertEqual(import_text_lesen(json.dumps(self.daten)), self.daten)
+        code = teilcode_erstellen(self.daten)
+        for kaputt in (code[:-10], code[:20] + "~" + code[21:], PRAEFIX):
+            with self.assertRaises(ValueError):
+                teilcode_lesen(kaputt)
+        with self.assertRaises(ValueError):
+            teilcode_lesen("hallo")
+        # Wenige KB Code, die auf mehr als MAX_ENTPACKT aufgehen würden
+        bombe = teilcode_erstellen({"name": " " * MAX_ENTPACKT})
+        self.assertLess(len(bombe), 20_000)
+        with self.assertRaisesRegex(ValueError, "zu groß"):
+            teilcode_lesen(bombe)
+        with self.assertRaises(ValueError):
+            export_text(self.r.id, "xml")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import importlib.util
+import unittest
+from unittest import mock
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from datetime import date
+from peewee import SqliteDatabase
+
+# Ensure project root is on the import path for test runs.
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+NICEGUI_AVAILABLE = importlib.util.find_spec("nicegui") is not None
+if NICEGUI_AVAILABLE:
+    import main
+    from main import export_reise_to_dict, lade_vorlagen, reise_anlegen
+else:
+    raise unittest.SkipTest("NiceGUI not installed; skipping PackAttack tests.")
+
+from database import ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel, packmenge_setzen  # noqa: E402
+import vorlagen  # noqa: E402
+from vorlagen import (  # noqa: E402
+    MODELLE,
+    VorlagenIndex,
+    VorlagenVerzeichnis,
+    VorlageGegenstandModel,
+    baustein_pfad,
+    eigene_vorlage_laden,
+    eigene_vorlage_loeschen,
+    index_aufbauen,
+    reise_als_vorlage_speichern,
+    verzeichnis_aus_datei,
+    vorlage_pfad,
+    vorlagen_aufloesen,
+)
+
+
+MODELS = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel] + MODELLE
+test_db = SqliteDatabase(":memory:", pragmas={"foreign_keys": 1})
+
+SKI = {
+    "id": "ski-v1",
+    "name": "Ski",
+    "kategorien": [
+        {"name": "Kleidung", "gegenstaende": [
+            {"name": "Socken", "menge_pro_tag": 1},
+            {"name": "Skihose", "menge": 1},
+        ]},
+        {"name": "Leer", "gegenstaende": []},
+        {"name": "Technik", "gegenstaende": [{"name": "Ladekabel", "menge": 2}]},
+    ],
+}
+
+
+class TestEigeneVorlagen(unittest.TestCase):
+    def setUp(self):
+        self._ctx = test_db.bind_ctx(MODELS)
+        self._ctx.__enter__()
+        test_db.connect(reuse_if_open=True)
+        test_db.create_tables(MODELS)
+        self.r = reise_anlegen("Ski 2024", "Alpen", date(2024, 2, 1), date(2024, 2, 4), vorlage=SKI)
+        packmenge_setzen(GegenstandModel.get(GegenstandModel.name == "Socken").id, 2)
+
+    def tearDown(self):
+        test_db.drop_tables(MODELS)
+        test_db.close()
+        self._ctx.__exit__(None, None, None)
+
+    def test_speichern_und_laden(self):
+        kopf = reise_als_vorlage_speichern(self.r.id, "Mein Ski")
+        self.assertEqual(kopf, {"id": "eigene-1", "name": "Mein Ski", "eigene": True})
+        v = eigene_vorlage_laden(kopf["id"])
+        self.assertEqual([k["name"] for k in v["kategorien"]], ["Kleidung", "Leer", "Technik"])
+        self.assertEqual(
+            v["kategorien"][0]["gegenstaende"],
+            [{"name": "Socken", "menge": 4, "menge_pro_tag": 1.0}, {"name": "Skihose", "menge": 1}],
+        )
+        self.assertIsNone(eigene_vorlage_laden("eigene-99"))
+        self.assertIsNone(reise_als_vorlage_speichern(9999, "X"))
+
+    def test_neue_reise_aus_eigener_vorlage(self):
+        v = eigene_vorlage_laden(reise_als_vorlage_speichern(self.r.id, "Mein Ski")["id"])
+        neu = reise_anlegen("Ski 2025", "Alpen", date(2025, 2, 1), date(2025, 2, 7), vorlage=v)
+        self.assertEqual(neu.vorlage_id, "eigene-1")
+        # Menge pro Tag wird für die neue Dauer berechnet, Packstatus nicht übernommen
+        items = [g for k in export_reise_to_dict(neu, mit_uid=False)["kategorien"] for g in k["gegenstaende"]]
+        self.assertEqual(items[0], {"name": "Socken", "menge": 7, "gepackt": False, "menge_pro_tag": 1.0})
+        self.assertEqual(neu.fortschritt_berechnen("menge"), 0)
+
+    def test_loeschen(self):
+        kopf = reise_als_vorlage_speichern(self.r.id, "Mein Ski")
+        self.assertFalse(eigene_vorlage_loeschen("ski-v1"))
+        self.assertTrue(eigene_vorlage_loeschen(kopf["id"]))
+        self.assertEqual(VorlageGegenstandModel.select().count(), 0)
+
+    def test_index_wird_fortgeschrieben(self):
+        mtime = [1]
+        datei = mock.Mock(return_value=[SKI])
+        index = VorlagenIndex(lambda: mtime[0], datei)
+        self.assertEqual([v["id"] for v in index.holen()], ["ski-v1"])
+        version = index.version()
+
+        with mock.patch.object(vorlagen, "eigene_vorlagen", wraps=vorlagen.eigene_vorlagen) as db_laden:
+            index.hinzufuegen(reise_als_vorlage_speichern(self.r.id, "Mein Ski"))
+            self.assertEqual([v["id"] for v in index.holen()], ["ski-v1", "eigene-1"])
+            self.assertNotEqual(index.version(), version)
+            versionen = {version, index.version()}
+            eigene_vorlage_loeschen("eigene-1")
+            index.entfernen("eigene-1")
+            self.assertEqual(len(index.holen()), 1)
+            versionen.add(index.version())
+
+            # SQLite vergibt die ID der gelöschten Vorlage neu; der ETag darf
+            # trotzdem keinem früheren Stand gleichen
+            kopf = reise_als_vorlage_speichern(self.r.id, "Anderer Ski")
+            self.assertEqual(kopf["id"], "eigene-1")
+            index.hinzufuegen(kopf)
+            self.assertNotIn(index.version(), versionen)
+        self.assertEqual(db_laden.call_count, 0)
+        self.assertEqual(datei.call_count, 1)
+
+        # Geänderte Datei wird neu gelesen
+        mtime[0] = 2
+        index.holen()
+        self.assertEqual(datei.call_count, 2)
+
+
+class TestBausteine(unittest.TestCase):
+    BAUSTEINE = [
+        {"id": "basis", "kategorien": [{"name": "Dokumente", "gegenstaende": [{"name": "Karte", "menge": 1}]}]},
+        {"id": "dok", "kategorien": [
+            {"name": "Dokumente", "gegenstaende": [{"name": "Pass", "menge": 1}]},
+            {"baustein": "basis"},
+        ]},
+        {"id": "technik", "kategorien": [
+            {"name": "Technik", "gegenstaende": [{"name": "Kabel", "menge": 1}]},
+            {"baustein": "dok"},
+        ]},
+        {"id": "a", "kategorien": [{"baustein": "b"}]},
+        {"id": "b", "kategorien": [{"baustein": "a"}]},
+    ]
+
+    def test_verschachtelt_und_zusammengefuehrt(self):
+        vorlage = {"id": "v", "name": "V", "kategorien": [
+            {"baustein": "dok"},
+            {"name": "Kleidung", "gegenstaende": [{"name": "Socken", "menge_pro_tag": 1}]},
+            {"name": "Dokumente", "gegenstaende": [{"name": "Visum", "menge": 1}, {"name": "Karte", "menge": 2}]},
+            {"baustein": "technik"},
+        ]}
+        (v,) = vorlagen_aufloesen([vorlage], self.BAUSTEINE)
+        self.assertEqual(v["id"], "v")
+        self.assertEqual(v["kategorien"], [
+            {"name": "Dokumente", "gegenstaende": [
+                {"name": "Pass", "menge": 1}, {"name": "Karte", "menge": 1}, {"name": "Visum", "menge": 1},
+            ]},
+            {"name": "Kleidung", "gegenstaende": [{"name": "Socken", "menge_pro_tag": 1}]},
+            {"name": "Technik", "gegenstaende": [{"name": "Kabel", "menge": 1}]},
+        ])
+
+    def test_fehlerhafte_vorlagen_werden_ausgelassen(self):
+        liste = [
+            {"id": "zyklus", "kategorien": [{"baustein": "a"}]},
+            {"id": "unbekannt", "kategorien": [{"baustein": "gibt-es-nicht"}]},
+            {"id": "ok", "kategorien": [{"baustein": "basis"}]},
+        ]
+        with self.assertLogs("vorlagen", level="WARNING") as logs:
+            self.assertEqual([v["id"] for v in vorlagen_aufloesen(liste, self.BAUSTEINE)], ["ok"])
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("zyklus", logs.output[0])
+        self.assertIn("gibt-es-nicht", logs.output[1])
+
+    def test_mitgelieferte_vorlagen_sind_flach(self):
+        liste = lade_vorlagen()
+        self.assertEqual(len(liste), 4)
+        for v in liste:
+            self.assertTrue(all("baustein" not in k for k in v["kategorien"]))
+            self.assertEqual(v["kategorien"][-1]["name"], "Elektronik")
+            self.assertEqual(len(v["kategorien"][0]["gegenstaende"]), 4)
+
+
+class TestVorlagenVerzeichnis(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.pfad = Path(self._tmp.name)
+        self.assertEqual(verzeichnis_aus_datei(ROOT / "vorlagen.json", self.pfad), 4)
+        self.vz = VorlagenVerzeichnis(self.pfad)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    # Ändert eine Datei und setzt ihre mtime sicher weiter
+    def _aendern(self, relativ, aenderung):
+        datei = self.pfad / relativ
+        daten = json.loads(datei.read_text(encoding="utf-8"))
+        aenderung(daten)
+        mtime = datei.stat().st_mtime_ns
+        datei.write_text(json.dumps(daten), encoding="utf-8")
+        os.utime(datei, ns=(mtime + 10**9, mtime + 10**9))
+
+    def test_entspricht_vorlagen_json(self):
+        self.assertEqual([k["id"] for k in self.vz.koepfe()], [v["id"] for v in lade_vorlagen()])
+        for v in lade_vorlagen():
+            self.assertEqual(self.vz.laden(v["id"]), v)
+        self.assertIsNone(self.vz.laden("gibt-es-nicht"))
+
+    def test_inhalt_wird_erst_bei_auswahl_gelesen(self):
+        (self.pfad / vorlage_pfad("skiurlaub-v1")).write_text("kaputt", encoding="utf-8")
+        self.assertEqual(len(self.vz.koepfe()), 4)
+        with self.assertLogs("vorlagen", level="WARNING"):
+            self.assertIsNone(self.vz.laden("skiurlaub-v1"))
+        self.assertIsNotNone(self.vz.laden("strandurlaub-v1"))
+
+    def test_cache_bis_zur_aenderung_eines_bausteins(self):
+        vorher = self.vz.laden("strandurlaub-v1")
+        self.assertIs(self.vz.laden("strandurlaub-v1"), vorher)
+        self._aendern(baustein_pfad("elektronik"), lambda b: b["kategorien"][0]["gegenstaende"].append({"name": "E-Reader"}))
+        nachher = self.vz.laden("strandurlaub-v1")
+        self.assertEqual(nachher["kategorien"][-1]["gegenstaende"][-1], {"name": "E-Reader"})
+
+    def test_index_behaelt_reihenfolge(self):
+        neu = {"id": "segeln-v1", "name": "Segeln", "kategorien": [{"baustein": "dokumente"}]}
+        (self.pfad / vorlage_pfad("segeln-v1")).parent.mkdir(parents=True, exist_ok=True)
+        (self.pfad / vorlage_pfad("segeln-v1")).write_text(json.dumps(neu), encoding="utf-8")
+        ids = [e["id"] for e in index_aufbauen(self.pfad)]
+        self.assertEqual(ids, ["strandurlaub-v1", "staedtetrip-v1", "wanderurlaub-v1", "skiurlaub-v1", "segeln-v1"])
+        self.assertEqual(self.vz.laden("segeln-v1")["kategorien"][0]["name"], "Dokumente")
+        with self.assertRaises(ValueError):
+            vorlage_pfad("../etc")
+
+    def test_main_nutzt_verzeichnis(self):
+        with mock.patch.object(main, "vorlagen_verzeichnis", self.vz):
+            index = VorlagenIndex(main._vorlagen_mtime, main._vorlagen_quelle)
+            with mock.patch.object(vorlagen, "eigene_vorlagen", return_value=[]):
+                koepfe = index.holen()
+            self.assertNotIn("kategorien", koepfe[0])
+            self.assertEqual(main.finde_vorlage(koepfe, "wanderurlaub-v1")["name"], "Wanderurlaub")
+
+
+if __name__ == "__main__":
+    unittest.main()
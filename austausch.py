@@ -0,0 +1,182 @@
+from datetime import date, datetime
+from typing import Optional
+
+from database import (
+    ReiseModel,
+    KategorieModel,
+    GegenstandModel,
+    gegenstand_hash,
+    neue_gegenstand_uid,
+    neue_reise_uid,
+    reise_hashes,
+    reise_zusammenfuehren,
+)
+from cache import reise_cache
+from lesemodell import reise_lesen
+
+
+# Export und Import einzelner Reisen (JSON-Format von export_reise_to_dict).
+# Liegt außerhalb von main.py, damit Abgleich (sync.py), Sicherungen
+# (snapshot.py) und Skripte Reisen ohne NiceGUI ein- und auslesen können.
+
+# Wandelt einen String (YYYY-MM-DD) in ein Python date-Objekt um
+def datum_lesen(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+# Wandelt eine Reise inkl. Kategorien und Items in ein Dictionary um (für JSON-Export),
+# über das Lesemodell mit drei Queries statt einer pro Kategorie
+def export_reise_to_dict(r: ReiseModel, mit_uid: bool = True) -> dict:
+    return reise_lesen(r.id).als_export(mit_uid)
+
+
+# Delta-Export: nur Items, deren Hash sich gegenüber "bekannte" (uid -> hash, vom
+# Empfänger) unterscheidet, plus die uids der inzwischen gelöschten Items
+def export_delta(r: ReiseModel, bekannte: dict) -> dict:
+    daten = export_reise_to_dict(r)
+    hashes = reise_hashes(r.id)
+    for k in daten["kategorien"]:
+        k["gegenstaende"] = [
+            g for g in k["gegenstaende"] if "uid" not in g or bekannte.get(g["uid"]) != hashes.get(g["uid"])
+        ]
+    daten["entfernt"] = sorted(set(bekannte) - set(hashes))
+    return daten
+
+
+# Liest ein Item aus importierten Daten; None für Items ohne Namen
+def _import_gegenstand(g: dict) -> Optional[dict]:
+    name = (g.get("name") or "").strip()
+    if not name:
+        return None
+    menge = g.get("menge", 1)
+    try:
+        menge = max(1, int(menge))
+    except Exception:
+        menge = 1
+    try:
+        menge_gepackt = max(0, int(g.get("menge_gepackt", 0)))
+    except Exception:
+        menge_gepackt = 0
+    try:
+        menge_pro_tag = float(g["menge_pro_tag"]) if g.get("menge_pro_tag") is not None else None
+    except Exception:
+        menge_pro_tag = None
+    uid = g.get("uid")
+    return {
+        "uid": str(uid)[:12] if uid else None,
+        "name": name,
+        "menge": menge,
+        "gepackt": bool(g.get("gepackt", False)),
+        "menge_gepackt": menge_gepackt,
+        "menge_pro_tag": menge_pro_tag,
+    }
+
+
+def _import_kopf(data: dict) -> dict:
+    start = data.get("startdatum") or date.today().isoformat()
+    ende = data.get("enddatum") or start
+    kopf = {
+        "name": data.get("name", "Importierte Reise"),
+        "ziel": data.get("ziel", ""),
+        "startdatum": datum_lesen(start),
+        "enddatum": datum_lesen(ende),
+        "beschreibung": data.get("beschreibung", ""),
+    }
+    # Nur Sicherungen (snapshot.py) tragen die Vorlage für die Statistik mit
+    if data.get("vorlage_id"):
+        kopf["vorlage_id"] = str(data["vorlage_id"])[:100]
+    return kopf
+
+
+def _import_kategorien(data: dict) -> list:
+    return [
+        (k.get("name", "Kategorie"), [g for g in map(_import_gegenstand, k.get("gegenstaende", [])) if g])
+        for k in data.get("kategorien", [])
+    ]
+
+
+def _import_uid(data: dict) -> Optional[str]:
+    return str(data.get("uid") or "")[:32] or None
+
+
+# Führt importierte Daten in eine vorhandene Reise zusammen. Ein Delta mit
+# "kopf": false (Abgleich, siehe sync.py) lässt die Kopfdaten der Reise stehen.
+def _zusammenfuehren(reise_id: int, data: dict) -> dict:
+    return reise_zusammenfuehren(
+        reise_id,
+        _import_kopf(data) if data.get("kopf", True) else None,
+        _import_kategorien(data),
+        entfernt=data.get("entfernt"),
+        kategorien_entfernt=data.get("kategorien_entfernt"),
+    )
+
+
+# Die aktive Reise, in die ein Import zusammengeführt würde (None = neue Reise)
+def _import_ziel(uid: Optional[str]) -> Optional[ReiseModel]:
+    return ReiseModel.aktive().where(ReiseModel.uid == uid).first() if uid else None
+
+
+# Vorschau eines Imports: die Zähler, die reise_importieren liefern würde, plus
+# "kategorien_entfernt". Vergleicht nur die Hashes (reise_hashes) mit den
+# importierten Items und schreibt nichts. None, wenn die Reise neu angelegt würde.
+def import_vorschau(data: dict) -> Optional[dict]:
+    vorhanden = _import_ziel(_import_uid(data))
+    if vorhanden is None:
+        return None
+    lokal = reise_hashes(vorhanden.id)
+    kategorien = _import_kategorien(data)
+    zaehler = {"neu": 0, "geaendert": 0, "entfernt": 0, "unveraendert": 0}
+    gesehen = set()
+    for kat_name, items in kategorien:
+        for g in items:
+            alt = lokal.get(g["uid"]) if g["uid"] else None
+            gesehen.add(g["uid"])
+            if alt is None:
+                zaehler["neu"] += 1
+            elif alt != gegenstand_hash(kat_name, **{k: v for k, v in g.items() if k != "uid"}):
+                zaehler["geaendert"] += 1
+            else:
+                zaehler["unveraendert"] += 1
+
+    if "entfernt" in data:
+        zaehler["entfernt"] = len((set(data["entfernt"] or ()) & set(lokal)) - gesehen)
+        wegfallend = KategorieModel.name.in_(list(data.get("kategorien_entfernt") or []))
+    else:
+        zaehler["entfernt"] = len(set(lokal) - gesehen)
+        wegfallend = KategorieModel.name.not_in([k for k, _ in kategorien])
+    zaehler["kategorien_entfernt"] = (
+        KategorieModel.select().where((KategorieModel.reise == vorhanden.id) & wegfallend).count()
+    )
+    return zaehler
+
+
+# Importiert eine Reise. Trägt sie die uid einer vorhandenen Reise (erneut
+# geteilte Liste), wird sie hineingeführt und nur die Unterschiede geschrieben;
+# als_kopie legt stattdessen immer eine neue Reise an.
+# Gibt die Reise und die Zähler des Zusammenführens zurück (None = neu angelegt).
+def reise_importieren(data: dict, als_kopie: bool = False) -> tuple:
+    uid = None if als_kopie else _import_uid(data)
+    vorhanden = _import_ziel(uid)
+    if vorhanden is not None:
+        zaehler = _zusammenfuehren(vorhanden.id, data)
+        reise_cache.invalidieren(vorhanden.id)
+        return ReiseModel.get_by_id(vorhanden.id), zaehler
+    if "entfernt" in data:
+        raise ValueError("Delta-Import für eine unbekannte Reise")
+
+    # Eine Transaktion: schneller und kein halb importierter Stand bei Fehlern
+    with ReiseModel._meta.database.atomic():
+        # uid übernehmen, außer sie gehört einer gelöschten Reise, die noch nicht entfernt wurde
+        if uid and ReiseModel.select().where(ReiseModel.uid == uid).exists():
+            uid = None
+        r = ReiseModel.create(uid=uid or neue_reise_uid(), **_import_kopf(data))
+        for kat_name, items in _import_kategorien(data):
+            kat = KategorieModel.create(name=kat_name, reise=r)
+            for g in items:
+                GegenstandModel.create(kategorie=kat, **{**g, "uid": g["uid"] or neue_gegenstand_uid()})
+    return r, None
+
+
+# Erstellt eine Reise aus einem Dictionary (JSON-Import); siehe reise_importieren
+def import_reise_from_dict(data: dict) -> ReiseModel:
+    return reise_importieren(data)[0]
@@ -0,0 +1,203 @@
+from collections import OrderedDict
+from threading import RLock
+from typing import Callable, Optional
+
+from database import ReiseModel, KategorieModel, GegenstandModel, gegenstand_name, mit_katalog
+
+
+# === Reise-Baum laden ========================================================
+
+# Lädt eine Reise inkl. Kategorien, Items und Zählern mit drei Queries
+# (statt einer Query pro Kategorie bzw. pro Zähler wie beim ORM-Zugriff)
+def reise_baum_laden(reise_id: int) -> Optional[dict]:
+    r = ReiseModel.aktive().where(ReiseModel.id == reise_id).first()
+    if r is None:
+        return None
+
+    kategorien = []
+    kat_index = {}
+    for kat_id, kat_name in (
+        KategorieModel.select(KategorieModel.id, KategorieModel.name)
+        .where(KategorieModel.reise == r.id)
+        .order_by(KategorieModel.id)
+        .tuples()
+    ):
+        kat = {
+            "id": kat_id,
+            "name": kat_name,
+            "gegenstaende": [],
+            "gepackt": 0,
+            "gesamt": 0,
+            "menge_gepackt": 0,
+            "menge_gesamt": 0,
+        }
+        kategorien.append(kat)
+        kat_index[kat_id] = kat
+
+    query = GegenstandModel.select(
+        GegenstandModel.id,
+        gegenstand_name(),
+        GegenstandModel.menge,
+        GegenstandModel.gepackt,
+        GegenstandModel.menge_gepackt,
+        GegenstandModel.kategorie,
+    ).join(KategorieModel)
+    for g_id, g_name, menge, gepackt, menge_gepackt, kat_id in (
+        mit_katalog(query)
+        .where(KategorieModel.reise == r.id)
+        .order_by(GegenstandModel.id)
+        .tuples()
+    ):
+        kat = kat_index[kat_id]
+        kat["gegenstaende"].append(
+            {
+                "id": g_id,
+                "name": g_name,
+                "menge": int(menge),
+                "gepackt": bool(gepackt),
+                "menge_gepackt": int(menge_gepackt),
+            }
+        )
+        kat["gesamt"] += 1
+        kat["gepackt"] += 1 if gepackt else 0
+        kat["menge_gesamt"] += int(menge)
+        kat["menge_gepackt"] += int(menge_gepackt)
+
+    return {
+        "id": r.id,
+        "name": r.name,
+        "ziel": r.ziel,
+        "startdatum": r.startdatum,
+        "enddatum": r.enddatum,
+        "beschreibung": r.beschreibung,
+        "revision": r.revision,
+        "geaendert_am": r.geaendert_am,
+        "kategorien": kategorien,
+        "gesamt": sum(k["gesamt"] for k in kategorien),
+        "gepackt": sum(k["gepackt"] for k in kategorien),
+        "menge_gesamt": sum(k["menge_gesamt"] for k in kategorien),
+        "menge_gepackt": sum(k["menge_gepackt"] for k in kategorien),
+    }
+
+
+# Prozentualer Fortschritt eines Baums bzw. einer Kategorie (wie fortschritt_berechnen)
+def baum_fortschritt(knoten: dict, modus: str = "anzahl") -> int:
+    gepackt, gesamt = ("menge_gepackt", "menge_gesamt") if modus == "menge" else ("gepackt", "gesamt")
+    if knoten[gesamt] == 0:
+        return 0
+    return int(round(knoten[gepackt] / knoten[gesamt] * 100))
+
+
+# === LRU-Cache ===============================================================
+
+# Begrenzter LRU-Cache für vollständig geladene Reise-Bäume.
+# Lesen: holen() lädt bei einem Fehlschlag über den Loader nach.
+# Schreiben: Jeder Schreibpfad ruft invalidieren() oder gegenstand_patchen() auf.
+class ReiseBaumCache:
+    def __init__(
+        self,
+        max_eintraege: int = 128,
+        loader: Callable[[int], Optional[dict]] = reise_baum_laden,
+    ):
+        self.max_eintraege = max_eintraege
+        self._loader = loader
+        self._eintraege: "OrderedDict[int, dict]" = OrderedDict()
+        # Pro Reise: Item-ID -> (Kategorie, Item) für gezieltes Patchen
+        self._items: dict = {}
+        # Pro Reise: Zähler, den invalidieren() erhöht (leeren() erhöht _epoche).
+        # holen() verwirft einen Baum, wenn sich einer davon während des Ladens
+        # geändert hat: er könnte dann den Stand vor dem Schreiben zeigen.
+        self._generation: dict = {}
+        self._epoche = 0
+        self._lock = RLock()
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self.verdraengungen = 0
+
+    # Gibt den Baum einer Reise zurück (None, falls die Reise nicht existiert)
+    def holen(self, reise_id: int) -> Optional[dict]:
+        reise_id = int(reise_id)
+        with self._lock:
+            baum = self._eintraege.get(reise_id)
+            if baum is not None:
+                self._eintraege.move_to_end(reise_id)
+                self.treffer += 1
+                return baum
+            self.fehlschlaege += 1
+            stand = (self._epoche, self._generation.get(reise_id, 0))
+
+        baum = self._loader(reise_id)
+        if baum is None:
+            return None
+
+        with self._lock:
+            if stand != (self._epoche, self._generation.get(reise_id, 0)):
+                # Während des Ladens invalidiert: zurückgeben, aber nicht cachen
+                return baum
+            self._eintraege[reise_id] = baum
+            self._eintraege.move_to_end(reise_id)
+            self._items[reise_id] = {
+                g["id"]: (kat, g) for kat in baum["kategorien"] for g in kat["gegenstaende"]
+            }
+            while len(self._eintraege) > self.max_eintraege:
+                alt_id, _ = self._eintraege.popitem(last=False)
+                self._items.pop(alt_id, None)
+                self.verdraengungen += 1
+        return baum
+
+    # Entfernt eine Reise aus dem Cache (nächster Zugriff lädt neu)
+    def invalidieren(self, reise_id: int):
+        with self._lock:
+            self._eintraege.pop(int(reise_id), None)
+            self._items.pop(int(reise_id), None)
+            self._generation[int(reise_id)] = self._generation.get(int(reise_id), 0) + 1
+
+    # Aktualisiert menge/gepackt/menge_gepackt eines gecachten Items inkl. Zähler
+    # (und optional die neue Revision der Reise). Die Werte kommen aus der DB
+    # (z.B. packmenge_setzen), der Cache rechnet nur die Differenzen nach.
+    def gegenstand_patchen(self, reise_id: int, item_id: int, revision: Optional[int] = None, **aenderungen):
+        with self._lock:
+            baum = self._eintraege.get(int(reise_id))
+            eintrag = self._items.get(int(reise_id), {}).get(int(item_id))
+            if baum is None or eintrag is None:
+                # Unbekanntes Item -> lieber neu laden als falsch anzeigen
+                self.invalidieren(reise_id)
+                return
+            kat, g = eintrag
+            if revision is not None:
+                baum["revision"] = revision
+            vorher = (int(g["gepackt"]), g["menge"], g["menge_gepackt"])
+            if "menge" in aenderungen:
+                g["menge"] = int(aenderungen["menge"])
+            if "gepackt" in aenderungen:
+                g["gepackt"] = bool(aenderungen["gepackt"])
+            if "menge_gepackt" in aenderungen:
+                g["menge_gepackt"] = int(aenderungen["menge_gepackt"])
+            for knoten in (kat, baum):
+                knoten["gepackt"] += int(g["gepackt"]) - vorher[0]
+                knoten["menge_gesamt"] += g["menge"] - vorher[1]
+                knoten["menge_gepackt"] += g["menge_gepackt"] - vorher[2]
+
+    # Leert den kompletten Cache (z.B. nach einem Import mehrerer Reisen)
+    def leeren(self):
+        with self._lock:
+            self._eintraege.clear()
+            self._items.clear()
+            self._epoche += 1
+
+    # Zähler für das Monitoring
+    def statistik(self) -> dict:
+        with self._lock:
+            zugriffe = self.treffer + self.fehlschlaege
+            return {
+                "eintraege": len(self._eintraege),
+                "max_eintraege": self.max_eintraege,
+                "treffer": self.treffer,
+                "fehlschlaege": self.fehlschlaege,
+                "verdraengungen": self.verdraengungen,
+                "trefferquote": round(self.treffer / zugriffe, 3) if zugriffe else 0.0,
+            }
+
+
+# Globale Instanz, die von der UI genutzt wird
+reise_cache = ReiseBaumCache()
@@ -1,13 +1,25 @@
+import hashlib
+import json
+import os
+import secrets
+from datetime import date, datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
 from peewee import (
+    JOIN,
     Model,
     SqliteDatabase,
     AutoField,
+    Case,
     CharField,
     DateField,
+    DateTimeField,
     TextField,
     IntegerField,
+    FloatField,
     BooleanField,
     ForeignKeyField,
+    fn,
 )
 
 
@@ -15,6 +27,30 @@ from peewee import (
 db = SqliteDatabase("app.db", pragmas={"foreign_keys": 1})
 
 
+# Aktuelle Zeit als naive UTC-Zeit (so wird sie in SQLite gespeichert)
+def jetzt_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Zufällige, stabile IDs für Export/Import (siehe reise_zusammenfuehren): Reisen
+# brauchen eine weltweit eindeutige ID, Items nur eine innerhalb ihrer Reise
+REISE_UID_BYTES = 16
+GEGENSTAND_UID_BYTES = 6
+
+
+def neue_reise_uid() -> str:
+    return secrets.token_hex(REISE_UID_BYTES)
+
+
+def neue_gegenstand_uid() -> str:
+    return secrets.token_hex(GEGENSTAND_UID_BYTES)
+
+
+# Dasselbe in SQL, für Backfills und INSERT ... SELECT
+def neue_uid_sql(anzahl_bytes: int):
+    return fn.lower(fn.hex(fn.randomblob(anzahl_bytes)))
+
+
 # Basis-Klasse für alle Modelle, damit sie dieselbe DB nutzen
 class BaseModel(Model):
     class Meta:
@@ -32,15 +68,34 @@ class ReiseModel(BaseModel):
     startdatum = DateField()
     enddatum = DateField()
     beschreibung = TextField(default="")
+    # Soft-Delete: Markierte Reisen werden im Hintergrund entfernt
+    geloescht = BooleanField(default=False, index=True)
+    # ID der Vorlage, aus der die Reise angelegt wurde (für Auswertungen)
+    vorlage_id = CharField(max_length=100, null=True)
+    # Wird bei jeder Änderung an der Reise oder ihren Items hochgezählt (ETags, Export-Cache)
+    revision = IntegerField(default=0)
+    geaendert_am = DateTimeField(null=True, default=jetzt_utc)
+    # Stabile ID über Export/Import hinweg (erneutes Teilen führt die Reise zusammen)
+    uid = CharField(max_length=32, null=True, unique=True, default=neue_reise_uid)
+
+    # Alle nicht gelöschten Reisen
+    @classmethod
+    def aktive(cls):
+        return cls.select().where(cls.geloescht == False)  # noqa: E712
 
     # Berechnet, wie viel Prozent der Items gepackt sind
-    def fortschritt_berechnen(self) -> int:  # Typ-Hint auf int geändert
-        total = sum(len(k.gegenstaende) for k in self.kategorien)
+    # (modus="menge": gewichtet nach Menge, siehe FORTSCHRITT_MODI)
+    def fortschritt_berechnen(self, modus: str = "anzahl") -> int:  # Typ-Hint auf int geändert
+        if modus == "menge":
+            total = sum(g.menge for k in self.kategorien for g in k.gegenstaende)
+            gepackt = sum(g.menge_gepackt for k in self.kategorien for g in k.gegenstaende)
+        else:
+            total = sum(len(k.gegenstaende) for k in self.kategorien)
+            gepackt = sum(
+                sum(1 for g in k.gegenstaende if g.gepackt) for k in self.kategorien
+            )
         if total == 0:
             return 0
-        gepackt = sum(
-            sum(1 for g in k.gegenstaende if g.gepackt) for k in self.kategorien
-        )
         # Erst runden, dann in Integer (Ganzzahl) umwandeln
         return int(round(gepackt / total * 100))
 
@@ -63,15 +118,644 @@ class KategorieModel(BaseModel):
         return len(self.gegenstaende)
 
 
+# Namenskatalog: Jeder Item-Name ("Socken", "Ladekabel", ...) steht nur einmal in
+# der DB, Items verweisen per ID darauf
+class GegenstandNameModel(BaseModel):
+    class Meta:
+        table_name = "gegenstand_namen"
+
+    id = AutoField()
+    name = CharField(max_length=200, unique=True)
+
+
 # Ein einzelnes Item (z.B. "Socken") in einer Kategorie
 class GegenstandModel(BaseModel):
     class Meta:
         table_name = "gegenstaende"
 
     id = AutoField()
+    # Im Modus "kompakt" leer, der Name steht dann nur im Katalog (siehe gegenstand_name())
     name = CharField(max_length=200)
     menge = IntegerField(default=1)
+    # gepackt = vollständig gepackt; menge_gepackt erlaubt "3 von 7 Socken"
     gepackt = BooleanField(default=False)
+    menge_gepackt = IntegerField(default=0)
+    # Aus der Vorlage übernommen (z.B. 1 Paar Socken pro Tag); None = feste Menge
+    menge_pro_tag = FloatField(null=True)
     kategorie = ForeignKeyField(
         KategorieModel, backref="gegenstaende", on_delete="CASCADE"
     )
+    katalog = ForeignKeyField(
+        GegenstandNameModel, null=True, backref="gegenstaende", index=True
+    )
+    # Stabile ID innerhalb der Reise (Kopien einer Reise behalten sie)
+    uid = CharField(max_length=12, null=True, index=True, default=neue_gegenstand_uid)
+
+    # Trägt den Namen beim Speichern in den Katalog ein (je nach NAMENSKATALOG)
+    # und hält gepackt/menge_gepackt zueinander konsistent
+    def save(self, *args, **kwargs):
+        self.menge_gepackt, self.gepackt = packstatus(self.menge, self.menge_gepackt, self.gepackt)
+        name = self.name
+        if NAMENSKATALOG == "aus" or not name:
+            return super().save(*args, **kwargs)
+        # Nachschlagen nur für neue oder umbenannte Items
+        if self.katalog_id is None or "name" in self._dirty:
+            self.katalog = katalog_id(name)
+        if NAMENSKATALOG != "kompakt":
+            return super().save(*args, **kwargs)
+        # Leer nur in der DB, das Objekt behält seinen Namen
+        self.__data__["name"] = ""
+        try:
+            return super().save(*args, **kwargs)
+        finally:
+            self.__data__["name"] = name
+
+
+# Gepackte Menge und Gepackt-Status nach einer Änderung: Vollständig gepackte
+# Items bleiben es auch bei geänderter Menge, teilweise gepackte werden auf die
+# Menge begrenzt und gelten als gepackt, sobald alles drin ist.
+def packstatus(menge: int, menge_gepackt: int, gepackt: bool) -> tuple:
+    menge = max(1, int(menge or 1))
+    if gepackt:
+        return menge, True
+    menge_gepackt = min(max(0, int(menge_gepackt or 0)), menge)
+    return menge_gepackt, menge_gepackt >= menge
+
+
+# === Namenskatalog ============================================================
+# "aus":     nur die Spalte gegenstaende.name wird genutzt (altes Verhalten)
+# "an":      zusätzlich wird katalog_id gesetzt (schnelles Gruppieren nach Name)
+# "kompakt": der Name steht nur noch im Katalog, gegenstaende.name bleibt leer
+NAMENSKATALOG = os.environ.get("PACKATTACK_NAMENSKATALOG", "an")
+
+# Anzahl Items pro Transaktion beim nachträglichen Kompaktieren
+KATALOG_BATCH = 2000
+
+
+# ID eines Namens im Katalog; legt ihn bei Bedarf an
+def katalog_id(name: str) -> int:
+    name = name.strip()
+    row = GegenstandNameModel.get_or_none(GegenstandNameModel.name == name)
+    if row is not None:
+        return row.id
+    GegenstandNameModel.insert(name=name).on_conflict_ignore().execute()
+    return GegenstandNameModel.get(GegenstandNameModel.name == name).id
+
+
+# Name eines Items unabhängig vom Speichermodus. Braucht einen LEFT JOIN auf den
+# Katalog, siehe mit_katalog().
+def gegenstand_name():
+    return fn.COALESCE(fn.NULLIF(GegenstandModel.name, ""), GegenstandNameModel.name)
+
+
+# Ergänzt eine Query über GegenstandModel um den Join auf den Namenskatalog
+def mit_katalog(query):
+    return query.join_from(GegenstandModel, GegenstandNameModel, JOIN.LEFT_OUTER)
+
+
+# Trägt alle Namen der angegebenen Items in den Katalog ein und setzt katalog_id
+# (zwei Statements, unabhängig von der Anzahl Items; im Modus "kompakt" ein
+# drittes, das die Namen leert). Für Items, die ohne save() eingefügt wurden.
+def katalog_zuordnen(item_ids: Iterable[int]) -> int:
+    item_ids = list(item_ids)
+    if not item_ids or NAMENSKATALOG == "aus":
+        return 0
+    GegenstandNameModel.insert_from(
+        GegenstandModel.select(GegenstandModel.name)
+        .where(GegenstandModel.id.in_(item_ids) & (GegenstandModel.name != ""))
+        .distinct(),
+        [GegenstandNameModel.name],
+    ).on_conflict_ignore().execute()
+    zugeordnet = (
+        GegenstandModel.update(
+            katalog=GegenstandNameModel.select(GegenstandNameModel.id).where(
+                GegenstandNameModel.name == GegenstandModel.name
+            )
+        )
+        .where(GegenstandModel.id.in_(item_ids) & (GegenstandModel.name != ""))
+        .execute()
+    )
+    if NAMENSKATALOG == "kompakt":
+        GegenstandModel.update(name="").where(
+            GegenstandModel.id.in_(item_ids) & GegenstandModel.katalog.is_null(False)
+        ).execute()
+    return zugeordnet
+
+
+# Katalogisiert die noch nicht zugeordneten Items einer Reise, z.B. nach einem
+# insert_many() oder INSERT ... SELECT, die save() umgehen
+def reise_katalogisieren(reise_id: int) -> int:
+    return katalog_zuordnen(
+        g_id
+        for (g_id,) in GegenstandModel.select(GegenstandModel.id)
+        .where(
+            GegenstandModel.kategorie.in_(
+                KategorieModel.select(KategorieModel.id).where(KategorieModel.reise == reise_id)
+            )
+            & GegenstandModel.katalog.is_null()
+            & (GegenstandModel.name != "")
+        )
+        .tuples()
+    )
+
+
+# Leert gegenstaende.name für einen Batch bereits katalogisierter Items.
+# Gibt die Anzahl geänderter Zeilen zurück (0 = fertig). Die Datei schrumpft
+# erst nach einem VACUUM, freie Seiten werden aber sofort wiederverwendet.
+def namen_kompaktieren(batch: int = KATALOG_BATCH) -> int:
+    with GegenstandModel._meta.database.atomic():
+        ids = [
+            row[0]
+            for row in GegenstandModel.select(GegenstandModel.id)
+            .where((GegenstandModel.name != "") & GegenstandModel.katalog.is_null(False))
+            .limit(batch)
+            .tuples()
+        ]
+        if not ids:
+            return 0
+        return GegenstandModel.update(name="").where(GegenstandModel.id.in_(ids)).execute()
+
+
+# Häufigkeit aller Item-Namen über alle aktiven Reisen, gruppiert über die
+# Katalog-ID (Integer) statt über den Text
+def namen_haeufigkeit(limit: Optional[int] = None):
+    query = (
+        GegenstandNameModel.select(GegenstandNameModel.name, fn.COUNT(GegenstandModel.id).alias("anzahl"))
+        .join(GegenstandModel)
+        .join(KategorieModel)
+        .join(ReiseModel)
+        .where(ReiseModel.geloescht == False)  # noqa: E712
+        .group_by(GegenstandNameModel.id)
+        .order_by(fn.COUNT(GegenstandModel.id).desc(), GegenstandNameModel.name)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+# === Revision ================================================================
+
+# Zählt die Revision einer Reise hoch und gibt die neue Revision zurück
+# (None, falls die Reise nicht existiert)
+def revision_erhoehen(reise_id: int) -> Optional[int]:
+    query = (
+        ReiseModel.update(revision=ReiseModel.revision + 1, geaendert_am=jetzt_utc())
+        .where(ReiseModel.id == reise_id)
+        .returning(ReiseModel.revision)
+    )
+    for r in query.execute():
+        return r.revision
+    return None
+
+
+# === Aggregierte Abfragen =====================================================
+
+# Fortschritt nach Anzahl Items oder gewichtet nach Menge (10 T-Shirts zählen
+# dann zehnmal so viel wie ein Reisepass). Wählbar pro Benutzer.
+FORTSCHRITT_MODI = {"anzahl": "Anzahl", "menge": "Menge"}
+
+
+# Aktive Reisen inkl. Item-Zählern (Attribute gesamt/gepackt sowie
+# menge_gesamt/menge_gepackt) mit einer einzigen Query statt
+# fortschritt_berechnen() pro Reise
+def reisen_mit_fortschritt(offset: int = 0, limit: Optional[int] = None):
+    query = (
+        ReiseModel.select(
+            ReiseModel,
+            fn.COUNT(GegenstandModel.id).alias("gesamt"),
+            fn.COALESCE(fn.SUM(GegenstandModel.gepackt), 0).alias("gepackt"),
+            fn.COALESCE(fn.SUM(GegenstandModel.menge), 0).alias("menge_gesamt"),
+            fn.COALESCE(fn.SUM(GegenstandModel.menge_gepackt), 0).alias("menge_gepackt"),
+        )
+        .join(KategorieModel, JOIN.LEFT_OUTER)
+        .join(GegenstandModel, JOIN.LEFT_OUTER)
+        .where(ReiseModel.geloescht == False)  # noqa: E712
+        .group_by(ReiseModel.id)
+        .order_by(ReiseModel.id)
+        .offset(offset)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+# Fortschritt in Prozent aus den Zählern (wie ReiseModel.fortschritt_berechnen)
+def fortschritt_prozent(gepackt: int, gesamt: int) -> int:
+    if not gesamt:
+        return 0
+    return int(round(gepackt / gesamt * 100))
+
+
+# Fortschritt einer Zeile aus reisen_mit_fortschritt() im gewählten Modus
+def reise_fortschritt(r: ReiseModel, modus: str = "anzahl") -> int:
+    if modus == "menge":
+        return fortschritt_prozent(r.menge_gepackt, r.menge_gesamt)
+    return fortschritt_prozent(r.gepackt, r.gesamt)
+
+
+# === Bulk-Operationen =========================================================
+# Jede Operation ist genau ein UPDATE bzw. DELETE über eine Unterabfrage auf die
+# Kategorien der Reise. Rückgabe ist jeweils die Anzahl betroffener Zeilen.
+
+def _kategorien_der_reise(reise_id: int):
+    return KategorieModel.select(KategorieModel.id).where(KategorieModel.reise == reise_id)
+
+
+# Neue Werte für "ganz gepackt" bzw. "gar nicht gepackt" (menge_gepackt folgt der Menge)
+def _packen_werte(gepackt: bool) -> dict:
+    return {
+        GegenstandModel.gepackt: bool(gepackt),
+        GegenstandModel.menge_gepackt: GegenstandModel.menge if gepackt else 0,
+    }
+
+
+# Bedingung für Items, die sich durch _packen_werte(gepackt) ändern würden
+def _packen_noetig(gepackt: bool):
+    if gepackt:
+        return GegenstandModel.gepackt == False  # noqa: E712
+    return (GegenstandModel.gepackt == True) | (GegenstandModel.menge_gepackt > 0)  # noqa: E712
+
+
+# Neue Werte eines Items nach einem UPDATE ... RETURNING (None = unbekanntes Item)
+def _item_werte(query) -> Optional[dict]:
+    query = query.returning(GegenstandModel.menge, GegenstandModel.menge_gepackt, GegenstandModel.gepackt)
+    for g in query.execute():
+        return {"menge": g.menge, "menge_gepackt": g.menge_gepackt, "gepackt": bool(g.gepackt)}
+    return None
+
+
+# Packt ein einzelnes Item ganz ein bzw. aus; gibt die neuen Werte zurück
+def gegenstand_packen(item_id: int, gepackt: bool = True) -> Optional[dict]:
+    return _item_werte(GegenstandModel.update(_packen_werte(gepackt)).where(GegenstandModel.id == item_id))
+
+
+# Setzt die gepackte Menge eines Items (begrenzt auf 0..menge) und daraus den
+# Gepackt-Status, in einem Statement; gibt die neuen Werte zurück
+def packmenge_setzen(item_id: int, anzahl: int) -> Optional[dict]:
+    anzahl = max(0, int(anzahl))
+    return _item_werte(
+        GegenstandModel.update(
+            menge_gepackt=fn.MIN(anzahl, GegenstandModel.menge),
+            gepackt=GegenstandModel.menge <= anzahl,
+        ).where(GegenstandModel.id == item_id)
+    )
+
+
+# Setzt den Gepackt-Status mehrerer Items einer Reise; fremde Items werden ignoriert
+def gegenstaende_packen(reise_id: int, item_ids: List[int], gepackt: bool = True) -> int:
+    if not item_ids:
+        return 0
+    return (
+        GegenstandModel.update(_packen_werte(gepackt))
+        .where(
+            GegenstandModel.id.in_(list(item_ids))
+            & GegenstandModel.kategorie.in_(_kategorien_der_reise(reise_id))
+        )
+        .execute()
+    )
+
+
+# Markiert alle Items einer Kategorie der Reise als gepackt bzw. ungepackt
+def kategorie_packen(reise_id: int, kat_id: int, gepackt: bool = True) -> int:
+    return (
+        GegenstandModel.update(_packen_werte(gepackt))
+        .where(
+            (GegenstandModel.kategorie == kat_id)
+            & GegenstandModel.kategorie.in_(_kategorien_der_reise(reise_id))
+            & _packen_noetig(gepackt)
+        )
+        .execute()
+    )
+
+
+# Setzt die ganze Reise auf "nichts gepackt" zurück
+def reise_zuruecksetzen(reise_id: int) -> int:
+    return (
+        GegenstandModel.update(_packen_werte(False))
+        .where(
+            GegenstandModel.kategorie.in_(_kategorien_der_reise(reise_id))
+            & _packen_noetig(False)
+        )
+        .execute()
+    )
+
+
+# Löscht alle bereits gepackten Items der Reise
+def gepackte_loeschen(reise_id: int) -> int:
+    return (
+        GegenstandModel.delete()
+        .where(
+            GegenstandModel.kategorie.in_(_kategorien_der_reise(reise_id))
+            & (GegenstandModel.gepackt == True)  # noqa: E712
+        )
+        .execute()
+    )
+
+
+# Fasst gleichnamige Items innerhalb einer Kategorie zu einer Zeile zusammen
+# (Mengen und gepackte Mengen werden addiert). Gibt die Anzahl entfernter Zeilen zurück.
+def doppelte_zusammenfassen(reise_id: int) -> int:
+    name = gegenstand_name()
+    gruppen = (
+        mit_katalog(
+            GegenstandModel.select(
+                fn.MIN(GegenstandModel.id),
+                fn.GROUP_CONCAT(GegenstandModel.id),
+                fn.SUM(GegenstandModel.menge),
+                fn.SUM(GegenstandModel.menge_gepackt),
+            )
+        )
+        .where(GegenstandModel.kategorie.in_(_kategorien_der_reise(reise_id)))
+        .group_by(GegenstandModel.kategorie, name)
+        .having(fn.COUNT(GegenstandModel.id) > 1)
+        .tuples()
+    )
+    entfernt = 0
+    with GegenstandModel._meta.database.atomic():
+        for behalten, ids, menge, menge_gepackt in list(gruppen):
+            GegenstandModel.update(
+                menge=menge, menge_gepackt=menge_gepackt, gepackt=menge_gepackt >= menge
+            ).where(GegenstandModel.id == behalten).execute()
+            andere = [int(i) for i in str(ids).split(",") if int(i) != behalten]
+            entfernt += GegenstandModel.delete().where(GegenstandModel.id.in_(andere)).execute()
+    return entfernt
+
+
+# === Duplizieren ==============================================================
+
+# Reisedauer in Tagen (inklusive Starttag)
+def reisedauer_tage(start: date, ende: date) -> int:
+    return max(1, (ende - start).days + 1)
+
+
+# Empfohlene Menge für eine Reise von `tage` Tagen bei `faktor` Stück pro Tag
+def menge_fuer_tage(faktor: float, tage: int) -> int:
+    return int(max(1, round(tage * float(faktor))))
+
+
+# Zeilen eines Models (z.B. die Kategorien einer Reise) mit laufender Nummer
+# nach ID als CTE. Zwei solche CTEs ordnen beim Kopieren per INSERT ... SELECT
+# alte und neue Zeilen einander zu (die neuen IDs entstehen in derselben Reihenfolge).
+def nach_id_nummeriert(model, bedingung, name: str):
+    return (
+        model.select(model.id, fn.ROW_NUMBER().over(order_by=[model.id]).alias("nr"))
+        .where(bedingung)
+        .cte(name)
+    )
+
+
+# Kopiert eine Reise samt Kategorien und Items mit drei INSERT ... SELECT, ohne
+# die Items durch Python zu schleusen. Wird nur startdatum angegeben, bleibt die
+# Dauer gleich; ändert sie sich, werden Mengen mit menge_pro_tag neu berechnet.
+# Gibt None zurück, wenn die Reise nicht (mehr) existiert.
+def reise_duplizieren(
+    reise_id: int,
+    name: Optional[str] = None,
+    startdatum: Optional[date] = None,
+    enddatum: Optional[date] = None,
+    zuruecksetzen: bool = True,
+) -> Optional["ReiseModel"]:
+    alt = ReiseModel.aktive().where(ReiseModel.id == reise_id).first()
+    if alt is None:
+        return None
+    start = startdatum or alt.startdatum
+    ende = enddatum or start + (alt.enddatum - alt.startdatum)
+    if ende < start:
+        raise ValueError("enddatum liegt vor startdatum")
+    tage = reisedauer_tage(start, ende)
+
+    with ReiseModel._meta.database.atomic():
+        neu = ReiseModel.create(
+            name=name or alt.name,
+            ziel=alt.ziel,
+            startdatum=start,
+            enddatum=ende,
+            beschreibung=alt.beschreibung,
+            vorlage_id=alt.vorlage_id,
+        )
+        KategorieModel.insert_from(
+            KategorieModel.select(KategorieModel.name, neu.id)
+            .where(KategorieModel.reise == reise_id)
+            .order_by(KategorieModel.id),
+            [KategorieModel.name, KategorieModel.reise],
+        ).execute()
+
+        # Mengen nur bei geänderter Dauer neu berechnen (ein CASE je Faktor,
+        # gerundet wie beim Anlegen aus der Vorlage)
+        menge = GegenstandModel.menge
+        if tage != reisedauer_tage(alt.startdatum, alt.enddatum):
+            faktoren = (
+                GegenstandModel.select(GegenstandModel.menge_pro_tag)
+                .where(
+                    GegenstandModel.kategorie.in_(_kategorien_der_reise(reise_id))
+                    & GegenstandModel.menge_pro_tag.is_null(False)
+                )
+                .distinct()
+                .tuples()
+            )
+            faelle = [(f, menge_fuer_tage(f, tage)) for (f,) in faktoren]
+            if faelle:
+                menge = Case(GegenstandModel.menge_pro_tag, faelle, GegenstandModel.menge)
+        if zuruecksetzen:
+            gepackt, menge_gepackt = False, 0
+        else:
+            # wie packstatus(): vollständig gepackte bleiben es, Teilmengen werden begrenzt
+            gepackt = GegenstandModel.gepackt | (GegenstandModel.menge_gepackt >= menge)
+            menge_gepackt = Case(
+                None, [(GegenstandModel.gepackt, menge)], fn.MIN(GegenstandModel.menge_gepackt, menge)
+            )
+
+        # Alte und neue Kategorien über ihre laufende Nummer zuordnen
+        k_alt = nach_id_nummeriert(KategorieModel, KategorieModel.reise == reise_id, "k_alt")
+        k_neu = nach_id_nummeriert(KategorieModel, KategorieModel.reise == neu.id, "k_neu")
+        GegenstandModel.insert_from(
+            GegenstandModel.select(
+                GegenstandModel.name,
+                GegenstandModel.katalog,
+                menge,
+                gepackt,
+                menge_gepackt,
+                GegenstandModel.menge_pro_tag,
+                GegenstandModel.uid,
+                k_neu.c.id,
+            )
+            .join(k_alt, on=(k_alt.c.id == GegenstandModel.kategorie))
+            .join(k_neu, on=(k_neu.c.nr == k_alt.c.nr))
+            .with_cte(k_alt, k_neu)
+            .order_by(GegenstandModel.id),
+            [
+                GegenstandModel.name,
+                GegenstandModel.katalog,
+                GegenstandModel.menge,
+                GegenstandModel.gepackt,
+                GegenstandModel.menge_gepackt,
+                GegenstandModel.menge_pro_tag,
+                GegenstandModel.uid,
+                GegenstandModel.kategorie,
+            ],
+        ).execute()
+        # Kopierte Items, deren Original noch nicht im Katalog stand
+        reise_katalogisieren(neu.id)
+    return neu
+
+
+# === Zusammenführen (Delta-Import) ============================================
+
+# Kurzer Hash über alles, was ein Item ausmacht. Gleicher Hash = nichts zu tun;
+# beide Seiten eines Abgleichs können so Items vergleichen, ohne sie zu übertragen.
+def gegenstand_hash(
+    kategorie: str, name: str, menge: int, gepackt: bool, menge_gepackt: int, menge_pro_tag: Optional[float]
+) -> str:
+    menge_gepackt, gepackt = packstatus(menge, menge_gepackt, gepackt)
+    werte = [kategorie, name, max(1, int(menge)), gepackt, menge_gepackt, menge_pro_tag]
+    return hashlib.blake2b(json.dumps(werte, ensure_ascii=False).encode("utf-8"), digest_size=8).hexdigest()
+
+
+# Items einer Reise: uid -> (id, hash). Items ohne uid werden übergangen.
+def _gegenstaende_mit_hash(reise_id: int) -> dict:
+    query = mit_katalog(
+        GegenstandModel.select(
+            GegenstandModel.uid,
+            GegenstandModel.id,
+            KategorieModel.name,
+            gegenstand_name(),
+            GegenstandModel.menge,
+            GegenstandModel.gepackt,
+            GegenstandModel.menge_gepackt,
+            GegenstandModel.menge_pro_tag,
+        ).join(KategorieModel)
+    ).where((KategorieModel.reise == reise_id) & GegenstandModel.uid.is_null(False))
+    return {uid: (g_id, gegenstand_hash(*werte)) for uid, g_id, *werte in query.tuples()}
+
+
+# Hashes aller Items einer Reise (uid -> hash), z.B. für einen Delta-Export
+def reise_hashes(reise_id: int) -> dict:
+    return {uid: h for uid, (_, h) in _gegenstaende_mit_hash(reise_id).items()}
+
+
+# Führt eine importierte Fassung in eine bestehende Reise zusammen und schreibt
+# nur die Unterschiede: neue Items anlegen, geänderte (anderer Hash) aktualisieren,
+# fehlende löschen. kategorien: [(name, [item, ...])], Items mit den Schlüsseln
+# uid, name, menge, gepackt, menge_gepackt, menge_pro_tag.
+# Ohne "entfernt" ist die Fassung vollständig (was fehlt, wird gelöscht); mit
+# "entfernt" ist es ein Delta, gelöscht werden dann nur die genannten uids und
+# die Kategorien in kategorien_entfernt. kopf=None lässt die Kopfdaten stehen.
+# Gibt die Anzahl neuer/geänderter/entfernter/unveränderter Items zurück.
+def reise_zusammenfuehren(
+    reise_id: int,
+    kopf: Optional[dict],
+    kategorien: List[Tuple[str, List[dict]]],
+    entfernt: Optional[Iterable[str]] = None,
+    kategorien_entfernt: Optional[Iterable[str]] = None,
+) -> dict:
+    zaehler = {"neu": 0, "geaendert": 0, "entfernt": 0, "unveraendert": 0}
+    with ReiseModel._meta.database.atomic():
+        r = ReiseModel.get_by_id(reise_id)
+        kopf_geaendert = {k: v for k, v in (kopf or {}).items() if getattr(r, k) != v}
+        if kopf_geaendert:
+            ReiseModel.update(kopf_geaendert).where(ReiseModel.id == reise_id).execute()
+
+        vorhanden = _gegenstaende_mit_hash(reise_id)
+        kat_ids = {}
+        for kat_id, kat_name in (
+            KategorieModel.select(KategorieModel.id, KategorieModel.name)
+            .where(KategorieModel.reise == reise_id)
+            .order_by(KategorieModel.id.desc())  # bei doppelten Namen gewinnt die erste
+            .tuples()
+        ):
+            kat_ids[kat_name] = kat_id
+
+        gesehen = set()
+        kategorien_geaendert = 0
+        for kat_name, items in kategorien:
+            if kat_name not in kat_ids:
+                kat_ids[kat_name] = KategorieModel.create(name=kat_name, reise=reise_id).id
+                kategorien_geaendert += 1
+            for g in items:
+                uid = g.get("uid") or neue_gegenstand_uid()
+                gesehen.add(uid)
+                werte = dict(
+                    name=g["name"],
+                    menge=g["menge"],
+                    gepackt=g["gepackt"],
+                    menge_gepackt=g["menge_gepackt"],
+                    menge_pro_tag=g["menge_pro_tag"],
+                )
+                alt = vorhanden.get(uid)
+                if alt is None:
+                    GegenstandModel.create(uid=uid, kategorie=kat_ids[kat_name], **werte)
+                    zaehler["neu"] += 1
+                elif alt[1] != gegenstand_hash(kat_name, **werte):
+                    # save() statt update(): Namenskatalog und Packstatus wie beim Bearbeiten
+                    GegenstandModel(id=alt[0], uid=uid, kategorie=kat_ids[kat_name], **werte).save()
+                    zaehler["geaendert"] += 1
+                else:
+                    zaehler["unveraendert"] += 1
+
+        if entfernt is None:
+            loeschen = [g_id for uid, (g_id, _) in vorhanden.items() if uid not in gesehen]
+        else:
+            loeschen = [vorhanden[uid][0] for uid in set(entfernt) - gesehen if uid in vorhanden]
+        if loeschen:
+            zaehler["entfernt"] = GegenstandModel.delete().where(GegenstandModel.id.in_(loeschen)).execute()
+        if entfernt is None:
+            # Kategorien, die in der importierten Fassung fehlen
+            kategorien_geaendert += KategorieModel.delete().where(
+                (KategorieModel.reise == reise_id) & KategorieModel.name.not_in([k for k, _ in kategorien])
+            ).execute()
+        elif kategorien_entfernt:
+            kategorien_geaendert += KategorieModel.delete().where(
+                (KategorieModel.reise == reise_id) & KategorieModel.name.in_(list(kategorien_entfernt))
+            ).execute()
+        if kopf_geaendert or kategorien_geaendert or zaehler["neu"] or zaehler["geaendert"] or zaehler["entfernt"]:
+            revision_erhoehen(reise_id)
+    return zaehler
+
+
+# === Soft-Delete & Purge ======================================================
+
+# Anzahl Zeilen, die pro Purge-Schritt (= pro Transaktion) gelöscht werden
+PURGE_BATCH = 500
+
+
+# Markiert eine Reise als gelöscht (ein einzelnes UPDATE, sofort sichtbar)
+def reise_als_geloescht_markieren(reise_id: int) -> bool:
+    return bool(
+        ReiseModel.update(geloescht=True).where(ReiseModel.id == reise_id).execute()
+    )
+
+
+# Entfernt einen Batch Zeilen einer gelöschten Reise: erst Items, dann Kategorien,
+# zuletzt die Reise selbst. Gibt die Anzahl gelöschter Zeilen zurück (0 = fertig).
+def geloeschte_reisen_purgen(batch: int = PURGE_BATCH) -> int:
+    # Über das Model, damit auch an eine andere DB gebundene Modelle (Tests) passen
+    with ReiseModel._meta.database.atomic():
+        r = (
+            ReiseModel.select(ReiseModel.id)
+            .where(ReiseModel.geloescht == True)  # noqa: E712
+            .order_by(ReiseModel.id)
+            .first()
+        )
+        if r is None:
+            return 0
+
+        items = (
+            GegenstandModel.select(GegenstandModel.id)
+            .join(KategorieModel)
+            .where(KategorieModel.reise == r.id)
+            .limit(batch)
+        )
+        n = GegenstandModel.delete().where(GegenstandModel.id.in_(items)).execute()
+        if n:
+            return n
+
+        kategorien = (
+            KategorieModel.select(KategorieModel.id)
+            .where(KategorieModel.reise == r.id)
+            .limit(batch)
+        )
+        n = KategorieModel.delete().where(KategorieModel.id.in_(kategorien)).execute()
+        if n:
+            return n
+
+        return ReiseModel.delete().where(ReiseModel.id == r.id).execute()
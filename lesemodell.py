@@ -0,0 +1,185 @@
+from datetime import date
+from typing import List, Optional
+
+from database import ReiseModel, KategorieModel, GegenstandModel, gegenstand_name, mit_katalog
+
+
+# Kompaktes, schreibgeschütztes Lesemodell für komplette Reise-Bäume.
+#
+# peewee-Instanzen tragen pro Objekt mehrere Dicts/Sets (__data__, _dirty,
+# __rel__, ...), normale Klassen zumindest ein __dict__. Für Exporte und
+# Auswertungen über viele Reisen reichen einfache Objekte mit __slots__:
+# feste Attribute, kein __dict__, deutlich weniger Speicher pro Item
+# (Messung: Benchmarks/lesemodell_speicher.py).
+
+
+class GegenstandLesen:
+    __slots__ = ("id", "name", "menge", "gepackt", "menge_gepackt", "menge_pro_tag", "uid")
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        menge: int,
+        gepackt: bool,
+        menge_gepackt: int,
+        menge_pro_tag: Optional[float] = None,
+        uid: Optional[str] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.menge = menge
+        self.gepackt = gepackt
+        self.menge_gepackt = menge_gepackt
+        self.menge_pro_tag = menge_pro_tag
+        self.uid = uid
+
+    # Ein Item im Exportformat; "menge_gepackt" nur bei teilweise gepackten Items und
+    # "menge_pro_tag" nur falls gesetzt, damit ältere Versionen den Export weiter lesen können
+    def als_export(self, mit_uid: bool = True) -> dict:
+        item = {"name": self.name, "menge": self.menge, "gepackt": self.gepackt}
+        if not self.gepackt and self.menge_gepackt:
+            item["menge_gepackt"] = self.menge_gepackt
+        if self.menge_pro_tag is not None:
+            item["menge_pro_tag"] = self.menge_pro_tag
+        if mit_uid and self.uid:
+            item["uid"] = self.uid
+        return item
+
+    def __repr__(self):
+        return f"GegenstandLesen({self.id}, {self.name!r}, {self.menge_gepackt}/{self.menge})"
+
+
+class KategorieLesen:
+    __slots__ = ("id", "name", "gegenstaende")
+
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.gegenstaende: List[GegenstandLesen] = []
+
+    def als_export(self, mit_uid: bool = True) -> dict:
+        return {"name": self.name, "gegenstaende": [g.als_export(mit_uid) for g in self.gegenstaende]}
+
+    def __repr__(self):
+        return f"KategorieLesen({self.id}, {self.name!r}, {len(self.gegenstaende)} Gegenstände)"
+
+
+class ReiseLesen:
+    __slots__ = ("id", "name", "ziel", "startdatum", "enddatum", "beschreibung", "uid", "kategorien")
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        ziel: str,
+        startdatum: date,
+        enddatum: date,
+        beschreibung: str,
+        uid: Optional[str] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.ziel = ziel
+        self.startdatum = startdatum
+        self.enddatum = enddatum
+        self.beschreibung = beschreibung
+        self.uid = uid
+        self.kategorien: List[KategorieLesen] = []
+
+    def gegenstaende(self):
+        return (g for k in self.kategorien for g in k.gegenstaende)
+
+    # Gleiche Berechnung wie ReiseModel.fortschritt_berechnen, aber ohne Queries
+    def fortschritt_berechnen(self, modus: str = "anzahl") -> int:
+        total = gepackt = 0
+        if modus == "menge":
+            for g in self.gegenstaende():
+                total += g.menge
+                gepackt += g.menge_gepackt
+        else:
+            for g in self.gegenstaende():
+                total += 1
+                gepackt += 1 if g.gepackt else 0
+        if total == 0:
+            return 0
+        return int(round(gepackt / total * 100))
+
+    # Reise im Format von export_reise_to_dict; mit_uid=False lässt die IDs für
+    # den Abgleich weg (der Import legt dann immer eine neue Reise an)
+    def als_export(self, mit_uid: bool = True) -> dict:
+        daten = {
+            "name": self.name,
+            "ziel": self.ziel,
+            "startdatum": self.startdatum.isoformat(),
+            "enddatum": self.enddatum.isoformat(),
+            "beschreibung": self.beschreibung,
+            "kategorien": [k.als_export(mit_uid) for k in self.kategorien],
+        }
+        if mit_uid and self.uid:
+            daten["uid"] = self.uid
+        return daten
+
+    def __repr__(self):
+        return f"ReiseLesen({self.id}, {self.name!r}, {len(self.kategorien)} Kategorien)"
+
+
+# Lädt alle aktiven Reisen (oder genau die angegebenen IDs, dann auch gelöschte)
+# mit drei Queries als Lesemodell, unabhängig von der Anzahl Reisen
+def reisen_lesen(reise_ids: Optional[List[int]] = None) -> List[ReiseLesen]:
+    query = ReiseModel.select(
+        ReiseModel.id,
+        ReiseModel.name,
+        ReiseModel.ziel,
+        ReiseModel.startdatum,
+        ReiseModel.enddatum,
+        ReiseModel.beschreibung,
+        ReiseModel.uid,
+    )
+    if reise_ids is None:
+        query = query.where(ReiseModel.geloescht == False)  # noqa: E712
+    else:
+        query = query.where(ReiseModel.id.in_(list(reise_ids)))
+    reisen = [ReiseLesen(*zeile) for zeile in query.order_by(ReiseModel.id).tuples()]
+    reise_index = {r.id: r for r in reisen}
+    if not reisen:
+        return reisen
+
+    kat_index = {}
+    for kat_id, kat_name, rid in (
+        KategorieModel.select(KategorieModel.id, KategorieModel.name, KategorieModel.reise)
+        .where(KategorieModel.reise.in_(list(reise_index)))
+        .order_by(KategorieModel.reise, KategorieModel.id)
+        .tuples()
+    ):
+        kat = kat_index[kat_id] = KategorieLesen(kat_id, kat_name)
+        reise_index[rid].kategorien.append(kat)
+
+    items = (
+        mit_katalog(
+            GegenstandModel.select(
+                GegenstandModel.kategorie,
+                GegenstandModel.id,
+                gegenstand_name(),
+                GegenstandModel.menge,
+                GegenstandModel.gepackt,
+                GegenstandModel.menge_gepackt,
+                GegenstandModel.menge_pro_tag,
+                GegenstandModel.uid,
+            ).join(KategorieModel)
+        )
+        .where(KategorieModel.reise.in_(list(reise_index)))
+        .order_by(KategorieModel.reise, KategorieModel.id, GegenstandModel.id)
+        .tuples()
+    )
+    for kat_id, g_id, name, menge, gepackt, menge_gepackt, menge_pro_tag, uid in items:
+        kat_index[kat_id].gegenstaende.append(
+            GegenstandLesen(g_id, name, int(menge), bool(gepackt), int(menge_gepackt), menge_pro_tag, uid)
+        )
+    return reisen
+
+
+# Eine einzelne Reise als Lesemodell (None, falls es sie nicht gibt)
+def reise_lesen(reise_id: int) -> Optional[ReiseLesen]:
+    reisen = reisen_lesen([reise_id])
+    return reisen[0] if reisen else None
@@ -1,19 +1,70 @@
-from datetime import datetime, date
+from collections import OrderedDict
+from datetime import datetime, date, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import asyncio
+import functools
+import hashlib
 import json
+import logging
+import sys
 from pathlib import Path
-from typing import List, Optional
-from nicegui import ui, app as ng_app
+from typing import Callable, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, Response
+from nicegui import ui, app as ng_app, run, background_tasks
 import os
 
 # Import der Datenbank-Modelle aus der separaten Datei
-from database import db, ReiseModel, KategorieModel, GegenstandModel
+from database import (
+    db,
+    ReiseModel,
+    KategorieModel,
+    GegenstandModel,
+    reise_als_geloescht_markieren,
+    geloeschte_reisen_purgen,
+    reisen_mit_fortschritt,
+    reise_fortschritt,
+    FORTSCHRITT_MODI,
+    gegenstaende_packen,
+    kategorie_packen,
+    reise_zuruecksetzen,
+    gepackte_loeschen,
+    gegenstand_packen,
+    packmenge_setzen,
+    doppelte_zusammenfassen,
+    reise_duplizieren,
+    reisedauer_tage,
+    menge_fuer_tage,
+    revision_erhoehen,
+    reise_katalogisieren,
+)
+from cache import reise_cache, baum_fortschritt
+from austausch import (
+    datum_lesen,
+    export_delta,
+    export_reise_to_dict,
+    import_vorschau,
+    reise_importieren,
+)
+from teilcode import import_text_lesen, teilcode_erstellen
+from statistik import haeufigste_gegenstaende, oft_vergessen, fortschritt_pro_ziel
+from sync import aenderungen_seit, SYNC_BATCH
+from vorlagen import (
+    VorlagenIndex,
+    VorlagenVerzeichnis,
+    eigene_vorlage_laden,
+    eigene_vorlage_loeschen,
+    reise_als_vorlage_speichern,
+    vorlagen_aufloesen,
+)
+
+log = logging.getLogger(__name__)
 
 
 # === Helper Funktionen ========================================================
 
 # Wandelt einen String (YYYY-MM-DD) in ein Python date-Objekt um
 def _parse_date(value: str):
-    return datetime.strptime(value, "%Y-%m-%d").date()
+    return datum_lesen(value)
 
 
 # Gibt den Pfad zur vorlagen.json Datei zurück
@@ -34,22 +85,63 @@ def lade_vorlagen() -> List[dict]:
             v.setdefault("id", "")
             v.setdefault("name", "")
             v.setdefault("kategorien", [])
-        return vorlagen
+        # Gemeinsame Bausteine einmal auflösen (das Ergebnis cacht vorlagen_index)
+        return vorlagen_aufloesen(vorlagen, data.get("bausteine", []))
     except Exception:
         return []
 
 
-# Sucht eine bestimmte Vorlage anhand der ID
+# Vorlagen-Verzeichnis mit einer Datei pro Vorlage (siehe vorlagen.py). Existiert
+# dort eine index.json, ersetzt es vorlagen.json; anlegen mit
+# "python vorlagen.py aufteilen".
+vorlagen_verzeichnis = VorlagenVerzeichnis(
+    Path(os.getenv("PACKATTACK_VORLAGEN_VERZEICHNIS") or Path(__file__).with_name("vorlagen_bibliothek"))
+)
+
+
+# Änderungszeit der Vorlagen-Quelle (None, falls keine vorhanden ist)
+def _vorlagen_mtime() -> Optional[int]:
+    if vorlagen_verzeichnis.aktiv():
+        return vorlagen_verzeichnis.index_mtime()
+    try:
+        return _vorlagen_datei().stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+# Aus dem Verzeichnis nur die Köpfe (Inhalt lädt finde_vorlage), sonst die ganze Datei
+def _vorlagen_quelle() -> List[dict]:
+    if vorlagen_verzeichnis.aktiv():
+        return vorlagen_verzeichnis.koepfe()
+    return lade_vorlagen()
+
+
+# Index aller Vorlagen (Datei bzw. Verzeichnis + eigene aus der DB), siehe vorlagen.VorlagenIndex
+vorlagen_index = VorlagenIndex(lambda: _vorlagen_mtime(), lambda: _vorlagen_quelle())
+
+
+# Gibt die Vorlagen zurück; die Datei wird erst bei der ersten Nutzung gelesen
+# und danach nur erneut, wenn sie sich geändert hat
+def vorlagen_holen() -> List[dict]:
+    return vorlagen_index.holen()
+
+
+# Sucht eine bestimmte Vorlage anhand der ID (eigene Vorlagen bzw. Vorlagen aus
+# dem Verzeichnis werden dabei erst vollständig geladen)
 def finde_vorlage(vorlagen: List[dict], vorlage_id: str) -> Optional[dict]:
     for v in vorlagen:
         if v.get("id") == vorlage_id:
+            if v.get("eigene"):
+                return eigene_vorlage_laden(vorlage_id)
+            if v.get("verzeichnis"):
+                return vorlagen_verzeichnis.laden(vorlage_id)
             return v
     return None
 
 
 # Berechnet die Dauer der Reise in Tagen (inklusive Starttag)
 def _reisedauer_tage(start: date, ende: date) -> int:
-    return max(1, (ende - start).days + 1)
+    return reisedauer_tage(start, ende)
 
 
 # Berechnet die Menge basierend auf Reisedauer (falls konfiguriert)
@@ -57,9 +149,7 @@ def _berechne_menge(g_item: dict, start: date, ende: date) -> int:
     try:
         tage = _reisedauer_tage(start, ende)
         if "menge_pro_tag" in g_item and g_item["menge_pro_tag"] is not None:
-            faktor = float(g_item.get("menge_pro_tag", 0))
-            menge = int(max(1, round(tage * faktor)))
-            return menge
+            return menge_fuer_tage(g_item["menge_pro_tag"], tage)
         # Fallback: feste Menge aus der Vorlage
         menge = int(g_item.get("menge", 1))
         return max(1, menge)
@@ -68,68 +158,134 @@ def _berechne_menge(g_item: dict, start: date, ende: date) -> int:
 
 
 # === Import / Export Logik ====================================================
+# Die Logik selbst liegt in austausch.py
+
+# Meldung für die UI nach einem Import
+def import_meldung(r: ReiseModel, zaehler: Optional[dict]) -> str:
+    if zaehler is None:
+        return f"Reise „{r.name}“ importiert"
+    return (
+        f"Reise „{r.name}“ aktualisiert: {zaehler['neu']} neu, "
+        f"{zaehler['geaendert']} geändert, {zaehler['entfernt']} entfernt"
+    )
 
-# Wandelt eine Reise inkl. Kategorien und Items in ein Dictionary um (für JSON-Export)
-def export_reise_to_dict(r: ReiseModel) -> dict:
-    return {
-        "name": r.name,
-        "ziel": r.ziel,
-        "startdatum": r.startdatum.isoformat(),
-        "enddatum": r.enddatum.isoformat(),
-        "beschreibung": r.beschreibung,
-        "kategorien": [
-            {
-                "name": kat.name,
-                "gegenstaende": [
-                    {
-                        "name": g.name,
-                        "menge": int(g.menge),
-                        "gepackt": bool(g.gepackt),
-                    }
-                    for g in kat.gegenstaende.order_by(GegenstandModel.id)
-                ],
-            }
-            for kat in r.kategorien.order_by(KategorieModel.id)
-        ],
-    }
-
-
-# Erstellt eine neue Reise aus einem Dictionary (JSON-Import)
-def import_reise_from_dict(data: dict) -> ReiseModel:
-    start = data.get("startdatum") or date.today().isoformat()
-    ende = data.get("enddatum") or start
 
-    r = ReiseModel.create(
-        name=data.get("name", "Importierte Reise"),
-        ziel=data.get("ziel", ""),
-        startdatum=_parse_date(start),
-        enddatum=_parse_date(ende),
-        beschreibung=data.get("beschreibung", ""),
+# Rückfrage, bevor ein Import lokale Items oder Kategorien löscht (siehe
+# import_vorschau); None, wenn nichts gelöscht würde
+def import_rueckfrage(vorschau: Optional[dict]) -> Optional[str]:
+    if vorschau is None or not (vorschau["entfernt"] or vorschau["kategorien_entfernt"]):
+        return None
+    return (
+        f"Die Reise gibt es schon. Zusammenführen: {vorschau['neu']} neu, "
+        f"{vorschau['geaendert']} geändert – und {vorschau['entfernt']} Gegenstände sowie "
+        f"{vorschau['kategorien_entfernt']} Kategorien, die im Import fehlen, werden gelöscht."
     )
 
-    for k in data.get("kategorien", []):
-        kat = KategorieModel.create(
-            name=k.get("name", "Kategorie"),
-            reise=r,
+
+# Legt eine Reise an, optional mit Kategorien + Items aus einer Vorlage
+def reise_anlegen(
+    name: str,
+    ziel: str,
+    start: date,
+    ende: date,
+    beschreibung: str = "",
+    vorlage: Optional[dict] = None,
+) -> ReiseModel:
+    with ReiseModel._meta.database.atomic():
+        r = ReiseModel.create(
+            name=name,
+            ziel=ziel,
+            startdatum=start,
+            enddatum=ende,
+            beschreibung=beschreibung,
+            vorlage_id=(vorlage or {}).get("id"),
         )
-        for g in k.get("gegenstaende", []):
-            name = (g.get("name") or "").strip()
-            if not name:
+        # Items gesammelt mit einem INSERT, danach einmal katalogisieren
+        zeilen = []
+        for kat in (vorlage or {}).get("kategorien", []):
+            kname = str(kat.get("name", "")).strip()
+            if not kname:
                 continue
-            menge = g.get("menge", 1)
-            try:
-                menge = max(1, int(menge))
-            except Exception:
-                menge = 1
-            GegenstandModel.create(
-                name=name,
-                menge=menge,
-                gepackt=bool(g.get("gepackt", False)),
-                kategorie=kat,
-            )
+            krow = KategorieModel.create(name=kname, reise=r)
+            for g in kat.get("gegenstaende", []):
+                gname = str(g.get("name", "")).strip()
+                if not gname:
+                    continue
+                menge = _berechne_menge(g, start, ende)
+                zeilen.append(
+                    {"name": gname, "menge": menge, "menge_pro_tag": g.get("menge_pro_tag"), "kategorie": krow}
+                )
+        if zeilen:
+            GegenstandModel.insert_many(zeilen).execute()
+            reise_katalogisieren(r.id)
     return r
 
 
+# === Änderungen & Export-Cache ================================================
+
+# Jede Änderung an einer bestehenden Reise läuft hierüber: schreiben() und die
+# Revisionserhöhung laufen in derselben Transaktion, danach wird der Cache
+# gepatcht (item_id + die von schreiben() gelieferten Felder) bzw. invalidiert.
+# Liefert das Ergebnis von schreiben(); mit item_id heißt None "nichts geändert".
+def reise_aendern(reise_id: int, schreiben: Callable, item_id: Optional[int] = None):
+    with ReiseModel._meta.database.atomic():
+        ergebnis = schreiben()
+        if item_id is not None and ergebnis is None:
+            return None
+        revision = revision_erhoehen(reise_id)
+    if item_id is not None:
+        reise_cache.gegenstand_patchen(reise_id, item_id, revision=revision, **ergebnis)
+    else:
+        reise_cache.invalidieren(reise_id)
+    return ergebnis
+
+
+# Serialisierte Exporte: (reise_id, format) -> (revision, text)
+EXPORT_CACHE_GROESSE = 64
+# "json": lesbar eingerückt, "kompakt": minifiziert (API), "teilcode": komprimiert zum Verschicken
+EXPORT_FORMATE = ("json", "kompakt", "teilcode")
+_export_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+# Revision und Änderungszeit einer aktiven Reise (eine kleine Query, None = unbekannt)
+def reise_revision(reise_id: int) -> Optional[tuple]:
+    row = (
+        ReiseModel.aktive()
+        .select(ReiseModel.revision, ReiseModel.geaendert_am)
+        .where(ReiseModel.id == reise_id)
+        .tuples()
+        .first()
+    )
+    return row
+
+
+# Export einer Reise als Text (siehe EXPORT_FORMATE); wird nur neu serialisiert,
+# wenn sich die Revision seit dem letzten Export geändert hat
+def export_text(reise_id: int, format: str = "json") -> Optional[str]:
+    if format not in EXPORT_FORMATE:
+        raise ValueError(f"Unbekanntes Exportformat: {format}")
+    stand = reise_revision(reise_id)
+    if stand is None:
+        return None
+    schluessel = (int(reise_id), format)
+    eintrag = _export_cache.get(schluessel)
+    if eintrag is not None and eintrag[0] == stand[0]:
+        _export_cache.move_to_end(schluessel)
+        return eintrag[1]
+
+    data = export_reise_to_dict(ReiseModel.get_by_id(reise_id))
+    if format == "teilcode":
+        text = teilcode_erstellen(data)
+    elif format == "kompakt":
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+    _export_cache[schluessel] = (stand[0], text)
+    while len(_export_cache) > EXPORT_CACHE_GROESSE:
+        _export_cache.popitem(last=False)
+    return text
+
+
 # === NiceGUI UI Logik =========================================================
 
 # Öffnet die DB-Verbindung für den aktuellen Request
@@ -144,6 +300,79 @@ def _ui_db_close():
         db.close()
 
 
+# Fortschritts-Modus des Benutzers ("anzahl" oder "menge"), im User-Storage gespeichert
+def _fortschritt_modus() -> str:
+    modus = ng_app.storage.user.get("fortschritt_modus", "anzahl")
+    return modus if modus in FORTSCHRITT_MODI else "anzahl"
+
+
+# Umschalter für den Fortschritts-Modus im Header; speichert die Wahl und rendert neu
+def _modus_umschalter(on_change: Callable[[], None]):
+    def setzen(e):
+        ng_app.storage.user["fortschritt_modus"] = e.value
+        on_change()
+
+    ui.toggle(FORTSCHRITT_MODI, value=_fortschritt_modus(), on_change=setzen).props(
+        "dense flat color=white toggle-color=white text-color=white"
+    ).tooltip("Fortschritt nach Anzahl Items oder nach Menge gewichtet")
+
+
+# Wiederverwendbarer Bestätigungsdialog. Der Klick-Handler des "Löschen"-Buttons
+# wird genau einmal gebunden; fragen() merkt sich nur die aktuell ausstehende
+# Aktion, die beim Bestätigen höchstens einmal ausgeführt wird.
+class BestaetigungsDialog:
+    def __init__(self, button_text: str = "Löschen"):
+        self._aktion: Optional[Callable[[], None]] = None
+        self._alternative: Optional[Callable[[], None]] = None
+        self._button_text = button_text
+        with ui.dialog() as self.dialog, ui.card():
+            self.nachricht = ui.label("Sicher löschen?")
+            with ui.row().classes("justify-end w-full mt-2"):
+                ui.button("Abbrechen", on_click=self.abbrechen).props(
+                    "outlined color=primary"
+                ).style("background-color: transparent;")
+                self.button_alternativ = ui.button("", on_click=self.alternativ_waehlen).props(
+                    "outlined color=primary"
+                ).style("background-color: transparent;")
+                self.button_alternativ.set_visibility(False)
+                self.button_ja = ui.button(button_text, on_click=self.bestaetigen).props(
+                    "color=negative"
+                )
+
+    # Öffnet den Dialog für eine Aktion (ersetzt eine evtl. noch offene Aktion);
+    # button_text beschriftet den Bestätigen-Button nur für diese Frage,
+    # alternative = (Beschriftung, Aktion) zeigt einen dritten Button
+    def fragen(
+        self,
+        aktion: Callable[[], None],
+        text: str = "Sicher löschen?",
+        button_text: Optional[str] = None,
+        alternative: Optional[Tuple[str, Callable[[], None]]] = None,
+    ):
+        self._aktion = aktion
+        self._alternative = alternative[1] if alternative else None
+        self.nachricht.text = text
+        self.button_ja.text = button_text or self._button_text
+        self.button_alternativ.text = alternative[0] if alternative else ""
+        self.button_alternativ.set_visibility(alternative is not None)
+        self.dialog.open()
+
+    def _ausfuehren(self, aktion: Optional[Callable[[], None]]):
+        self._aktion = self._alternative = None
+        self.dialog.close()
+        if aktion is not None:
+            aktion()
+
+    def bestaetigen(self):
+        self._ausfuehren(self._aktion)
+
+    def alternativ_waehlen(self):
+        self._ausfuehren(self._alternative)
+
+    def abbrechen(self):
+        self._ausfuehren(None)
+
+
 # Startseite: Zeigt alle vorhandenen Reisen an
 @ui.page("/")
 def ui_index():
@@ -153,6 +382,7 @@ def ui_index():
     with ui.header().classes("items-center justify-between px-4"):
         ui.label("🧳 PackAttack").classes("text-xl font-semibold")
         with ui.row().classes("items-center gap-3"):
+            _modus_umschalter(lambda: refresh())
             dark = ui.dark_mode()
             dark.bind_value(ng_app.storage.user, "dark_mode_enabled")
             ui.icon("light_mode").classes("text-white")
@@ -194,14 +424,17 @@ def ui_index():
         _sync_end_min_and_fix()
         beschr = ui.textarea("Beschreibung").classes("w-full")
 
-        # Vorlagen laden
-        vorlagen = lade_vorlagen()
-        name_to_id = {
-            v.get("name", f"Vorlage {i+1}"): v.get("id", "")
+        # Vorlagen laden (ID -> angezeigter Name; eigene Vorlagen gekennzeichnet)
+        vorlagen = vorlagen_holen()
+        optionen = {
+            v.get("id", ""): v.get("name") or f"Vorlage {i+1}"
             for i, v in enumerate(vorlagen)
         }
+        for v in vorlagen:
+            if v.get("eigene"):
+                optionen[v["id"]] += " (eigene)"
         select_vorlage = ui.select(
-            options=list(name_to_id.keys()), label="Vorlage (optional)"
+            options=optionen, label="Vorlage (optional)"
         ).props("clearable")
 
         with ui.row().classes("justify-end w-full mt-2"):
@@ -222,29 +455,19 @@ def ui_index():
                     if e < s:
                         ui.notify("Enddatum darf nicht vor dem Startdatum liegen.", type="warning")
                         return
-                    r = ReiseModel.create(
-                        name=(name.value or "").strip(),
+                    # Falls Vorlage gewählt, Kategorien + Items mit anlegen
+                    chosen = select_vorlage.value
+                    v = finde_vorlage(vorlagen, chosen) if chosen else None
+                    r = reise_anlegen(
+                        name=clean_name,
                         ziel=(ziel.value or "").strip(),
-                        startdatum=s,
-                        enddatum=e,
+                        start=s,
+                        ende=e,
                         beschreibung=beschr.value or "",
+                        vorlage=v,
                     )
-                    # Falls Vorlage gewählt, Kategorien + Items anlegen
-                    chosen = select_vorlage.value
-                    if chosen:
-                        vorlage_id = name_to_id.get(chosen, "")
-                        v = finde_vorlage(vorlagen, vorlage_id)
-                        if v:
-                            for kat in v.get("kategorien", []):
-                                kname = str(kat.get("name", "")).strip()
-                                if not kname: continue
-                                krow = KategorieModel.create(name=kname, reise=r)
-                                for g in kat.get("gegenstaende", []):
-                                    gname = str(g.get("name", "")).strip()
-                                    if not gname: continue
-                                    menge = _berechne_menge(g, s, e)
-                                    GegenstandModel.create(name=gname, menge=menge, kategorie=krow)
 
+                    reise_cache.invalidieren(r.id)
                     ui.notify(f"Reise „{r.name}“ erstellt", type="positive")
                     dlg_new.close()
                     ui.navigate.to(f"/reise/{r.id}")
@@ -256,27 +479,100 @@ def ui_index():
             ).style("background-color: transparent;")
 
     # -- Dialog: Import --
+    import_bestaetigung = BestaetigungsDialog()
     with ui.dialog() as dlg_import, ui.card().classes("w-[520px]"):
         ui.label("Reise importieren").classes("text-lg font-semibold")
-        import_area = ui.textarea("Hier den exportierten Text einfügen").classes("w-full h-64")
+        import_area = ui.textarea("Hier den exportierten Text oder Teilen-Code einfügen").classes("w-full h-64")
 
-        def do_import():
+        def importieren(data: dict, als_kopie: bool = False):
             try:
-                raw = import_area.value or ""
-                data = json.loads(raw)
-                new_reise = import_reise_from_dict(data)
-                ui.notify(f"Reise „{new_reise.name}“ importiert", type="positive")
+                new_reise, zaehler = reise_importieren(data, als_kopie)
+                reise_cache.invalidieren(new_reise.id)
+                ui.notify(import_meldung(new_reise, zaehler), type="positive")
                 dlg_import.close()
                 ui.navigate.to(f"/reise/{new_reise.id}")
             except Exception as e:
                 ui.notify(f"Import fehlgeschlagen: {e}", type="negative")
 
+        # Löscht das Zusammenführen lokale Items/Kategorien, erst nachfragen
+        def do_import():
+            try:
+                raw = import_area.value or ""
+                data = import_text_lesen(raw)
+                frage = import_rueckfrage(import_vorschau(data))
+            except Exception as e:
+                ui.notify(f"Import fehlgeschlagen: {e}", type="negative")
+                return
+            if frage is None:
+                importieren(data)
+                return
+            import_bestaetigung.fragen(
+                lambda: importieren(data),
+                text=frage,
+                button_text="Zusammenführen",
+                alternative=("Als Kopie importieren", lambda: importieren(data, als_kopie=True)),
+            )
+
         with ui.row().classes("justify-end w-full mt-2"):
             ui.button("Abbrechen", on_click=dlg_import.close).props(
                 "outlined color=primary"
             ).style("background-color: transparent;")
             ui.button("Importieren", on_click=do_import).props("color=primary")
 
+    # -- Dialog: Duplizieren --
+    with ui.dialog() as dlg_kopie, ui.card().classes("w-[520px]"):
+        ui.label("Reise duplizieren").classes("text-lg font-semibold")
+        kopie_name = ui.input("Name der Kopie").classes("w-full").props("label-color=grey")
+        with ui.row().classes("w-full"):
+            kopie_start = ui.date().classes("flex-1")
+            kopie_ende = ui.date().classes("flex-1")
+        ui.label(
+            "Mengen mit „pro Tag“ aus der Vorlage werden bei geänderter Dauer neu berechnet."
+        ).classes("text-sm text-gray-500")
+        kopie_reset = ui.checkbox("Alles als ungepackt markieren", value=True)
+        kopie_quelle = {"id": None}
+
+        def kopie_oeffnen(r: ReiseModel):
+            kopie_quelle["id"] = r.id
+            kopie_name.value = f"{r.name} (Kopie)"
+            kopie_start.value = r.startdatum.isoformat()
+            kopie_ende.value = r.enddatum.isoformat()
+            dlg_kopie.open()
+
+        # Verschiebt das Enddatum mit, damit die Dauer gleich bleibt
+        def kopie_start_geaendert(e):
+            try:
+                alt = ReiseModel.get_by_id(kopie_quelle["id"])
+                kopie_ende.value = (date.fromisoformat(e.value) + (alt.enddatum - alt.startdatum)).isoformat()
+            except Exception:
+                pass
+
+        kopie_start.on_value_change(kopie_start_geaendert)
+
+        def kopie_erstellen():
+            try:
+                neu = reise_duplizieren(
+                    kopie_quelle["id"],
+                    name=(kopie_name.value or "").strip() or None,
+                    startdatum=date.fromisoformat(kopie_start.value),
+                    enddatum=date.fromisoformat(kopie_ende.value),
+                    zuruecksetzen=bool(kopie_reset.value),
+                )
+                if neu is None:
+                    ui.notify("Reise nicht gefunden", type="warning")
+                    return
+                ui.notify(f"Reise „{neu.name}“ erstellt", type="positive")
+                dlg_kopie.close()
+                ui.navigate.to(f"/reise/{neu.id}")
+            except Exception as e:
+                ui.notify(f"Fehler: {e}", type="negative")
+
+        with ui.row().classes("justify-end w-full mt-2"):
+            ui.button("Abbrechen", on_click=dlg_kopie.close).props(
+                "outlined color=primary"
+            ).style("background-color: transparent;")
+            ui.button("Duplizieren", on_click=kopie_erstellen).props("color=primary")
+
     # -- Toolbar --
     with ui.row().classes("gap-3 items-center mb-2"):
         ui.button("Neue Reise", on_click=dlg_new.open).props(
@@ -294,29 +590,23 @@ def ui_index():
     # -- Reisenliste --
     container = ui.column().classes("w-full gap-3 mt-3 max-w-screen-md mx-auto")
 
-    with ui.dialog() as dlg_confirm, ui.card():
-        confirm_msg = ui.label("Sicher löschen?")
-        with ui.row().classes("justify-end w-full mt-2"):
-            ui.button("Abbrechen", on_click=dlg_confirm.close).props(
-                "outlined color=primary"
-            ).style("background-color: transparent;")
-            btn_yes = ui.button("Löschen").props("color=negative")
-
-    def confirm_delete(fn, text="Sicher löschen?"):
-        confirm_msg.text = text
-        btn_yes.clear()
-        btn_yes.on("click", lambda: (dlg_confirm.close(), fn()))
-        dlg_confirm.open()
+    confirm_delete = BestaetigungsDialog().fragen
 
     def delete_reise_by_id(rid: int):
         try:
-            ReiseModel.delete_by_id(rid)
+            # Nur markieren; die Zeilen entfernt der Purge-Worker im Hintergrund
+            reise_als_geloescht_markieren(rid)
+            reise_cache.invalidieren(rid)
+            background_tasks.create(purge_im_hintergrund())
             ui.notify("Reise gelöscht", type="warning")
             refresh()
         except Exception as e:
             ui.notify(f"Fehler: {e}", type="negative")
 
-    def card_for_reise(r: ReiseModel):
+    # r stammt aus reisen_mit_fortschritt() und trägt die Zähler gesamt/gepackt
+    # bzw. menge_gesamt/menge_gepackt (keine weitere Query pro Karte)
+    def card_for_reise(r: ReiseModel, modus: str):
+        fortschritt = reise_fortschritt(r, modus)
         with container:
             with ui.card().classes("w-full"):
                 with ui.row().classes("items-start justify-between w-full"):
@@ -332,21 +622,26 @@ def ui_index():
                         with ui.row().classes("items-center gap-2"):
                             ui.icon("task_alt").classes("opacity-70")
                             ui.linear_progress(
-                                value=r.fortschritt_berechnen() / 100
+                                value=fortschritt / 100
                             ).props("color=green").classes("my-1 w-full")
-                            ui.label(f"Fortschritt: {r.fortschritt_berechnen()} %")
-                    ui.button(
-                        icon="delete",
-                        on_click=lambda rid=r.id: confirm_delete(
-                            lambda: delete_reise_by_id(rid),
-                            text=f"Reise „{r.name}“ wirklich löschen?",
-                        ),
-                    ).props("flat round")
+                            ui.label(f"Fortschritt: {fortschritt} %")
+                    with ui.row().classes("gap-0"):
+                        ui.button(icon="content_copy", on_click=lambda r=r: kopie_oeffnen(r)).props(
+                            "flat round"
+                        ).tooltip("Duplizieren")
+                        ui.button(
+                            icon="delete",
+                            on_click=lambda rid=r.id: confirm_delete(
+                                lambda: delete_reise_by_id(rid),
+                                text=f"Reise „{r.name}“ wirklich löschen?",
+                            ),
+                        ).props("flat round")
 
     def refresh():
         container.clear()
-        for r in ReiseModel.select().order_by(ReiseModel.id):
-            card_for_reise(r)
+        modus = _fortschritt_modus()
+        for r in reisen_mit_fortschritt():
+            card_for_reise(r, modus)
 
     refresh()
     _ui_db_close()
@@ -356,7 +651,7 @@ def ui_index():
 @ui.page("/reise/{reise_id}")
 def ui_reise_detail(reise_id: int):
     _ui_db_open()
-    r = ReiseModel.get_or_none(ReiseModel.id == reise_id)
+    r = ReiseModel.aktive().where(ReiseModel.id == reise_id).first()
     if not r:
         ui.label("Reise nicht gefunden").classes("text-red-600")
         _ui_db_close()
@@ -371,6 +666,7 @@ def ui_reise_detail(reise_id: int):
     ):
         ui.link("← Zur Übersicht", "/").classes("text-white")
         ui.label(f"🔖 {r.name}").classes("text-lg font-semibold")
+        _modus_umschalter(lambda: refresh())
 
     with ui.row().classes("items-center gap-3 mt-2"):
         ui.icon("event").classes("opacity-70")
@@ -378,8 +674,9 @@ def ui_reise_detail(reise_id: int):
             f"{r.startdatum.strftime('%d.%m.%Y')} – {r.enddatum.strftime('%d.%m.%Y')}"
         )
 
+    # Wert setzt refresh() aus dem gecachten Baum
     prog = (
-        ui.linear_progress(value=r.fortschritt_berechnen() / 100)
+        ui.linear_progress(value=0)
         .props("color=green")
         .classes("my-2")
     )
@@ -389,45 +686,120 @@ def ui_reise_detail(reise_id: int):
     with ui.dialog() as dlg_export, ui.card().classes("w-[520px]"):
         ui.label("Reise exportieren").classes("text-lg font-semibold")
         export_area = ui.textarea("Export-Daten").classes("w-full h-64")
+        export_format = ui.toggle(
+            {"teilcode": "Teilen-Code", "json": "JSON"}, value="teilcode",
+            on_change=lambda e: export_anzeigen(),
+        ).props("dense")
         ui.label(
-            "Text markieren, kopieren und z.B. per WhatsApp oder Mail verschicken."
+            "Text markieren, kopieren und z.B. per WhatsApp oder Mail verschicken. "
+            "Der kurze Teilen-Code wird beim Import automatisch erkannt."
         ).classes("text-sm text-gray-500 mt-1")
         with ui.row().classes("justify-end w-full mt-2"):
             ui.button("Schließen", on_click=dlg_export.close).props(
                 "outlined color=primary"
             ).style("background-color: transparent;")
 
+    import_bestaetigung = BestaetigungsDialog()
     with ui.dialog() as dlg_import, ui.card().classes("w-[520px]"):
         ui.label("Reise importieren").classes("text-lg font-semibold")
-        import_area = ui.textarea("Hier den exportierten Text einfügen").classes("w-full h-64")
+        import_area = ui.textarea("Hier den exportierten Text oder Teilen-Code einfügen").classes("w-full h-64")
 
-        def do_import():
+        def importieren(data: dict, als_kopie: bool = False):
             try:
-                raw = import_area.value or ""
-                data = json.loads(raw)
-                new_reise = import_reise_from_dict(data)
-                ui.notify(f"Reise „{new_reise.name}“ importiert", type="positive")
+                new_reise, zaehler = reise_importieren(data, als_kopie)
+                reise_cache.invalidieren(new_reise.id)
+                ui.notify(import_meldung(new_reise, zaehler), type="positive")
                 dlg_import.close()
                 ui.navigate.to(f"/reise/{new_reise.id}")
             except Exception as e:
                 ui.notify(f"Import fehlgeschlagen: {e}", type="negative")
 
+        # Löscht das Zusammenführen lokale Items/Kategorien, erst nachfragen
+        def do_import():
+            try:
+                raw = import_area.value or ""
+                data = import_text_lesen(raw)
+                frage = import_rueckfrage(import_vorschau(data))
+            except Exception as e:
+                ui.notify(f"Import fehlgeschlagen: {e}", type="negative")
+                return
+            if frage is None:
+                importieren(data)
+                return
+            import_bestaetigung.fragen(
+                lambda: importieren(data),
+                text=frage,
+                button_text="Zusammenführen",
+                alternative=("Als Kopie importieren", lambda: importieren(data, als_kopie=True)),
+            )
+
         with ui.row().classes("justify-end w-full mt-2"):
             ui.button("Abbrechen", on_click=dlg_import.close).props(
                 "outlined color=primary"
             ).style("background-color: transparent;")
             ui.button("Importieren", on_click=do_import).props("color=primary")
 
+    def export_anzeigen():
+        export_area.value = export_text(reise_id, export_format.value) or ""
+
     def open_export():
-        r_current = ReiseModel.get_by_id(reise_id)
-        data = export_reise_to_dict(r_current)
-        export_area.value = json.dumps(data, ensure_ascii=False, indent=2)
+        export_anzeigen()
         dlg_export.open()
 
+    # --- Als Vorlage speichern ---
+    with ui.dialog() as dlg_vorlage, ui.card().classes("w-[520px]"):
+        ui.label("Als Vorlage speichern").classes("text-lg font-semibold")
+        vorlage_name = ui.input("Name der Vorlage", value=r.name).classes("w-full").props("label-color=grey")
+        ui.label(
+            "Kategorien und Gegenstände werden übernommen, der Packstatus nicht."
+        ).classes("text-sm text-gray-500 mt-1")
+
+        def vorlage_speichern():
+            name = (vorlage_name.value or "").strip()
+            if not name:
+                ui.notify("Bitte einen Namen für die Vorlage eingeben!", type="warning")
+                return
+            try:
+                kopf = reise_als_vorlage_speichern(reise_id, name)
+                if kopf is None:
+                    ui.notify("Reise nicht gefunden", type="warning")
+                    return
+                vorlagen_index.hinzufuegen(kopf)
+                ui.notify(f"Vorlage „{name}“ gespeichert", type="positive")
+                dlg_vorlage.close()
+            except Exception as e:
+                ui.notify(f"Fehler: {e}", type="negative")
+
+        with ui.row().classes("justify-end w-full mt-2"):
+            ui.button("Abbrechen", on_click=dlg_vorlage.close).props(
+                "outlined color=primary"
+            ).style("background-color: transparent;")
+            ui.button("Speichern", on_click=vorlage_speichern).props("color=primary")
+
     with ui.row().classes("gap-2 mt-2 max-w-screen-md mx-auto"):
         ui.button("Reise exportieren", on_click=open_export).props(
             "outlined color=primary"
         ).style("background-color: transparent;")
+        ui.button("Als Vorlage speichern", on_click=dlg_vorlage.open).props(
+            "outlined color=primary"
+        ).style("background-color: transparent;")
+        ui.button(
+            "Alles zurücksetzen",
+            on_click=lambda: confirm_delete(
+                reset_reise,
+                text="Alle Gegenstände wieder als ungepackt markieren?",
+                button_text="Zurücksetzen",
+            ),
+        ).props("outlined color=primary").style("background-color: transparent;")
+        ui.button(
+            "Gepackte löschen",
+            on_click=lambda: confirm_delete(
+                delete_gepackte, text="Alle bereits gepackten Gegenstände löschen?"
+            ),
+        ).props("outlined color=primary").style("background-color: transparent;")
+        ui.button("Doppelte zusammenfassen", on_click=lambda: merge_doppelte()).props(
+            "outlined color=primary"
+        ).style("background-color: transparent;").tooltip("Gleichnamige Einträge einer Kategorie zu einem mit Menge zusammenführen")
 
     # Kategorie anlegen
     with ui.expansion("Kategorie hinzufügen").classes("w-full max-w-screen-md mx-auto"):
@@ -435,7 +807,7 @@ def ui_reise_detail(reise_id: int):
 
         def add_kat():
             if kat_name.value and kat_name.value.strip():
-                KategorieModel.create(name=kat_name.value.strip(), reise=r)
+                reise_aendern(reise_id, lambda: KategorieModel.create(name=kat_name.value.strip(), reise=r))
                 kat_name.value = ""
                 ui.notify("Kategorie erstellt", type="positive")
                 refresh()
@@ -447,101 +819,179 @@ def ui_reise_detail(reise_id: int):
     container = ui.column().classes("w-full mt-2 max-w-screen-md mx-auto")
 
     # Confirm-Dialog
-    with ui.dialog() as dlg_confirm, ui.card():
-        confirm_msg = ui.label("Sicher löschen?")
-        with ui.row().classes("justify-end w-full mt-2"):
-            ui.button("Abbrechen", on_click=dlg_confirm.close).props(
-                "outlined color=primary"
-            ).style("background-color: transparent;")
-            btn_yes = ui.button("Löschen").props("color=negative")
+    confirm_delete = BestaetigungsDialog().fragen
+
+    # Item Logik (jeder Schreibpfad läuft über reise_aendern())
+    # Änderungen an einzelnen Items werden inkrementell angezeigt: Nur die
+    # betroffene Zeile, ihre Kategorie und der Gesamtbalken werden aktualisiert.
+    # Strukturänderungen (Hinzufügen, Löschen, Bulk-Aktionen) rendern neu.
+    item_ui: dict = {}  # Item-ID -> (Kategorie-Dict, Item-Dict, UI-Elemente)
+    kat_ui: dict = {}  # Kategorie-ID -> UI-Elemente
+    gerendert: dict = {}  # "baum": der zuletzt angezeigte Cache-Baum
 
-    def confirm_delete(fn, text="Sicher löschen?"):
-        confirm_msg.text = text
-        def set_yes():
-            dlg_confirm.close()
-            fn()
-        btn_yes.on("click", set_yes)
-        dlg_confirm.open()
+    # schreiben() liefert die geänderten Felder des Items oder None
+    def item_aendern(item_id: int, schreiben: Callable[[], Optional[dict]]):
+        if reise_aendern(reise_id, schreiben, item_id) is not None:
+            anzeigen_aktualisieren(item_id)
 
-    # Item Logik
     def update_menge(item_id: int, delta: int):
-        it = GegenstandModel.get_or_none(GegenstandModel.id == item_id)
-        if it:
+        def schreiben():
+            it = GegenstandModel.get_or_none(GegenstandModel.id == item_id)
+            if it is None:
+                return None
             it.menge = max(1, int(it.menge) + int(delta))
             it.save()
-            refresh()
+            return {"menge": it.menge, "menge_gepackt": it.menge_gepackt, "gepackt": it.gepackt}
+
+        item_aendern(item_id, schreiben)
 
     def toggle_item(item_id: int, cb):
-        it = GegenstandModel.get_or_none(GegenstandModel.id == item_id)
-        if it:
-            it.gepackt = bool(cb.value)
-            it.save()
-            refresh()
+        eintrag = item_ui.get(item_id)
+        # Programmatisches Setzen der Checkbox löst on_change erneut aus
+        if eintrag is not None and eintrag[1]["gepackt"] == bool(cb.value):
+            return
+        item_aendern(item_id, lambda: gegenstand_packen(item_id, bool(cb.value)))
+
+    def packmenge_aendern(item_id: int, delta: int):
+        eintrag = item_ui.get(item_id)
+        if eintrag is not None:
+            item_aendern(item_id, lambda: packmenge_setzen(item_id, eintrag[1]["menge_gepackt"] + delta))
 
     def delete_item(item_id: int):
-        GegenstandModel.delete_by_id(item_id)
+        reise_aendern(reise_id, lambda: GegenstandModel.delete_by_id(item_id))
         refresh()
 
     def delete_category(kat_id: int):
-        KategorieModel.delete_by_id(kat_id)
+        reise_aendern(reise_id, lambda: KategorieModel.delete_by_id(kat_id))
         refresh()
 
-    def add_item(kat: "KategorieModel", name: str, menge: int):
+    def add_item(kat_id: int, name: str, menge: int):
         if name.strip():
-            GegenstandModel.create(
-                name=name.strip(), menge=max(1, int(menge)), kategorie=kat
+            reise_aendern(
+                reise_id,
+                lambda: GegenstandModel.create(name=name.strip(), menge=max(1, int(menge)), kategorie=kat_id),
             )
             ui.notify("Gegenstand hinzugefügt", type="positive")
             refresh()
 
-    def kat_progress(kat: KategorieModel) -> float:
-        total = kat.anzahl_gesamt()
-        if total == 0: return 0.0
-        return round(kat.anzahl_gepackt() / total, 2)
+    # Bulk-Aktionen: ein Statement, eine Invalidierung, ein refresh()
+    def pack_kategorie(kat_id: int, gepackt: bool):
+        reise_aendern(reise_id, lambda: kategorie_packen(reise_id, kat_id, gepackt))
+        refresh()
+
+    def reset_reise():
+        n = reise_aendern(reise_id, lambda: reise_zuruecksetzen(reise_id))
+        ui.notify(f"{n} Gegenstände zurückgesetzt", type="info")
+        refresh()
+
+    def delete_gepackte():
+        n = reise_aendern(reise_id, lambda: gepackte_loeschen(reise_id))
+        ui.notify(f"{n} gepackte Gegenstände gelöscht", type="warning")
+        refresh()
+
+    def merge_doppelte():
+        n = reise_aendern(reise_id, lambda: doppelte_zusammenfassen(reise_id))
+        ui.notify(f"{n} doppelte Einträge zusammengefasst", type="info")
+        refresh()
+
+    def kat_progress(kat: dict, modus: str) -> float:
+        return round(baum_fortschritt(kat, modus) / 100, 2)
+
+    def alle_gepackt(kat: dict) -> bool:
+        return kat["gesamt"] > 0 and kat["gepackt"] == kat["gesamt"]
+
+    def kat_zaehler_text(kat: dict, modus: str) -> str:
+        if modus == "menge":
+            return f"{kat['menge_gepackt']}/{kat['menge_gesamt']} Stück"
+        return f"{kat['gepackt']}/{kat['gesamt']}"
+
+    # Aktualisiert die Anzeige eines Items, seiner Kategorie und den Gesamtbalken
+    # aus dem (bereits gepatchten) Cache-Baum, ohne die Liste neu aufzubauen
+    def anzeigen_aktualisieren(item_id: int):
+        baum = reise_cache.holen(reise_id)
+        eintrag = item_ui.get(item_id)
+        if baum is None or eintrag is None or baum is not gerendert.get("baum"):
+            # Cache wurde neu geladen (z.B. unbekanntes Item) -> komplett neu zeichnen
+            refresh()
+            return
+        kat, it, elemente = eintrag
+        if (it["menge"] > 1) != (elemente["packmenge"] is not None):
+            # Teilweise-packen-Steuerung kommt hinzu bzw. fällt weg -> neu zeichnen
+            refresh()
+            return
+        modus = _fortschritt_modus()
+        elemente["checkbox"].value = it["gepackt"]
+        elemente["menge"].text = f"× {it['menge']}"
+        if elemente["packmenge"] is not None:
+            elemente["packmenge"].text = f"{it['menge_gepackt']}/{it['menge']}"
+        k = kat_ui[kat["id"]]
+        k["zaehler"].text = kat_zaehler_text(kat, modus)
+        k["balken"].value = kat_progress(kat, modus)
+        k["bulk"].props(f"icon={'remove_done' if alle_gepackt(kat) else 'done_all'}")
+        prog.value = baum_fortschritt(baum, modus) / 100
 
     def refresh():
         container.clear()
-        r_ref = ReiseModel.get_by_id(reise_id)
-        prog.value = r_ref.fortschritt_berechnen() / 100
-
-        for kat in r_ref.kategorien.order_by(KategorieModel.id):
+        item_ui.clear()
+        kat_ui.clear()
+        baum = gerendert["baum"] = reise_cache.holen(reise_id)
+        if baum is None:
+            return
+        modus = _fortschritt_modus()
+        prog.value = baum_fortschritt(baum, modus) / 100
+
+        for kat in baum["kategorien"]:
             with container:
                 with ui.card().classes("w-full"):
                     with ui.row().classes("items-center justify-between"):
-                        ui.label(kat.name).classes("text-lg font-semibold")
+                        ui.label(kat["name"]).classes("text-lg font-semibold")
                         ui.button(
                             icon="delete",
-                            on_click=lambda k_id=kat.id, k_name=kat.name: confirm_delete(
+                            on_click=lambda k_id=kat["id"], k_name=kat["name"]: confirm_delete(
                                 lambda: delete_category(k_id),
                                 text=f"Kategorie „{k_name}“ wirklich löschen?",
                             ),
                         ).props("flat round dense")
                         with ui.row().classes("items-center gap-2"):
                             ui.icon("task_alt").classes("opacity-70")
-                            ui.label(f"{kat.anzahl_gepackt()}/{kat.anzahl_gesamt()}")
-                    ui.linear_progress(value=kat_progress(kat)).props("outlined").style(
+                            zaehler = ui.label(kat_zaehler_text(kat, modus))
+                            # Zustand beim Klick lesen, da sich der Baum inkrementell ändert
+                            bulk = ui.button(
+                                icon="remove_done" if alle_gepackt(kat) else "done_all",
+                                on_click=lambda k=kat: pack_kategorie(k["id"], not alle_gepackt(k)),
+                            ).props("flat round dense").tooltip("Alle packen / entpacken")
+                    balken = ui.linear_progress(value=kat_progress(kat, modus)).props("outlined").style(
                         f"background-color: transparent; border-color: #5898d4; color: #5898d4;"
                     ).classes("my-1")
+                    kat_ui[kat["id"]] = {"zaehler": zaehler, "balken": balken, "bulk": bulk}
 
                     # Items
-                    for it in kat.gegenstaende.order_by(GegenstandModel.id):
+                    for it in kat["gegenstaende"]:
                         with ui.row().classes("items-center justify-between w-full"):
                             with ui.row().classes("items-center gap-3"):
-                                ui.checkbox(
-                                    value=bool(it.gepackt),
-                                    on_change=lambda e, item_id=it.id: toggle_item(
+                                checkbox = ui.checkbox(
+                                    value=it["gepackt"],
+                                    on_change=lambda e, item_id=it["id"]: toggle_item(
                                         item_id, e.sender
                                     ),
                                 )
-                                ui.label(it.name).classes("min-w-[160px]")
+                                ui.label(it["name"]).classes("min-w-[160px]")
                                 with ui.row().classes("items-center gap-1"):
-                                    ui.button(icon="remove", on_click=lambda iid=it.id: update_menge(iid, -1)).props("flat round dense")
-                                    ui.label(f"× {int(it.menge)}").classes("w-10 text-center")
-                                    ui.button(icon="add", on_click=lambda iid=it.id: update_menge(iid, +1)).props("flat round dense")
+                                    ui.button(icon="remove", on_click=lambda iid=it["id"]: update_menge(iid, -1)).props("flat round dense")
+                                    menge = ui.label(f"× {it['menge']}").classes("w-10 text-center")
+                                    ui.button(icon="add", on_click=lambda iid=it["id"]: update_menge(iid, +1)).props("flat round dense")
+                                # Teilweise packen ("3/7 gepackt"), nur bei Menge > 1
+                                packmenge = None
+                                if it["menge"] > 1:
+                                    with ui.row().classes("items-center gap-1"):
+                                        ui.button(icon="indeterminate_check_box", on_click=lambda iid=it["id"]: packmenge_aendern(iid, -1)).props("flat round dense").tooltip("Eins weniger gepackt")
+                                        packmenge = ui.label(f"{it['menge_gepackt']}/{it['menge']}").classes("w-12 text-center")
+                                        ui.button(icon="add_box", on_click=lambda iid=it["id"]: packmenge_aendern(iid, +1)).props("flat round dense").tooltip("Eins mehr gepackt")
                             ui.button(
                                 icon="delete",
-                                on_click=lambda iid=it.id: confirm_delete(lambda: delete_item(iid), text=f"„{it.name}“ löschen?"),
+                                on_click=lambda iid=it["id"], iname=it["name"]: confirm_delete(lambda: delete_item(iid), text=f"„{iname}“ löschen?"),
                             ).props("flat round dense")
+                        item_ui[it["id"]] = (kat, it, {"checkbox": checkbox, "menge": menge, "packmenge": packmenge})
 
                     # Neues Item
                     with ui.row().classes("mt-2 items-end"):
@@ -549,34 +999,518 @@ def ui_reise_detail(reise_id: int):
                         new_menge = ui.number("Menge", value=1, min=1, format="%d").classes("w-32")
                         ui.button(
                             "Hinzufügen",
-                            on_click=lambda k=kat, nn=new_name, nm=new_menge: add_item(
+                            on_click=lambda k=kat["id"], nn=new_name, nm=new_menge: add_item(
                                 k, nn.value or "", int(nm.value or 1)
                             ),
                         ).props("outlined color=primary").style("background-color: transparent;")
-
     refresh()
     _ui_db_close()
 
 
+# Monitoring: Zähler des Reise-Caches als JSON
+def status_cache():
+    return reise_cache.statistik()
+
+
+# === JSON-API =================================================================
+# Headless-Zugriff für Skripte und Integrationen, auf denselben Funktionen wie
+# die UI. GET-Antworten tragen ein ETag (If-None-Match -> 304); komprimiert wird
+# über die GZip-Middleware, die ui.run() ohnehin installiert.
+
+api = APIRouter(prefix="/api")
+
+# Maximale Seitengröße für /api/reisen
+API_MAX_PRO_SEITE = 200
+
+
+# Öffnet die DB-Verbindung für einen API-Aufruf und schließt sie danach wieder,
+# wie _ui_db_open/_ui_db_close bei den Seiten. Ein Decorator statt einer
+# Dependency, weil FastAPI Dependency und synchronen Handler in verschiedenen
+# Worker-Threads ausführen kann und peewee die Verbindung pro Thread hält. Über
+# die Datenbank des Models, damit bind_ctx in Tests greift.
+def _mit_db(handler: Callable) -> Callable:
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        verbindung = ReiseModel._meta.database
+        if verbindung.is_closed():
+            verbindung.connect(reuse_if_open=True)
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            if not verbindung.is_closed():
+                verbindung.close()
+    return wrapper
+
+
+# Prüft If-None-Match bzw. If-Modified-Since; liefert eine 304-Antwort oder None
+def _nicht_geaendert(request: Request, etag: str, geaendert_am: Optional[datetime] = None) -> Optional[Response]:
+    if request.method != "GET":
+        return None
+    header = {"ETag": etag}
+    if geaendert_am is not None:
+        header["Last-Modified"] = format_datetime(geaendert_am.replace(tzinfo=timezone.utc), usegmt=True)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        angefragt = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if etag in angefragt or "*" in angefragt:
+            return Response(status_code=304, headers=header)
+        return None
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and geaendert_am is not None:
+        try:
+            seit = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        # asctime-Datumsangaben und "-0000" liefern ein naives datetime (= UTC)
+        if seit.tzinfo is None:
+            seit = seit.replace(tzinfo=timezone.utc)
+        if geaendert_am.replace(tzinfo=timezone.utc, microsecond=0) <= seit:
+            return Response(status_code=304, headers=header)
+    return None
+
+
+# Versions-ETag für Inhalte mit Revision (ohne den Inhalt zu serialisieren)
+def _revisions_etag(art: str, schluessel, revision) -> str:
+    return f'"{art}-{schluessel}-{revision}"'
+
+
+# Serialisiert kompakt und beantwortet bedingte GETs mit 304. Ohne etag wird ein
+# Inhalts-Hash verwendet; mit etag wird vor dem Serialisieren geprüft.
+def _json_antwort(
+    request: Request,
+    daten,
+    status_code: int = 200,
+    etag: Optional[str] = None,
+    geaendert_am: Optional[datetime] = None,
+) -> Response:
+    if etag is not None:
+        antwort = _nicht_geaendert(request, etag, geaendert_am)
+        if antwort is not None:
+            return antwort
+    body = daten if isinstance(daten, bytes) else json.dumps(daten, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if etag is None:
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        antwort = _nicht_geaendert(request, etag)
+        if antwort is not None:
+            return antwort
+    header = {"ETag": etag}
+    if geaendert_am is not None:
+        header["Last-Modified"] = format_datetime(geaendert_am.replace(tzinfo=timezone.utc), usegmt=True)
+    return Response(body, status_code=status_code, media_type="application/json", headers=header)
+
+
+# Reise-Baum aus dem Cache in JSON-taugliche Form bringen
+def _baum_als_json(baum: dict) -> dict:
+    return {
+        **baum,
+        "startdatum": baum["startdatum"].isoformat(),
+        "enddatum": baum["enddatum"].isoformat(),
+        "geaendert_am": baum["geaendert_am"].isoformat() if baum["geaendert_am"] else None,
+        "fortschritt": baum_fortschritt(baum),
+        "fortschritt_menge": baum_fortschritt(baum, "menge"),
+    }
+
+
+def _reise_oder_404(reise_id: int) -> dict:
+    baum = reise_cache.holen(reise_id)
+    if baum is None:
+        raise HTTPException(status_code=404, detail="Reise nicht gefunden")
+    return baum
+
+
+@api.get("/reisen")
+@_mit_db
+def api_reisen(request: Request, seite: int = 1, pro_seite: int = 50):
+    seite = max(1, seite)
+    pro_seite = min(max(1, pro_seite), API_MAX_PRO_SEITE)
+    reisen = [
+        {
+            "id": r.id,
+            "name": r.name,
+            "ziel": r.ziel,
+            "startdatum": r.startdatum.isoformat(),
+            "enddatum": r.enddatum.isoformat(),
+            "gesamt": r.gesamt,
+            "gepackt": r.gepackt,
+            "menge_gesamt": r.menge_gesamt,
+            "menge_gepackt": r.menge_gepackt,
+            "fortschritt": reise_fortschritt(r),
+            "fortschritt_menge": reise_fortschritt(r, "menge"),
+        }
+        for r in reisen_mit_fortschritt(offset=(seite - 1) * pro_seite, limit=pro_seite)
+    ]
+    return _json_antwort(
+        request,
+        {
+            "seite": seite,
+            "pro_seite": pro_seite,
+            "anzahl": ReiseModel.aktive().count(),
+            "reisen": reisen,
+        },
+    )
+
+
+@api.get("/reisen/{reise_id}")
+@_mit_db
+def api_reise(request: Request, reise_id: int):
+    # ETag aus der gespeicherten Revision wie bei api_export: ein anderer Prozess
+    # (z.B. python sync.py) schreibt an diesem reise_cache vorbei
+    stand = reise_revision(reise_id)
+    if stand is None:
+        raise HTTPException(status_code=404, detail="Reise nicht gefunden")
+    revision, geaendert_am = stand
+    etag = _revisions_etag("reise", reise_id, revision)
+    antwort = _nicht_geaendert(request, etag, geaendert_am)
+    if antwort is not None:
+        return antwort
+    baum = _reise_oder_404(reise_id)
+    if baum["revision"] != revision:
+        reise_cache.invalidieren(reise_id)
+        baum = _reise_oder_404(reise_id)
+    return _json_antwort(request, _baum_als_json(baum), etag=etag, geaendert_am=geaendert_am)
+
+
+@api.post("/reisen")
+@_mit_db
+def api_reise_anlegen(request: Request, daten: dict):
+    name = str(daten.get("name") or "").strip()
+    if not name:
+        raise HTTPException(status_code=422, detail="name fehlt")
+    try:
+        start = _parse_date(daten.get("startdatum") or date.today().isoformat())
+        ende = _parse_date(daten.get("enddatum") or start.isoformat())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if ende < start:
+        raise HTTPException(status_code=422, detail="enddatum liegt vor startdatum")
+    vorlage = None
+    if daten.get("vorlage_id"):
+        vorlage = finde_vorlage(vorlagen_holen(), daten["vorlage_id"])
+        if vorlage is None:
+            raise HTTPException(status_code=422, detail="Unbekannte Vorlage")
+    r = reise_anlegen(
+        name=name,
+        ziel=str(daten.get("ziel") or "").strip(),
+        start=start,
+        ende=ende,
+        beschreibung=str(daten.get("beschreibung") or ""),
+        vorlage=vorlage,
+    )
+    reise_cache.invalidieren(r.id)
+    return _json_antwort(request, _baum_als_json(_reise_oder_404(r.id)), status_code=201)
+
+
+# Kopie einer Reise: {"name": ..., "startdatum": ..., "enddatum": ..., "zuruecksetzen": true}
+# (alle Felder optional; ohne enddatum bleibt die Dauer gleich)
+@api.post("/reisen/{reise_id}/duplizieren")
+@_mit_db
+def api_reise_duplizieren(request: Request, reise_id: int, daten: Optional[dict] = None):
+    daten = daten or {}
+    try:
+        start = _parse_date(daten["startdatum"]) if daten.get("startdatum") else None
+        ende = _parse_date(daten["enddatum"]) if daten.get("enddatum") else None
+        neu = reise_duplizieren(
+            reise_id,
+            name=str(daten.get("name") or "").strip() or None,
+            startdatum=start,
+            enddatum=ende,
+            zuruecksetzen=bool(daten.get("zuruecksetzen", True)),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if neu is None:
+        raise HTTPException(status_code=404, detail="Reise nicht gefunden")
+    return _json_antwort(request, _baum_als_json(_reise_oder_404(neu.id)), status_code=201)
+
+
+# Bulk-Toggle: {"ids": [...], "gepackt": true}
+@api.post("/reisen/{reise_id}/gegenstaende/packen")
+@_mit_db
+def api_gegenstaende_packen(request: Request, reise_id: int, daten: dict):
+    _reise_oder_404(reise_id)
+    ids = daten.get("ids") or []
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        raise HTTPException(status_code=422, detail="ids muss eine Liste von Zahlen sein")
+    geaendert = reise_aendern(reise_id, lambda: gegenstaende_packen(reise_id, ids, bool(daten.get("gepackt", True))))
+    return _json_antwort(request, {"geaendert": geaendert})
+
+
+# Teilweise packen: {"anzahl": 3} -> 3 von menge gepackt
+@api.post("/reisen/{reise_id}/gegenstaende/{item_id}/packmenge")
+@_mit_db
+def api_packmenge(request: Request, reise_id: int, item_id: int, daten: dict):
+    baum = _reise_oder_404(reise_id)
+    if not any(g["id"] == item_id for k in baum["kategorien"] for g in k["gegenstaende"]):
+        raise HTTPException(status_code=404, detail="Gegenstand nicht gefunden")
+    try:
+        anzahl = int(daten.get("anzahl"))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="anzahl muss eine Zahl sein")
+    werte = reise_aendern(reise_id, lambda: packmenge_setzen(item_id, anzahl), item_id)
+    if werte is None:
+        # Zwischen Prüfung und Schreiben gelöscht
+        raise HTTPException(status_code=404, detail="Gegenstand nicht gefunden")
+    return _json_antwort(request, werte)
+
+
+@api.post("/reisen/{reise_id}/kategorien/{kat_id}/packen")
+@_mit_db
+def api_kategorie_packen(request: Request, reise_id: int, kat_id: int, daten: Optional[dict] = None):
+    _reise_oder_404(reise_id)
+    gepackt = bool((daten or {}).get("gepackt", True))
+    geaendert = reise_aendern(reise_id, lambda: kategorie_packen(reise_id, kat_id, gepackt))
+    return _json_antwort(request, {"geaendert": geaendert})
+
+
+@api.post("/reisen/{reise_id}/zuruecksetzen")
+@_mit_db
+def api_reise_zuruecksetzen(request: Request, reise_id: int):
+    _reise_oder_404(reise_id)
+    geaendert = reise_aendern(reise_id, lambda: reise_zuruecksetzen(reise_id))
+    return _json_antwort(request, {"geaendert": geaendert})
+
+
+@api.delete("/reisen/{reise_id}/gegenstaende/gepackt")
+@_mit_db
+def api_gepackte_loeschen(request: Request, reise_id: int):
+    _reise_oder_404(reise_id)
+    geloescht = reise_aendern(reise_id, lambda: gepackte_loeschen(reise_id))
+    return _json_antwort(request, {"geloescht": geloescht})
+
+
+# Wiederholte Downloads unveränderter Reisen kosten nur die Revisions-Abfrage
+@api.get("/reisen/{reise_id}/export")
+@_mit_db
+def api_export(request: Request, reise_id: int):
+    stand = reise_revision(reise_id)
+    if stand is None:
+        raise HTTPException(status_code=404, detail="Reise nicht gefunden")
+    revision, geaendert_am = stand
+    etag = _revisions_etag("export", reise_id, revision)
+    antwort = _nicht_geaendert(request, etag, geaendert_am)
+    if antwort is not None:
+        return antwort
+    text = export_text(reise_id, "kompakt")
+    return _json_antwort(request, text.encode("utf-8"), etag=etag, geaendert_am=geaendert_am)
+
+
+# Neue Reise: 201. Trägt der Import die uid einer vorhandenen Reise, wird er
+# hineingeführt: 200 mit den Zählern (neu/geaendert/entfernt/unveraendert).
+# Würde ein vollständiger Import dabei lokale Items oder Kategorien löschen
+# (sie fehlen im Import), antwortet er ohne ?loeschen=true mit 409 und der
+# Vorschau (wie die Rückfrage im Import-Dialog). Deltas mit "entfernt" löschen
+# nur die ausdrücklich genannten Items.
+@api.post("/import")
+@_mit_db
+def api_import(request: Request, daten: dict, loeschen: bool = False):
+    try:
+        if not loeschen and "entfernt" not in daten:
+            vorschau = import_vorschau(daten)
+            if import_rueckfrage(vorschau) is not None:
+                raise HTTPException(
+                    status_code=409,
+                    detail={"meldung": "Import würde lokale Daten löschen; mit ?loeschen=true bestätigen", "vorschau": vorschau},
+                )
+        r, zaehler = reise_importieren(daten)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=422, detail=f"Import fehlgeschlagen: {e}")
+    reise_cache.invalidieren(r.id)
+    if zaehler is not None:
+        return _json_antwort(request, {"id": r.id, "name": r.name, "zusammengefuehrt": zaehler})
+    return _json_antwort(request, {"id": r.id, "name": r.name}, status_code=201)
+
+
+# Delta-Export für einen erneuten Abgleich: der Aufrufer schickt die Hashes seiner
+# Items ({"hashes": {uid: hash}}) und bekommt nur die geänderten zurück. Die
+# Antwort kann unverändert an /api/import geschickt werden.
+@api.post("/reisen/{reise_id}/delta")
+@_mit_db
+def api_export_delta(request: Request, reise_id: int, daten: dict):
+    r = ReiseModel.aktive().where(ReiseModel.id == reise_id).first()
+    if r is None:
+        raise HTTPException(status_code=404, detail="Reise nicht gefunden")
+    bekannte = daten.get("hashes") or {}
+    if not isinstance(bekannte, dict):
+        raise HTTPException(status_code=422, detail="hashes muss ein Objekt uid -> hash sein")
+    return _json_antwort(request, export_delta(r, bekannte))
+
+
+@api.get("/vorlagen")
+@_mit_db
+def api_vorlagen(request: Request):
+    vorlagen = vorlagen_holen()
+    etag = _revisions_etag("vorlagen", "liste", vorlagen_index.version())
+    return _json_antwort(
+        request, [{"id": v["id"], "name": v["name"], "eigene": bool(v.get("eigene"))} for v in vorlagen], etag=etag
+    )
+
+
+# Reise als eigene Vorlage speichern: {"name": ...} (Standard: Name der Reise)
+@api.post("/reisen/{reise_id}/als-vorlage")
+@_mit_db
+def api_als_vorlage(request: Request, reise_id: int, daten: Optional[dict] = None):
+    baum = _reise_oder_404(reise_id)
+    name = str((daten or {}).get("name") or "").strip() or baum["name"]
+    kopf = reise_als_vorlage_speichern(reise_id, name)
+    if kopf is None:
+        raise HTTPException(status_code=404, detail="Reise nicht gefunden")
+    vorlagen_index.hinzufuegen(kopf)
+    return _json_antwort(request, {"id": kopf["id"], "name": kopf["name"]}, status_code=201)
+
+
+# Nur eigene Vorlagen lassen sich löschen, die aus vorlagen.json nicht
+@api.delete("/vorlagen/{vorlage_id}")
+@_mit_db
+def api_vorlage_loeschen(request: Request, vorlage_id: str):
+    if not eigene_vorlage_loeschen(vorlage_id):
+        raise HTTPException(status_code=404, detail="Eigene Vorlage nicht gefunden")
+    vorlagen_index.entfernen(vorlage_id)
+    return _json_antwort(request, {"geloescht": vorlage_id})
+
+
+# Reiseübergreifende Auswertungen aus den Aggregat-Tabellen (siehe statistik.py)
+@api.get("/statistik")
+@_mit_db
+def api_statistik(request: Request, limit: int = 10, min_anzahl: int = 3):
+    limit = max(1, min(limit, API_MAX_PRO_SEITE))
+    return _json_antwort(
+        request,
+        {
+            "haeufigste": haeufigste_gegenstaende(limit=limit),
+            "oft_vergessen": oft_vergessen(limit=limit, min_anzahl=max(1, min_anzahl)),
+            "ziele": fortschritt_pro_ziel(),
+        },
+    )
+
+
+# Änderungen seit einer Protokoll-Nummer für den Abgleich mit einer anderen
+# Instanz (siehe sync.py); der Aufrufer fragt mit "stand" der Antwort weiter ab
+@api.get("/sync/aenderungen")
+@_mit_db
+def api_sync_aenderungen(request: Request, seit: int = 0, limit: int = SYNC_BATCH):
+    return _json_antwort(request, aenderungen_seit(max(0, seit), max(1, min(limit, SYNC_BATCH))))
+
+
+# === Hintergrund-Purge ========================================================
+
+# Pause zwischen zwei Purge-Batches, damit UI-Schreibzugriffe dazwischen passen
+PURGE_PAUSE = 0.05
+_purge_laeuft = False
+
+
+# Entfernt gelöschte Reisen batchweise in einem Worker-Thread
+async def purge_im_hintergrund():
+    global _purge_laeuft
+    if _purge_laeuft:
+        return
+    _purge_laeuft = True
+    try:
+        while await run.io_bound(geloeschte_reisen_purgen):
+            await asyncio.sleep(PURGE_PAUSE)
+    finally:
+        _purge_laeuft = False
+
+
 # === App-Start ================================================================
+# Beim Import werden nur die Seiten registriert. Datenbank, Migrationen und
+# Hintergrund-Jobs werden erst über app_erstellen() bzw. beim Serverstart
+# eingerichtet, damit Tests und CLI-Tools main schnell importieren können.
 
-# Datenbank-Tabellen einmalig beim Start erstellen (falls nicht vorhanden)
-db.connect(reuse_if_open=True)
-db.create_tables([ReiseModel, KategorieModel, GegenstandModel])
-db.close()
+# Tabellen anlegen und offene Schema-Migrationen anwenden (nur beim Serverstart;
+# migrationen.py wird erst hier geladen)
+def datenbank_initialisieren():
+    from migrationen import datenbank_initialisieren as schema_einrichten
 
-if __name__ in {"__main__", "__mp_main__"}:
-    ui.run(
-        reload=True,
-        title="PackAttack",
-        storage_secret=os.getenv("NICEGUI_STORAGE_SECRET", "change-me-please-31+chars"),
-        tailwind={
-            "theme": {
-                "extend": {
-                    "colors": {
-                        "primary": "#5898d4",
-                    }
-                }
+    schema_einrichten()
+
+
+_app_erstellt = False
+
+
+# App-Factory: registriert Startup-Hook, Hintergrund-Jobs und Routen (einmal pro Prozess)
+def app_erstellen():
+    global _app_erstellt
+    if _app_erstellt:
+        return ng_app
+    _app_erstellt = True
+
+    ng_app.on_startup(datenbank_initialisieren)
+    # Regelmäßig nachsehen, falls beim letzten Lauf noch Reisen übrig geblieben sind
+    ng_app.timer(60.0, purge_im_hintergrund)
+    ng_app.add_api_route("/status/cache", status_cache, methods=["GET"])
+    ng_app.include_router(api)
+    return ng_app
+
+
+# === Run-Modi =================================================================
+# Entwicklung (Standard): Reload-Supervisor + Datei-Watcher, Browser öffnen.
+# Produktion (python main.py --prod oder PACKATTACK_MODUS=prod): kein Reload,
+# Host/Port aus der Umgebung, Schema und Vorlagen vor dem ersten Request geladen.
+
+_TAILWIND = {
+    "theme": {
+        "extend": {
+            "colors": {
+                "primary": "#5898d4",
             }
-        },
-    )
\ No newline at end of file
+        }
+    }
+}
+
+
+# Liefert "prod" oder "dev"
+def run_modus(argv: Optional[List[str]] = None) -> str:
+    argv = sys.argv[1:] if argv is None else argv
+    if "--prod" in argv or os.getenv("PACKATTACK_MODUS", "").lower() in {"prod", "production"}:
+        return "prod"
+    return "dev"
+
+
+# Baut die Argumente für ui.run() für den gewählten Modus
+def run_optionen(modus: str) -> dict:
+    optionen = {
+        "title": "PackAttack",
+        "storage_secret": os.getenv("NICEGUI_STORAGE_SECRET", "change-me-please-31+chars"),
+        "tailwind": _TAILWIND,
+    }
+    if modus != "prod":
+        optionen["reload"] = True
+        return optionen
+
+    workers = int(os.getenv("PACKATTACK_WORKERS", "1"))
+    if workers > 1:
+        # NiceGUI hält UI-Zustand im Prozess und unterstützt nur einen Worker.
+        # Zum Skalieren mehrere Instanzen (eigene Ports) hinter einem Proxy mit Sticky Sessions starten.
+        log.warning("PACKATTACK_WORKERS=%d wird ignoriert: NiceGUI unterstützt nur einen Worker pro Prozess.", workers)
+    if "NICEGUI_STORAGE_SECRET" not in os.environ:
+        log.warning("NICEGUI_STORAGE_SECRET ist nicht gesetzt.")
+
+    optionen.update(
+        reload=False,
+        show=False,
+        host=os.getenv("PACKATTACK_HOST", "0.0.0.0"),
+        port=int(os.getenv("PACKATTACK_PORT", "8080")),
+        show_welcome_message=False,
+        uvicorn_logging_level=os.getenv("PACKATTACK_LOG_LEVEL", "warning"),
+        # Websocket: längere Reconnect-Toleranz für mobile Clients, kleinerer
+        # Nachrichtenpuffer pro Client, begrenzte Frame-Größe und Keep-Alive
+        reconnect_timeout=float(os.getenv("PACKATTACK_RECONNECT_TIMEOUT", "10")),
+        message_history_length=200,
+        ws_max_size=1024 * 1024,
+        timeout_keep_alive=30,
+    )
+    return optionen
+
+
+# Produktion: Schema prüfen und Vorlagen laden, bevor der Server Requests annimmt
+def vorladen():
+    datenbank_initialisieren()
+    vorlagen_holen()
+
+
+if __name__ in {"__main__", "__mp_main__"}:
+    app_erstellen()
+    modus = run_modus()
+    if modus == "prod":
+        vorladen()
+    ui.run(**run_optionen(modus))
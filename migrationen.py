@@ -0,0 +1,320 @@
+import time
+from typing import Callable, List, Optional
+
+from peewee import (
+    CharField,
+    IntegerField,
+    BooleanField,
+    DateTimeField,
+    Field,
+    FloatField,
+    ForeignKeyField,
+    Model,
+)
+from playhouse.migrate import SqliteMigrator, migrate
+
+from database import (
+    db,
+    BaseModel,
+    ReiseModel,
+    GegenstandModel,
+    GegenstandNameModel,
+    KategorieModel,
+    NAMENSKATALOG,
+    jetzt_utc,
+    katalog_zuordnen,
+    namen_kompaktieren,
+    neue_uid_sql,
+    REISE_UID_BYTES,
+    GEGENSTAND_UID_BYTES,
+)
+
+
+# Versionierte, fortsetzbare Schema-Migrationen für app.db.
+#
+# Jede Migration ist eine Schritt-Funktion schritt(cursor, batch) -> cursor | None.
+# Der Runner ruft sie wiederholt auf, jeweils in einer eigenen Transaktion, und
+# speichert den zurückgegebenen Cursor (z.B. die zuletzt verarbeitete ID) in
+# derselben Transaktion. None bedeutet "fertig". Bricht der Prozess ab, wird
+# beim nächsten Start ab dem letzten gespeicherten Cursor weitergemacht.
+# Zwischen zwei Batches wird der Schreib-Lock freigegeben, große Backfills
+# blockieren die Datenbank also nie für die gesamte Laufzeit.
+
+
+# Anzahl Zeilen pro Migrations-Batch (= pro Transaktion)
+MIGRATION_BATCH = 2000
+
+
+# Fortschritt aller Migrationen (eine Zeile pro Version)
+class SchemaMigrationModel(BaseModel):
+    class Meta:
+        table_name = "schema_migrationen"
+
+    version = IntegerField(primary_key=True)
+    name = CharField(max_length=200)
+    cursor = IntegerField(null=True)
+    fertig = BooleanField(default=False)
+    angewendet_am = DateTimeField(null=True)
+
+
+class Migration:
+    def __init__(self, version: int, name: str, schritt: Callable):
+        self.version = version
+        self.name = name
+        self.schritt = schritt
+
+    def __repr__(self):
+        return f"Migration({self.version}, {self.name})"
+
+
+MIGRATIONEN: List[Migration] = []
+
+
+# Dekorator zum Registrieren einer Migration
+def migration(version: int, name: str):
+    def registrieren(schritt: Callable):
+        if any(m.version == version for m in MIGRATIONEN):
+            raise ValueError(f"Migration {version} ist bereits registriert")
+        MIGRATIONEN.append(Migration(version, name, schritt))
+        return schritt
+
+    return registrieren
+
+
+# === Hilfsfunktionen für Migrationen ==========================================
+
+# Fügt eine Spalte hinzu, falls sie noch fehlt (neue DBs haben sie schon via create_tables).
+# Bewusst ohne NOT NULL: SqliteMigrator baut dafür die Tabelle neu auf, und das
+# DROP TABLE der alten Tabelle löscht bei aktiven Foreign Keys per CASCADE alle
+# Kategorien und Items. Bestehende Zeilen bekommen stattdessen den Default.
+def spalte_hinzufuegen(tabelle: str, spalte: str, feld: Field):
+    if spalte not in {c.name for c in db.get_columns(tabelle)}:
+        migrator = SqliteMigrator(db)
+        operationen = [migrator.alter_add_column(tabelle, spalte, feld)]
+        if feld.default is not None:
+            operationen.append(migrator.apply_default(tabelle, spalte, feld))
+        migrate(*operationen)
+
+
+# Legt einen Index an, falls er noch fehlt. Ein Index lässt sich in SQLite nicht
+# stückweise aufbauen; CREATE INDEX sortiert aber nur einmal und ist damit
+# deutlich schneller als ein zeilenweiser Backfill.
+def index_hinzufuegen(tabelle: str, spalten: tuple, unique: bool = False):
+    vorhanden = {tuple(i.columns) for i in db.get_indexes(tabelle)}
+    if tuple(spalten) not in vorhanden:
+        migrate(SqliteMigrator(db).add_index(tabelle, spalten, unique))
+
+
+# Führt ein UPDATE für den nächsten ID-Bereich aus und gibt den neuen Cursor zurück
+# (None, wenn keine Zeilen mehr übrig sind). Für Backfills neuer Spalten.
+def batch_update(model: Model, werte: dict, cursor: Optional[int], batch: int, where=None) -> Optional[int]:
+    query = model.select(model.id).order_by(model.id).limit(batch)
+    if cursor is not None:
+        query = query.where(model.id > cursor)
+    if where is not None:
+        query = query.where(where)
+    ids = [row[0] for row in query.tuples()]
+    if not ids:
+        return None
+    model.update(werte).where(model.id.in_(ids)).execute()
+    return ids[-1]
+
+
+# === Runner ===================================================================
+
+# Höchste vollständig angewendete Version (0 = keine)
+def aktuelle_version() -> int:
+    db.create_tables([SchemaMigrationModel])
+    v = (
+        SchemaMigrationModel.select(SchemaMigrationModel.version)
+        .where(SchemaMigrationModel.fertig == True)  # noqa: E712
+        .order_by(SchemaMigrationModel.version.desc())
+        .first()
+    )
+    return v.version if v else 0
+
+
+# Wendet alle offenen Migrationen in Versionsreihenfolge an.
+# Gibt die Versionen zurück, die in diesem Lauf abgeschlossen wurden.
+def migrationen_ausfuehren(
+    migrationen: Optional[List[Migration]] = None,
+    batch: int = MIGRATION_BATCH,
+    pause: float = 0.0,
+) -> List[int]:
+    db.create_tables([SchemaMigrationModel])
+    abgeschlossen = []
+
+    for m in sorted(migrationen if migrationen is not None else MIGRATIONEN, key=lambda m: m.version):
+        stand = SchemaMigrationModel.get_or_none(SchemaMigrationModel.version == m.version)
+        if stand is not None and stand.fertig:
+            continue
+        if stand is None:
+            stand = SchemaMigrationModel.create(version=m.version, name=m.name)
+
+        while True:
+            with db.atomic():
+                neu = m.schritt(stand.cursor, batch)
+                if neu is None:
+                    stand.fertig = True
+                    stand.angewendet_am = jetzt_utc()
+                else:
+                    stand.cursor = neu
+                stand.save()
+            if neu is None:
+                break
+            if pause:
+                time.sleep(pause)
+
+        abgeschlossen.append(m.version)
+    return abgeschlossen
+
+
+_schema_geprueft = False
+
+
+# Tabellen anlegen und offene Schema-Migrationen anwenden (Serverstart und
+# Kommandozeilen-Werkzeuge, einmal pro Prozess)
+def datenbank_initialisieren():
+    global _schema_geprueft
+    if _schema_geprueft:
+        return
+    db.connect(reuse_if_open=True)
+    # Nur fehlende Tabellen anlegen: Bei bestehenden Tabellen würde create_tables
+    # Indizes auf noch nicht migrierte Spalten anlegen. Neue Spalten und Indizes
+    # kommen dort über die Migrationen.
+    modelle = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel]
+    db.create_tables([m for m in modelle if not m.table_exists()])
+    migrationen_ausfuehren()
+    if NAMENSKATALOG == "kompakt":
+        while namen_kompaktieren():
+            pass
+    db.close()
+    _schema_geprueft = True
+
+
+# === Migrationen ==============================================================
+
+@migration(1, "reisen.geloescht (Soft-Delete)")
+def _m001_reisen_geloescht(cursor, batch):
+    spalte_hinzufuegen("reisen", "geloescht", BooleanField(default=False))
+    index_hinzufuegen("reisen", ("geloescht",))
+    return None
+
+
+@migration(2, "reisen.revision + reisen.geaendert_am")
+def _m002_reisen_revision(cursor, batch):
+    if cursor is None:
+        spalte_hinzufuegen("reisen", "revision", IntegerField(default=0))
+        spalte_hinzufuegen("reisen", "geaendert_am", DateTimeField(null=True))
+    # Bestehende Reisen bekommen den Migrationszeitpunkt als Änderungsdatum
+    return batch_update(
+        ReiseModel,
+        {ReiseModel.geaendert_am: jetzt_utc()},
+        cursor,
+        batch,
+        where=ReiseModel.geaendert_am.is_null(),
+    )
+
+
+@migration(3, "gegenstand_namen (Namenskatalog) + gegenstaende.katalog_id")
+def _m003_namenskatalog(cursor, batch):
+    if not db.table_exists("gegenstaende"):
+        return None
+    if cursor is None:
+        db.create_tables([GegenstandNameModel])
+        spalte_hinzufuegen(
+            "gegenstaende", "katalog_id", ForeignKeyField(GegenstandNameModel, null=True, field=GegenstandNameModel.id)
+        )
+        index_hinzufuegen("gegenstaende", ("katalog_id",))
+    # Bestehende Items batchweise katalogisieren
+    query = GegenstandModel.select(GegenstandModel.id).order_by(GegenstandModel.id).limit(batch)
+    if cursor is not None:
+        query = query.where(GegenstandModel.id > cursor)
+    ids = [row[0] for row in query.tuples()]
+    if not ids:
+        return None
+    katalog_zuordnen(ids)
+    return ids[-1]
+
+
+@migration(4, "reisen.vorlage_id + Statistik-Aggregate")
+def _m004_statistik(cursor, batch):
+    from statistik import statistik_einrichten
+
+    spalte_hinzufuegen("reisen", "vorlage_id", CharField(max_length=100, null=True))
+    if not db.table_exists("gegenstaende"):
+        return None
+    # Ein GROUP BY über alle Items; Trigger halten die Zähler danach aktuell
+    statistik_einrichten()
+    return None
+
+
+@migration(5, "gegenstaende.menge_gepackt (teilweise gepackt)")
+def _m005_menge_gepackt(cursor, batch):
+    if not db.table_exists("gegenstaende"):
+        return None
+    if cursor is None:
+        spalte_hinzufuegen("gegenstaende", "menge_gepackt", IntegerField(default=0))
+    # Bisher gepackte Items gelten als vollständig gepackt
+    return batch_update(
+        GegenstandModel,
+        {GegenstandModel.menge_gepackt: GegenstandModel.menge},
+        cursor,
+        batch,
+        where=(GegenstandModel.gepackt == True),  # noqa: E712
+    )
+
+
+@migration(6, "gegenstaende.menge_pro_tag")
+def _m006_menge_pro_tag(cursor, batch):
+    # Bestehende Items behalten ihre feste Menge (kein Backfill)
+    if db.table_exists("gegenstaende"):
+        spalte_hinzufuegen("gegenstaende", "menge_pro_tag", FloatField(null=True))
+    return None
+
+
+@migration(7, "Tabellen für eigene Vorlagen")
+def _m007_eigene_vorlagen(cursor, batch):
+    from vorlagen import vorlagen_tabellen_anlegen
+
+    vorlagen_tabellen_anlegen()
+    return None
+
+
+@migration(8, "reisen.uid (stabile ID für Import/Abgleich)")
+def _m008_reise_uid(cursor, batch):
+    if not db.table_exists("reisen"):
+        return None
+    # Ohne Default hinzufügen: ein Default würde allen Zeilen dieselbe uid geben
+    spalte_hinzufuegen("reisen", "uid", CharField(max_length=32, null=True))
+    # Wenige Zeilen, eine zufällige uid pro Reise direkt in SQL
+    ReiseModel.update(uid=neue_uid_sql(REISE_UID_BYTES)).where(ReiseModel.uid.is_null()).execute()
+    index_hinzufuegen("reisen", ("uid",), unique=True)
+    return None
+
+
+@migration(9, "gegenstaende.uid")
+def _m009_gegenstand_uid(cursor, batch):
+    if not db.table_exists("gegenstaende"):
+        return None
+    if cursor is None:
+        spalte_hinzufuegen("gegenstaende", "uid", CharField(max_length=12, null=True))
+        index_hinzufuegen("gegenstaende", ("uid",))
+    return batch_update(
+        GegenstandModel,
+        {GegenstandModel.uid: neue_uid_sql(GEGENSTAND_UID_BYTES)},
+        cursor,
+        batch,
+        where=GegenstandModel.uid.is_null(),
+    )
+
+
+@migration(10, "Änderungsprotokoll für den Abgleich zwischen Instanzen")
+def _m010_aenderungsprotokoll(cursor, batch):
+    from sync import sync_einrichten
+
+    if not db.table_exists("gegenstaende"):
+        return None
+    # Ein Eintrag pro bestehender Reise; Trigger protokollieren alles Weitere
+    sync_einrichten()
+    return None
@@ -0,0 +1,222 @@
+import json
+import math
+import struct
+import sys
+import zlib
+from typing import List, Optional
+
+from austausch import reise_importieren
+from database import ReiseModel, KategorieModel, GegenstandModel, gegenstand_name, mit_katalog
+
+
+# Kompaktes Binärformat für Sicherungen vieler Reisen.
+#
+# Statt für jedes Item die Schlüssel "name", "menge", "gepackt" zu wiederholen
+# (wie im JSON-Export), werden alle Werte spaltenweise gespeichert:
+#   - eine Tabelle aller vorkommenden Namen (Kategorien + Items, je nur einmal)
+#   - pro Spalte ein Zahlen-Array (Namens-Index, Menge, gepackt, Anzahl Kinder)
+#   - die uids von Reisen und Items, damit eine eingespielte Sicherung weiter
+#     mit geteilten Listen und anderen Instanzen zusammengeführt werden kann
+# Das Ganze wird mit zlib komprimiert. Aufbau:
+#   MAGIC | Version (1 Byte) | zlib( Länge Meta (4 Byte) | Meta-JSON | Arrays )
+# Die Arrays sind Little Endian mit fester Breite (struct-Standardgrößen: I = 4,
+# B = 1, d = 8 Byte), unabhängig von Plattform und C-Compiler.
+
+MAGIC = b"PASNAP"
+VERSION = 1
+
+# Reihenfolge und Typ der Zahlen-Arrays hinter dem Meta-JSON
+_SPALTEN = (
+    ("kat_anzahl", "I"),  # Kategorien pro Reise
+    ("kat_name", "I"),  # Index in die Namenstabelle
+    ("item_anzahl", "I"),  # Items pro Kategorie
+    ("item_name", "I"),
+    ("item_menge", "I"),
+    ("item_gepackt", "B"),
+    ("item_menge_gepackt", "I"),
+    ("item_menge_pro_tag", "d"),  # NaN = feste Menge
+)
+
+
+def _packen(typ: str, werte: list) -> bytes:
+    return struct.pack(f"<{len(werte)}{typ}", *werte)
+
+
+# Liest eine Spalte ab pos; gibt die Werte und die Position dahinter zurück
+def _entpacken(typ: str, laenge: int, daten: bytes, pos: int) -> tuple:
+    format = f"<{laenge}{typ}"
+    return struct.unpack_from(format, daten, pos), pos + struct.calcsize(format)
+
+
+# Erstellt einen Snapshot aller aktiven Reisen (oder nur der angegebenen IDs)
+# mit drei Queries, unabhängig von der Anzahl Reisen
+def snapshot_erstellen(reise_ids: Optional[List[int]] = None) -> bytes:
+    reisen_query = ReiseModel.aktive().order_by(ReiseModel.id)
+    if reise_ids is not None:
+        reisen_query = reisen_query.where(ReiseModel.id.in_(list(reise_ids)))
+    reisen = list(
+        reisen_query.select(
+            ReiseModel.id,
+            ReiseModel.uid,
+            ReiseModel.name,
+            ReiseModel.ziel,
+            ReiseModel.startdatum,
+            ReiseModel.enddatum,
+            ReiseModel.beschreibung,
+            ReiseModel.vorlage_id,
+        ).tuples()
+    )
+    ids = [r[0] for r in reisen]
+
+    namen: dict = {}
+
+    def intern(name: str) -> int:
+        idx = namen.get(name)
+        if idx is None:
+            idx = namen[name] = len(namen)
+        return idx
+
+    spalten: dict = {name: [] for name, _ in _SPALTEN}
+    kat_pos = {}
+    kat_zaehler = {rid: 0 for rid in ids}
+    kategorien = list(
+        KategorieModel.select(KategorieModel.id, KategorieModel.name, KategorieModel.reise)
+        .where(KategorieModel.reise.in_(ids))
+        .order_by(KategorieModel.reise, KategorieModel.id)
+        .tuples()
+    )
+    for pos, (kat_id, kat_name, rid) in enumerate(kategorien):
+        kat_pos[kat_id] = pos
+        kat_zaehler[rid] += 1
+        spalten["kat_name"].append(intern(kat_name))
+    spalten["kat_anzahl"].extend(kat_zaehler[rid] for rid in ids)
+
+    item_zaehler = [0] * len(kategorien)
+    item_uids = []
+    items = (
+        mit_katalog(
+            GegenstandModel.select(
+                GegenstandModel.kategorie,
+                gegenstand_name(),
+                GegenstandModel.menge,
+                GegenstandModel.gepackt,
+                GegenstandModel.menge_gepackt,
+                GegenstandModel.menge_pro_tag,
+                GegenstandModel.uid,
+            ).join(KategorieModel)
+        )
+        .where(KategorieModel.reise.in_(ids))
+        .order_by(KategorieModel.reise, KategorieModel.id, GegenstandModel.id)
+        .tuples()
+    )
+    for kat_id, name, menge, gepackt, menge_gepackt, menge_pro_tag, uid in items:
+        item_zaehler[kat_pos[kat_id]] += 1
+        item_uids.append(uid)
+        spalten["item_name"].append(intern(name))
+        spalten["item_menge"].append(max(1, int(menge)))
+        spalten["item_gepackt"].append(1 if gepackt else 0)
+        spalten["item_menge_gepackt"].append(max(0, int(menge_gepackt)))
+        spalten["item_menge_pro_tag"].append(math.nan if menge_pro_tag is None else menge_pro_tag)
+    spalten["item_anzahl"].extend(item_zaehler)
+
+    meta = {
+        "namen": list(namen),
+        "reisen": [[r[1], r[2], r[3], r[4].isoformat(), r[5].isoformat(), r[6], r[7]] for r in reisen],
+        "item_uids": item_uids,
+        "laengen": [len(spalten[name]) for name, _ in _SPALTEN],
+    }
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    nutzdaten = b"".join(
+        [len(meta_bytes).to_bytes(4, "little"), meta_bytes] + [_packen(typ, spalten[name]) for name, typ in _SPALTEN]
+    )
+    return MAGIC + bytes([VERSION]) + zlib.compress(nutzdaten, 6)
+
+
+# Liest einen Snapshot und gibt die Reisen im Format von export_reise_to_dict
+# zurück (plus "vorlage_id", falls gesetzt)
+def snapshot_laden(daten: bytes) -> List[dict]:
+    if not daten.startswith(MAGIC):
+        raise ValueError("Kein PackAttack-Snapshot")
+    version = daten[len(MAGIC)]
+    if version != VERSION:
+        raise ValueError(f"Snapshot-Version {version} wird nicht unterstützt")
+    nutzdaten = zlib.decompress(daten[len(MAGIC) + 1:])
+
+    meta_len = int.from_bytes(nutzdaten[:4], "little")
+    meta = json.loads(nutzdaten[4:4 + meta_len].decode("utf-8"))
+    pos = 4 + meta_len
+    spalten = {}
+    for (name, typ), laenge in zip(_SPALTEN, meta["laengen"]):
+        spalten[name], pos = _entpacken(typ, laenge, nutzdaten, pos)
+
+    namen = meta["namen"]
+    kat_namen = iter(spalten["kat_name"])
+    item_anzahl = iter(spalten["item_anzahl"])
+    item_spalten = zip(
+        spalten["item_name"],
+        spalten["item_menge"],
+        spalten["item_gepackt"],
+        spalten["item_menge_gepackt"],
+        spalten["item_menge_pro_tag"],
+        meta["item_uids"],
+    )
+
+    reisen = []
+    for (uid, name, ziel, start, ende, beschreibung, vorlage_id), n_kat in zip(meta["reisen"], spalten["kat_anzahl"]):
+        kategorien = []
+        for _ in range(n_kat):
+            kat_name = namen[next(kat_namen)]
+            gegenstaende = []
+            for n, m, g, mg, pro_tag, g_uid in (next(item_spalten) for _ in range(next(item_anzahl))):
+                item = {"name": namen[n], "menge": m, "gepackt": bool(g)}
+                if mg and not g:
+                    item["menge_gepackt"] = mg
+                if not math.isnan(pro_tag):
+                    item["menge_pro_tag"] = pro_tag
+                if g_uid:
+                    item["uid"] = g_uid
+                gegenstaende.append(item)
+            kategorien.append({"name": kat_name, "gegenstaende": gegenstaende})
+        reise = {
+            "name": name,
+            "ziel": ziel,
+            "startdatum": start,
+            "enddatum": ende,
+            "beschreibung": beschreibung,
+            "kategorien": kategorien,
+        }
+        if uid:
+            reise["uid"] = uid
+        if vorlage_id:
+            reise["vorlage_id"] = vorlage_id
+        reisen.append(reise)
+    return reisen
+
+
+# Spielt einen Snapshot als neue Reisen ein (in einer Transaktion). Reisen und
+# Items behalten ihre uids; gibt es eine Reise schon (Sicherung in dieselbe
+# Datenbank eingespielt), wird sie als Kopie angelegt statt überschrieben.
+def snapshot_importieren(daten: bytes) -> List[ReiseModel]:
+    with ReiseModel._meta.database.atomic():
+        return [
+            reise_importieren(r, als_kopie=ReiseModel.select().where(ReiseModel.uid == r.get("uid")).exists())[0]
+            for r in snapshot_laden(daten)
+        ]
+
+
+if __name__ == "__main__":
+    # python snapshot.py sichern backup.pasnap | python snapshot.py einspielen backup.pasnap
+    from pathlib import Path
+    from migrationen import datenbank_initialisieren
+
+    if len(sys.argv) != 3 or sys.argv[1] not in {"sichern", "einspielen"}:
+        print("Aufruf: python snapshot.py sichern|einspielen <datei>")
+        sys.exit(2)
+    datenbank_initialisieren()
+    pfad = Path(sys.argv[2])
+    if sys.argv[1] == "sichern":
+        pfad.write_bytes(snapshot_erstellen())
+        print(f"Snapshot gespeichert: {pfad} ({pfad.stat().st_size} Bytes)")
+    else:
+        reisen = snapshot_importieren(pfad.read_bytes())
+        print(f"{len(reisen)} Reisen eingespielt")
@@ -0,0 +1,339 @@
+import sys
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, List, Optional
+
+from peewee import CharField, CompositeKey, IntegerField, fn
+
+from database import BaseModel, ReiseModel
+
+
+# Reiseübergreifende Auswertungen ("was wird oft vergessen?").
+#
+# Statt bei jeder Abfrage alle Items zu durchlaufen, halten SQLite-Trigger zwei
+# kleine Aggregat-Tabellen aktuell:
+#   statistik_reisen: Item-Zähler pro Reise (gesamt / gepackt)
+#   statistik_namen:  Item-Zähler pro (Vorlage, Name) über alle aktiven Reisen
+# Jede Änderung an reisen, kategorien oder gegenstaende passt die Zähler in
+# derselben Transaktion an. Abfragen lesen nur noch die Aggregate (wenige
+# hundert bis tausend Zeilen) und sind damit im Millisekundenbereich.
+
+
+# Item-Zähler pro Reise (Zeile wird per Trigger mit der Reise angelegt/gelöscht)
+class StatistikReiseModel(BaseModel):
+    class Meta:
+        table_name = "statistik_reisen"
+
+    reise_id = IntegerField(primary_key=True)
+    gesamt = IntegerField(default=0)
+    gepackt = IntegerField(default=0)
+
+
+# Item-Zähler pro Vorlage und Item-Name ("" = Reise ohne Vorlage)
+class StatistikNameModel(BaseModel):
+    class Meta:
+        table_name = "statistik_namen"
+        primary_key = CompositeKey("vorlage_id", "name")
+
+    vorlage_id = CharField(max_length=100)
+    name = CharField(max_length=200)
+    anzahl = IntegerField(default=0)
+    gepackt = IntegerField(default=0)
+
+
+MODELLE = [StatistikReiseModel, StatistikNameModel]
+
+
+# === Trigger =================================================================
+
+# Effektiver Item-Name (Inline-Name oder Namenskatalog, siehe database.gegenstand_name)
+def _name(g: str) -> str:
+    return f"COALESCE(NULLIF({g}.name, ''), (SELECT n.name FROM gegenstand_namen n WHERE n.id = {g}.katalog_id))"
+
+
+_UPSERT = "ON CONFLICT (vorlage_id, name) DO UPDATE SET anzahl = anzahl + excluded.anzahl, gepackt = gepackt + excluded.gepackt"
+
+
+# Ein einzelnes Item (NEW bzw. OLD) zu den Zählern addieren (vz="+") bzw. abziehen (vz="-").
+# Existiert die Kategorie nicht mehr (Löschung per CASCADE), hat der Trigger
+# der Kategorie bzw. Reise die Items bereits abgezogen.
+def _item(x: str, vz: str) -> str:
+    return f"""
+    UPDATE statistik_reisen SET gesamt = gesamt {vz} 1, gepackt = gepackt {vz} {x}.gepackt
+    WHERE reise_id = (SELECT k.reise_id FROM kategorien k WHERE k.id = {x}.kategorie_id);
+    INSERT INTO statistik_namen (vorlage_id, name, anzahl, gepackt)
+    SELECT COALESCE(r.vorlage_id, ''), {_name(x)}, {vz}1, {vz}{x}.gepackt
+    FROM kategorien k JOIN reisen r ON r.id = k.reise_id
+    WHERE k.id = {x}.kategorie_id AND r.geloescht = 0
+    {_UPSERT};"""
+
+
+# Alle Items einer Reise (r = NEW/OLD der Reise) bei den Namens-Zählern addieren/abziehen
+def _reise_namen(r: str, vz: str) -> str:
+    return f"""
+    INSERT INTO statistik_namen (vorlage_id, name, anzahl, gepackt)
+    SELECT COALESCE({r}.vorlage_id, ''), {_name("g")}, {vz}COUNT(*), {vz}SUM(g.gepackt)
+    FROM gegenstaende g JOIN kategorien k ON k.id = g.kategorie_id
+    WHERE k.reise_id = {r}.id AND {r}.geloescht = 0
+    GROUP BY 1, 2
+    {_UPSERT};"""
+
+
+TRIGGER = {
+    "statistik_reise_insert": f"""
+        AFTER INSERT ON reisen BEGIN
+            INSERT OR IGNORE INTO statistik_reisen (reise_id, gesamt, gepackt) VALUES (NEW.id, 0, 0);
+        END""",
+    # Soft-Delete bzw. Wiederherstellen: Items aus den Namens-Zählern nehmen/zurückgeben
+    "statistik_reise_update": f"""
+        AFTER UPDATE OF geloescht, vorlage_id ON reisen
+        WHEN OLD.geloescht IS NOT NEW.geloescht OR OLD.vorlage_id IS NOT NEW.vorlage_id BEGIN
+            {_reise_namen("OLD", "-")}
+            {_reise_namen("NEW", "+")}
+        END""",
+    "statistik_reise_delete": f"""
+        BEFORE DELETE ON reisen BEGIN
+            {_reise_namen("OLD", "-")}
+            DELETE FROM statistik_reisen WHERE reise_id = OLD.id;
+        END""",
+    "statistik_kategorie_delete": f"""
+        BEFORE DELETE ON kategorien BEGIN
+            UPDATE statistik_reisen SET
+                gesamt = gesamt - (SELECT COUNT(*) FROM gegenstaende WHERE kategorie_id = OLD.id),
+                gepackt = gepackt - (SELECT COALESCE(SUM(gepackt), 0) FROM gegenstaende WHERE kategorie_id = OLD.id)
+            WHERE reise_id = OLD.reise_id;
+            INSERT INTO statistik_namen (vorlage_id, name, anzahl, gepackt)
+            SELECT COALESCE(r.vorlage_id, ''), {_name("g")}, -COUNT(*), -SUM(g.gepackt)
+            FROM gegenstaende g JOIN reisen r ON r.id = OLD.reise_id
+            WHERE g.kategorie_id = OLD.id AND r.geloescht = 0
+            GROUP BY 1, 2
+            {_UPSERT};
+        END""",
+    "statistik_item_insert": f"""
+        AFTER INSERT ON gegenstaende BEGIN
+            {_item("NEW", "+")}
+        END""",
+    "statistik_item_update": f"""
+        AFTER UPDATE OF name, katalog_id, gepackt, kategorie_id ON gegenstaende BEGIN
+            {_item("OLD", "-")}
+            {_item("NEW", "+")}
+        END""",
+    "statistik_item_delete": f"""
+        AFTER DELETE ON gegenstaende BEGIN
+            {_item("OLD", "-")}
+        END""",
+}
+
+
+def _db():
+    # Über das Model, damit auch an eine andere DB gebundene Modelle (Tests) passen
+    return StatistikReiseModel._meta.database
+
+
+# Legt Aggregat-Tabellen und Trigger an und baut die Zähler einmal komplett auf
+def statistik_einrichten():
+    db = _db()
+    with db.atomic():
+        db.create_tables(MODELLE)
+        for name, sql in TRIGGER.items():
+            db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{name}" {sql}')
+        statistik_neu_aufbauen()
+
+
+# Berechnet beide Aggregat-Tabellen vollständig neu (zwei INSERT ... SELECT)
+def statistik_neu_aufbauen():
+    db = _db()
+    with db.atomic():
+        StatistikReiseModel.delete().execute()
+        StatistikNameModel.delete().execute()
+        db.execute_sql(
+            """
+            INSERT INTO statistik_reisen (reise_id, gesamt, gepackt)
+            SELECT r.id, COUNT(g.id), COALESCE(SUM(g.gepackt), 0)
+            FROM reisen r
+            LEFT JOIN kategorien k ON k.reise_id = r.id
+            LEFT JOIN gegenstaende g ON g.kategorie_id = k.id
+            GROUP BY r.id
+            """
+        )
+        db.execute_sql(
+            f"""
+            INSERT INTO statistik_namen (vorlage_id, name, anzahl, gepackt)
+            SELECT COALESCE(r.vorlage_id, ''), {_name("g")}, COUNT(*), SUM(g.gepackt)
+            FROM gegenstaende g
+            JOIN kategorien k ON k.id = g.kategorie_id
+            JOIN reisen r ON r.id = k.reise_id
+            WHERE r.geloescht = 0
+            GROUP BY 1, 2
+            """
+        )
+
+
+# === Abfragen ================================================================
+
+# Häufigste Items pro Vorlage: {vorlage_id: [{"name", "anzahl"}, ...]}
+def haeufigste_gegenstaende(vorlage_id: Optional[str] = None, limit: int = 10) -> Dict[str, List[dict]]:
+    query = (
+        StatistikNameModel.select(StatistikNameModel.vorlage_id, StatistikNameModel.name, StatistikNameModel.anzahl)
+        .where(StatistikNameModel.anzahl > 0)
+        .order_by(StatistikNameModel.vorlage_id, StatistikNameModel.anzahl.desc(), StatistikNameModel.name)
+    )
+    if vorlage_id is not None:
+        query = query.where(StatistikNameModel.vorlage_id == vorlage_id)
+    ergebnis = defaultdict(list)
+    for vid, name, anzahl in query.tuples():
+        if len(ergebnis[vid]) < limit:
+            ergebnis[vid].append({"name": name, "anzahl": anzahl})
+    return dict(ergebnis)
+
+
+# Items, die über alle aktiven Reisen am häufigsten ungepackt sind (Anteil in Prozent).
+# min_anzahl blendet seltene Items aus, bei denen eine Quote wenig aussagt.
+def oft_vergessen(limit: int = 10, min_anzahl: int = 3) -> List[dict]:
+    anzahl = fn.SUM(StatistikNameModel.anzahl)
+    ungepackt = anzahl - fn.SUM(StatistikNameModel.gepackt)
+    query = (
+        StatistikNameModel.select(StatistikNameModel.name, anzahl.alias("anzahl"), ungepackt.alias("ungepackt"))
+        .group_by(StatistikNameModel.name)
+        .having(anzahl >= min_anzahl)
+        .order_by((ungepackt * 1.0 / anzahl).desc(), anzahl.desc(), StatistikNameModel.name)
+        .limit(limit)
+    )
+    return [
+        {"name": name, "anzahl": n, "ungepackt": u, "quote": int(round(u / n * 100))}
+        for name, n, u in query.tuples()
+    ]
+
+
+# Durchschnittlicher Fortschritt (Mittel der Reisen, in Prozent) pro Reiseziel
+def fortschritt_pro_ziel() -> List[dict]:
+    prozent = fn.AVG(
+        fn.IIF(StatistikReiseModel.gesamt > 0, StatistikReiseModel.gepackt * 100.0 / StatistikReiseModel.gesamt, 0)
+    )
+    query = (
+        ReiseModel.select(ReiseModel.ziel, fn.COUNT(ReiseModel.id), prozent)
+        .join(StatistikReiseModel, on=(StatistikReiseModel.reise_id == ReiseModel.id))
+        .where(ReiseModel.geloescht == False)  # noqa: E712
+        .group_by(ReiseModel.ziel)
+        .order_by(ReiseModel.ziel)
+    )
+    return [
+        {"ziel": ziel, "reisen": n, "fortschritt": int(round(p or 0))}
+        for ziel, n, p in query.tuples()
+    ]
+
+
+# === Spaltenweise Auswertung (NumPy) =========================================
+# Für Reports und Batch-Jobs über alle Reisen: ein Query lädt alle Items als
+# Spalten, Gruppierungen laufen vektorisiert über np.bincount statt pro Reise
+# über fortschritt_berechnen(). NumPy ist optional (pip install numpy).
+
+# Klassengrenzen der Fortschritts-Verteilung in Prozent
+VERTEILUNG_GRENZEN = (0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("Für die spaltenweise Auswertung wird NumPy benötigt (pip install numpy)") from e
+    return numpy
+
+
+# Lädt (reise_id, kategorie_id, gepackt, menge, menge_gepackt) aller Items aktiver Reisen mit einem
+# Query in NumPy-Arrays. "reisen" enthält zusätzlich alle aktiven Reise-IDs
+# (auch Reisen ohne Items).
+def fortschritt_spalten() -> dict:
+    np = _numpy()
+    db = ReiseModel._meta.database
+    cursor = db.execute_sql(
+        """
+        SELECT k.reise_id, g.kategorie_id, g.gepackt, g.menge, g.menge_gepackt
+        FROM gegenstaende g
+        JOIN kategorien k ON k.id = g.kategorie_id
+        JOIN reisen r ON r.id = k.reise_id
+        WHERE r.geloescht = 0
+        """
+    )
+    werte = np.fromiter(chain.from_iterable(cursor), dtype=np.int64).reshape(-1, 5)
+    reisen = np.fromiter(
+        (rid for (rid,) in ReiseModel.aktive().select(ReiseModel.id).order_by(ReiseModel.id).tuples()),
+        dtype=np.int64,
+    )
+    return {
+        "reisen": reisen,
+        "reise": werte[:, 0],
+        "kategorie": werte[:, 1],
+        "gepackt": werte[:, 2].astype(bool),
+        "menge": np.maximum(werte[:, 3], 1),
+        "menge_gepackt": werte[:, 4],
+    }
+
+
+# Zähler und Prozentwerte pro Gruppe (gruppe = Reise- bzw. Kategorie-ID je Item)
+def _gruppieren(np, gruppe, ids, gepackt, menge, menge_gepackt) -> dict:
+    idx = np.searchsorted(ids, gruppe)
+    n = len(ids)
+    gesamt = np.bincount(idx, minlength=n)
+    gepackt_n = np.bincount(idx, weights=gepackt, minlength=n).astype(np.int64)
+    menge_gesamt = np.bincount(idx, weights=menge, minlength=n).astype(np.int64)
+    menge_gepackt = np.bincount(idx, weights=menge_gepackt, minlength=n).astype(np.int64)
+
+    def prozent(teil, ganz):
+        p = np.divide(teil * 100.0, ganz, out=np.zeros(n), where=ganz > 0)
+        # np.rint rundet wie round() (halbe Werte zur geraden Zahl)
+        return np.rint(p).astype(np.int64)
+
+    return {
+        "id": ids,
+        "gesamt": gesamt,
+        "gepackt": gepackt_n,
+        "menge_gesamt": menge_gesamt,
+        "menge_gepackt": menge_gepackt,
+        "fortschritt": prozent(gepackt_n, gesamt),
+        "fortschritt_menge": prozent(menge_gepackt, menge_gesamt),
+    }
+
+
+# Fortschritt pro Reise und pro Kategorie (nach Anzahl und nach Menge gewichtet)
+# sowie die Verteilung der Reise-Fortschritte. Ohne Argument werden die Spalten
+# über fortschritt_spalten() geladen.
+def fortschritt_auswerten(spalten: Optional[dict] = None) -> dict:
+    np = _numpy()
+    if spalten is None:
+        spalten = fortschritt_spalten()
+    werte = (spalten["gepackt"].astype(np.int64), spalten["menge"], spalten["menge_gepackt"])
+
+    reisen = _gruppieren(np, spalten["reise"], spalten["reisen"], *werte)
+    kategorien = _gruppieren(np, spalten["kategorie"], np.unique(spalten["kategorie"]), *werte)
+
+    anzahl, _ = np.histogram(reisen["fortschritt"], bins=VERTEILUNG_GRENZEN)
+    return {
+        "reisen": reisen,
+        "kategorien": kategorien,
+        "verteilung": {"grenzen": list(VERTEILUNG_GRENZEN), "anzahl": anzahl.tolist()},
+        "mittel": float(reisen["fortschritt"].mean()) if len(reisen["id"]) else 0.0,
+        "median": float(np.median(reisen["fortschritt"])) if len(reisen["id"]) else 0.0,
+        "gesamt": int(reisen["gesamt"].sum()),
+        "gepackt": int(reisen["gepackt"].sum()),
+    }
+
+
+if __name__ == "__main__":
+    # python statistik.py  -> Fortschritts-Report über alle aktiven Reisen
+    from migrationen import datenbank_initialisieren
+
+    datenbank_initialisieren()
+    try:
+        bericht = fortschritt_auswerten()
+    except ImportError as e:
+        print(e)
+        sys.exit(1)
+    print(f"{len(bericht['reisen']['id'])} Reisen, {bericht['gepackt']}/{bericht['gesamt']} Items gepackt")
+    print(f"Fortschritt: Mittel {bericht['mittel']:.1f} %, Median {bericht['median']:.0f} %")
+    grenzen = bericht["verteilung"]["grenzen"]
+    for von, bis, n in zip(grenzen, grenzen[1:], bericht["verteilung"]["anzahl"]):
+        print(f"  {von:3d}-{bis:3d} %: {n:6d} {'#' * min(n, 60)}")
+    print("Häufig vergessen:")
+    for eintrag in oft_vergessen():
+        print(f"  {eintrag['name']}: {eintrag['ungepackt']}/{eintrag['anzahl']} ungepackt ({eintrag['quote']} %)")
@@ -0,0 +1,369 @@
+import json
+import sys
+from typing import Callable
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from peewee import CharField, DateTimeField, IntegerField, SqliteDatabase
+from playhouse.sqlite_ext import AutoIncrementField
+
+from database import (
+    BaseModel,
+    ReiseModel,
+    KategorieModel,
+    GegenstandNameModel,
+    GegenstandModel,
+    jetzt_utc,
+    reise_als_geloescht_markieren,
+)
+from austausch import reise_importieren
+from cache import reise_cache
+from lesemodell import reisen_lesen
+
+
+# Abgleich zwischen mehreren PackAttack-Instanzen (z.B. Heimserver und Laptop).
+#
+# SQLite-Trigger führen ein Änderungsprotokoll (Tabelle aenderungen) mit genau
+# einem Eintrag pro geändertem Reise-Kopf, Item bzw. Kategorie-Namen. Die
+# laufende Nummer des Eintrags ist die Revision dieser Zeile: jede weitere
+# Änderung ersetzt den Eintrag durch einen mit höherer Nummer (AUTOINCREMENT,
+# Nummern werden nie wiederverwendet). Eine andere Instanz fragt "Änderungen seit
+# Nummer N" ab und bekommt pro geänderter Reise immer nur ein Delta:
+#   Items geändert/gelöscht       -> nur diese Items + "entfernt" (ihre uids)
+#   Kategorien neu/umbenannt/weg  -> diese Kategorien + "kategorien_entfernt"
+#   Kopf geändert                 -> "kopf": true, sonst gelten die Kopfdaten nicht
+#   Reise gelöscht                -> {"uid": ..., "geloescht": true}
+# Gelöscht wird beim Empfänger nur, was ausdrücklich als entfernt gemeldet ist;
+# was im Delta fehlt, bleibt unangetastet (auch lokal neu angelegte Items). Der
+# Empfänger führt die Reisen über ihre uid zusammen (reise_importieren, schreibt
+# nur Unterschiede), eine Seite pro Transaktion, und speichert in derselben
+# Transaktion den erreichten Stand der Quelle. Ändern beide Seiten dasselbe Item,
+# gewinnt der zuletzt übernommene Stand.
+
+# Anzahl Protokoll-Einträge pro Seite (= pro Transaktion beim Empfänger)
+SYNC_BATCH = 500
+
+
+# Änderungsprotokoll: ein Item (gegenstand_uid), eine Kategorie (kategorie =
+# ihr Name) oder, wenn beides leer ist, der Kopf der Reise
+class AenderungModel(BaseModel):
+    class Meta:
+        table_name = "aenderungen"
+        indexes = ((("reise_uid", "gegenstand_uid", "kategorie"), True),)
+
+    nr = AutoIncrementField()
+    reise_uid = CharField(max_length=32)
+    gegenstand_uid = CharField(max_length=12, default="")
+    kategorie = CharField(max_length=200, default="")
+
+
+# Bis zu welcher Nummer die Änderungen einer Quelle übernommen wurden
+class SyncStandModel(BaseModel):
+    class Meta:
+        table_name = "sync_stand"
+
+    quelle = CharField(max_length=500, primary_key=True)
+    stand = IntegerField(default=0)
+    abgeglichen_am = DateTimeField(null=True)
+
+
+MODELLE = [AenderungModel, SyncStandModel]
+
+
+# === Trigger =================================================================
+
+# uid der Reise zu einer Kategorie-ID (SQL-Ausdruck)
+def _reise_uid(kategorie_id: str) -> str:
+    return f"(SELECT r.uid FROM kategorien k JOIN reisen r ON r.id = k.reise_id WHERE k.id = {kategorie_id})"
+
+
+# Eintrag für den Kopf einer Reise (nur die Kopfdaten, nicht ihre Items)
+def _reise_eintragen(uid: str) -> str:
+    return f"""
+    INSERT OR REPLACE INTO aenderungen (reise_uid, gegenstand_uid, kategorie)
+    SELECT {uid}, '', '' WHERE {uid} IS NOT NULL;"""
+
+
+# Eintrag für einen Kategorie-Namen (x = NEW/OLD). Ist die Kategorie danach weg,
+# meldet die Quelle den Namen als entfernt.
+def _kategorie_eintragen(x: str) -> str:
+    uid = f"(SELECT uid FROM reisen WHERE id = {x}.reise_id)"
+    return f"""
+    INSERT OR REPLACE INTO aenderungen (reise_uid, gegenstand_uid, kategorie)
+    SELECT {uid}, '', {x}.name WHERE {uid} IS NOT NULL;"""
+
+
+# Einträge für alle Items einer Kategorie: nach dem Umbenennen oder Verschieben
+# liegen sie beim Empfänger sonst noch in der alten (dann entfernten) Kategorie
+def _kategorie_items_eintragen(x: str) -> str:
+    return f"""
+    INSERT OR REPLACE INTO aenderungen (reise_uid, gegenstand_uid, kategorie)
+    SELECT r.uid, g.uid, '' FROM gegenstaende g JOIN kategorien k ON k.id = g.kategorie_id
+    JOIN reisen r ON r.id = k.reise_id WHERE k.id = {x}.id AND g.uid IS NOT NULL AND r.uid IS NOT NULL;"""
+
+
+# Eintrag für ein einzelnes Item (x = NEW/OLD). Ist die Kategorie schon gelöscht
+# (CASCADE), hat ihr Trigger bereits den Namen als Tombstone eingetragen.
+def _item_eintragen(x: str) -> str:
+    uid = _reise_uid(f"{x}.kategorie_id")
+    return f"""
+    INSERT OR REPLACE INTO aenderungen (reise_uid, gegenstand_uid, kategorie)
+    SELECT {uid}, {x}.uid, '' WHERE {uid} IS NOT NULL AND {x}.uid IS NOT NULL;"""
+
+
+_REISE_FELDER = ("name", "ziel", "startdatum", "enddatum", "beschreibung", "geloescht", "uid")
+_ITEM_FELDER = ("name", "katalog_id", "menge", "gepackt", "menge_gepackt", "menge_pro_tag", "kategorie_id", "uid")
+
+
+def _geaendert(felder) -> str:
+    return " OR ".join(f"OLD.{f} IS NOT NEW.{f}" for f in felder)
+
+
+# revision/geaendert_am der Reise sind bewusst nicht dabei: sie ändern sich mit
+# jedem Item und würden sonst jedes Mal den Kopf eintragen
+TRIGGER = {
+    "sync_reise_insert": f"""
+        AFTER INSERT ON reisen BEGIN
+            {_reise_eintragen("NEW.uid")}
+        END""",
+    "sync_reise_update": f"""
+        AFTER UPDATE OF {", ".join(_REISE_FELDER)} ON reisen WHEN {_geaendert(_REISE_FELDER)} BEGIN
+            {_reise_eintragen("NEW.uid")}
+        END""",
+    "sync_reise_delete": f"""
+        BEFORE DELETE ON reisen BEGIN
+            {_reise_eintragen("OLD.uid")}
+        END""",
+    # Ist die Reise endgültig weg (Purge), reicht ihr Tombstone: die Einträge
+    # ihrer Items und Kategorien würden sonst jeden Abgleich ab 0 verlängern
+    "sync_reise_purge": """
+        AFTER DELETE ON reisen BEGIN
+            DELETE FROM aenderungen WHERE reise_uid = OLD.uid AND (gegenstand_uid != '' OR kategorie != '');
+        END""",
+    "sync_kategorie_insert": f"""
+        AFTER INSERT ON kategorien BEGIN
+            {_kategorie_eintragen("NEW")}
+        END""",
+    "sync_kategorie_update": f"""
+        AFTER UPDATE OF name, reise_id ON kategorien WHEN {_geaendert(("name", "reise_id"))} BEGIN
+            {_kategorie_eintragen("OLD")}
+            {_kategorie_eintragen("NEW")}
+            {_kategorie_items_eintragen("NEW")}
+        END""",
+    "sync_kategorie_delete": f"""
+        BEFORE DELETE ON kategorien BEGIN
+            {_kategorie_eintragen("OLD")}
+        END""",
+    "sync_item_insert": f"""
+        AFTER INSERT ON gegenstaende BEGIN
+            {_item_eintragen("NEW")}
+        END""",
+    "sync_item_update": f"""
+        AFTER UPDATE OF {", ".join(_ITEM_FELDER)} ON gegenstaende WHEN {_geaendert(_ITEM_FELDER)} BEGIN
+            {_item_eintragen("NEW")}
+        END""",
+    "sync_item_delete": f"""
+        AFTER DELETE ON gegenstaende BEGIN
+            {_item_eintragen("OLD")}
+        END""",
+}
+
+
+def _db():
+    # Über das Model, damit auch an eine andere DB gebundene Modelle (Tests) passen
+    return AenderungModel._meta.database
+
+
+# Legt Protokoll, Stand-Tabelle und Trigger an. Bestehende Reisen werden einmal
+# mit Kopf, Kategorien und Items eingetragen, damit ein erster Abgleich ab 0
+# alles überträgt.
+def sync_einrichten():
+    db = _db()
+    with db.atomic():
+        db.create_tables(MODELLE)
+        for name, sql in TRIGGER.items():
+            db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{name}" {sql}')
+        for sql in (
+            "SELECT uid, '', '' FROM reisen WHERE uid IS NOT NULL ORDER BY id",
+            "SELECT r.uid, '', k.name FROM kategorien k JOIN reisen r ON r.id = k.reise_id "
+            "WHERE r.uid IS NOT NULL ORDER BY k.id",
+            "SELECT r.uid, g.uid, '' FROM gegenstaende g JOIN kategorien k ON k.id = g.kategorie_id "
+            "JOIN reisen r ON r.id = k.reise_id WHERE r.uid IS NOT NULL AND g.uid IS NOT NULL ORDER BY g.id",
+        ):
+            db.execute_sql(f"INSERT OR IGNORE INTO aenderungen (reise_uid, gegenstand_uid, kategorie) {sql}")
+
+
+# === Quelle: Änderungen abfragen ==============================================
+
+# Höchste vergebene Nummer (0 = noch keine Änderungen)
+def aktueller_stand() -> int:
+    nr = AenderungModel.select(AenderungModel.nr).order_by(AenderungModel.nr.desc()).scalar()
+    return nr or 0
+
+
+# Änderungen nach Nummer "seit", höchstens "limit" Protokoll-Einträge:
+# {"stand": nr, "weitere": bool, "reisen": [Delta | {"uid", "geloescht"}]}.
+# Jedes Delta trägt die Kopfdaten (damit der Empfänger eine ihm unbekannte Reise
+# anlegen kann), "kopf" (ob sie geändert wurden), die geänderten Items in ihren
+# Kategorien, die neuen/umbenannten Kategorien und die Tombstones "entfernt"
+# (Item-uids) und "kategorien_entfernt" (Namen). Die Reisen werden mit drei
+# Queries geladen, unabhängig von ihrer Anzahl.
+def aenderungen_seit(seit: int, limit: int = SYNC_BATCH) -> dict:
+    with _db().atomic():
+        eintraege = list(
+            AenderungModel.select(
+                AenderungModel.nr, AenderungModel.reise_uid, AenderungModel.gegenstand_uid, AenderungModel.kategorie
+            )
+            .where(AenderungModel.nr > seit)
+            .order_by(AenderungModel.nr)
+            .limit(limit)
+            .tuples()
+        )
+        if not eintraege:
+            return {"stand": seit, "weitere": False, "reisen": []}
+
+        geaendert = {}
+        for _, reise_uid, gegenstand_uid, kategorie in eintraege:
+            art = geaendert.setdefault(reise_uid, {"kopf": False, "gegenstaende": set(), "kategorien": set()})
+            if gegenstand_uid:
+                art["gegenstaende"].add(gegenstand_uid)
+            elif kategorie:
+                art["kategorien"].add(kategorie)
+            else:
+                art["kopf"] = True
+        ids = {
+            uid: r_id
+            for r_id, uid in ReiseModel.select(ReiseModel.id, ReiseModel.uid)
+            .where((ReiseModel.geloescht == False) & ReiseModel.uid.in_(list(geaendert)))  # noqa: E712
+            .tuples()
+        }
+        gelesen = {r.uid: r for r in reisen_lesen(list(ids.values()))} if ids else {}
+
+        reisen = []
+        for uid, art in geaendert.items():
+            r = gelesen.get(uid)
+            if r is None:
+                reisen.append({"uid": uid, "geloescht": True})
+                continue
+            daten = r.als_export()
+            uids, namen = art["gegenstaende"], set()
+            vorhanden = set()
+            for k in daten["kategorien"]:
+                k["gegenstaende"] = [g for g in k["gegenstaende"] if g.get("uid") in uids]
+                vorhanden.update(g["uid"] for g in k["gegenstaende"])
+                namen.add(k["name"])
+            daten["kategorien"] = [k for k in daten["kategorien"] if k["gegenstaende"] or k["name"] in art["kategorien"]]
+            daten["kopf"] = art["kopf"]
+            daten["entfernt"] = sorted(uids - vorhanden)
+            daten["kategorien_entfernt"] = sorted(art["kategorien"] - namen)
+            reisen.append(daten)
+    return {"stand": eintraege[-1][0], "weitere": len(eintraege) == limit, "reisen": reisen}
+
+
+# === Empfänger: Änderungen übernehmen =========================================
+
+# Schlüssel, die nur beim Zusammenführen in eine vorhandene Reise gelten
+_NUR_DELTA = ("kopf", "entfernt", "kategorien_entfernt")
+
+# Übernimmt eine Seite aus aenderungen_seit in einer Transaktion. Lokal gelöschte
+# Reisen bleiben gelöscht; hier unbekannte Reisen werden aus dem Delta angelegt
+# (spätere Seiten ergänzen ihre übrigen Items). Alles andere wird als Delta
+# zusammengeführt: es gibt keinen Vollabgleich, der fehlende Items löscht.
+# Die IDs aller geschriebenen Reisen landen in "beruehrt"; der Aufrufer
+# invalidiert sie nach dem Commit im reise_cache (siehe synchronisieren).
+def aenderungen_anwenden(seite: dict, beruehrt: set) -> dict:
+    zaehler = {"neu": 0, "aktualisiert": 0, "geloescht": 0, "uebersprungen": 0}
+    with _db().atomic():
+        for daten in seite["reisen"]:
+            lokal = (
+                ReiseModel.select(ReiseModel.id, ReiseModel.geloescht)
+                .where(ReiseModel.uid == str(daten.get("uid") or ""))
+                .first()
+            )
+            if daten.get("geloescht"):
+                if lokal is not None and not lokal.geloescht:
+                    reise_als_geloescht_markieren(lokal.id)
+                    beruehrt.add(lokal.id)
+                    zaehler["geloescht"] += 1
+            elif lokal is not None and lokal.geloescht:
+                zaehler["uebersprungen"] += 1
+            elif lokal is None:
+                r, _ = reise_importieren({k: v for k, v in daten.items() if k not in _NUR_DELTA})
+                beruehrt.add(r.id)
+                zaehler["neu"] += 1
+            else:
+                reise_importieren({"entfernt": [], **daten})
+                beruehrt.add(lokal.id)
+                zaehler["aktualisiert"] += 1
+    return zaehler
+
+
+# Holt alle Änderungen einer Quelle seit dem letzten Abgleich, Seite für Seite.
+# holen(seit, limit) liefert eine Seite (siehe aus_datei / aus_url). Seite und
+# neuer Stand werden gemeinsam gespeichert: ein Abbruch setzt an der letzten
+# vollständig übernommenen Seite wieder auf. Der reise_cache dieses Prozesses
+# wird erst nach dem Commit einer Seite invalidiert, sonst könnte ein paralleler
+# Leser den alten Stand wieder einlagern. Schreibt ein anderer Prozess (python
+# sync.py), erkennt api_reise den Unterschied an der Revision.
+def synchronisieren(quelle: str, holen: Callable[[int, int], dict], batch: int = SYNC_BATCH) -> dict:
+    gesamt = {"neu": 0, "aktualisiert": 0, "geloescht": 0, "uebersprungen": 0, "seiten": 0}
+    eintrag = SyncStandModel.get_or_none(SyncStandModel.quelle == quelle)
+    stand = eintrag.stand if eintrag else 0
+    while True:
+        seite = holen(stand, batch)
+        beruehrt: set = set()
+        with _db().atomic():
+            for schluessel, n in aenderungen_anwenden(seite, beruehrt).items():
+                gesamt[schluessel] += n
+            stand = seite["stand"]
+            SyncStandModel.insert(quelle=quelle, stand=stand, abgeglichen_am=jetzt_utc()).on_conflict_replace().execute()
+        for reise_id in beruehrt:
+            reise_cache.invalidieren(reise_id)
+        gesamt["seiten"] += 1
+        if not seite["weitere"]:
+            break
+    gesamt["stand"] = stand
+    return gesamt
+
+
+# Quelle: eine andere app.db auf demselben Rechner (z.B. vom Laptop kopiert).
+# Bindet die Modelle nur für die Dauer einer Abfrage um, also nicht aus
+# laufenden Server-Threads heraus verwenden (dort aus_url).
+def aus_datei(pfad: str) -> Callable[[int, int], dict]:
+    quelle_db = SqliteDatabase(str(pfad), pragmas={"foreign_keys": 1})
+    modelle = [ReiseModel, KategorieModel, GegenstandNameModel, GegenstandModel] + MODELLE
+
+    def holen(seit: int, limit: int) -> dict:
+        with quelle_db.bind_ctx(modelle):
+            if not AenderungModel.table_exists():
+                raise ValueError(f"{pfad} hat kein Änderungsprotokoll (einmal mit aktueller Version starten)")
+            return aenderungen_seit(seit, limit)
+
+    return holen
+
+
+# Quelle: eine laufende Instanz über GET /api/sync/aenderungen
+def aus_url(basis_url: str, timeout: float = 30.0) -> Callable[[int, int], dict]:
+    def holen(seit: int, limit: int) -> dict:
+        url = f"{basis_url.rstrip('/')}/api/sync/aenderungen?{urlencode({'seit': seit, 'limit': limit})}"
+        with urlopen(url, timeout=timeout) as antwort:
+            return json.loads(antwort.read().decode("utf-8"))
+
+    return holen
+
+
+if __name__ == "__main__":
+    # python sync.py <andere.db | http://host:8080>  -> Änderungen in app.db übernehmen
+    from migrationen import datenbank_initialisieren
+
+    if len(sys.argv) != 2:
+        print("Aufruf: python sync.py <andere.db | http://host:port>")
+        sys.exit(2)
+    datenbank_initialisieren()
+    quelle = sys.argv[1]
+    holen = aus_url(quelle) if quelle.startswith(("http://", "https://")) else aus_datei(quelle)
+    ergebnis = synchronisieren(quelle, holen)
+    print(
+        f"{ergebnis['neu']} neu, {ergebnis['aktualisiert']} aktualisiert, {ergebnis['geloescht']} gelöscht, "
+        f"{ergebnis['uebersprungen']} übersprungen (Stand {ergebnis['stand']}, {ergebnis['seiten']} Seiten)"
+    )
@@ -0,0 +1,107 @@
+import base64
+import json
+import re
+import zlib
+
+
+# Kompakter Teilen-Code für eine einzelne Reise (z.B. per WhatsApp oder Mail).
+#
+# Der JSON-Export mit indent=2 wird bei großen Listen schnell mehrere KB lang und
+# von Messengern abgeschnitten. Der Teilen-Code ist derselbe Export, aber:
+#   - minifiziert (ohne Einrückung und Leerzeichen)
+#   - mit zlib komprimiert, mit einem voreingestellten Wörterbuch aus den
+#     Namen der mitgelieferten Vorlagen und den JSON-Schlüsseln des Exports
+#   - Base85-kodiert, damit er als Text kopiert werden kann
+# Aufbau: PRAEFIX | base85( zlib(zdict=Wörterbuch, minifiziertes JSON) )
+#
+# Das Wörterbuch ist fest: mit einem anderen Wörterbuch lassen sich ältere Codes
+# nicht mehr lesen. Für ein neues Wörterbuch deshalb eine neue Version (PA2:)
+# anlegen und die alte zum Lesen behalten.
+
+PRAEFIX = "PA1:"
+
+# Obergrenze für den entpackten Export. Ein paar KB Code könnten sonst zu
+# Gigabytes aufgehen (Zip-Bombe); echte Reisen bleiben weit darunter.
+MAX_ENTPACKT = 4 * 1024 * 1024
+
+# Stand der Namen aus vorlagen.json bei Einführung von Version 1
+_NAMEN_V1 = (
+    "Dokumente", "Hygiene & Gesundheit", "Elektronik", "Kleidung", "Aktivitätenspezifisch", "Tagesausrüstung",
+    "Versicherung (Karte/Police)", "Zahlungsmittel (Karte/Bargeld)", "Ausweis/Reisepass", "Tickets/Reservierungen",
+    "Zahnbürste & Zahnpasta", "Sonnencreme", "Smartphone + Ladegerät", "Powerbank", "Steckdosenadapter (Land)",
+    "Kopfhörer", "T-Shirts", "Unterhosen", "Socken", "Badehose/Bikini", "Leichtes Strand-Outfit", "Flip-Flops",
+    "Sonnenbrille", "Sonnenhut/Kappe", "Strandtuch", "Strandtasche", "After-Sun", "Persönliche Medikamente",
+    "Wasserflasche", "Lesestoff/E-Book", "Ausweis/ID", "Tickets/Reservierungen/ÖPNV-Pässe", "T-Shirts/Hemden",
+    "Bequeme Schuhe/Sneaker", "Jacke/Pullover", "Stadtplan/Offline-Maps (Papier)", "Deo",
+    "Reisegrößen Shampoo/Duschgel", "Tagesrucksack", "Kleiner Regenschirm", "Funktionsshirts", "Wandersocken",
+    "Wanderhose", "Fleece/Isolationsschicht", "Regenjacke", "Wanderschuhe (eingelaufen)", "Rucksack (20–30 L)",
+    "Wanderstöcke", "Regenhülle Rucksack", "Karte/GPS/Offline-Maps (Papier)", "Erste-Hilfe-Set",
+    "Blasenpflaster/Tape", "Wasserflasche/Hydration", "Snacks/Energieriegel", "Tickets/Reservierungen/Skipass",
+    "Skisocken", "Funktionsunterwäsche (Set)", "Thermoschicht (Fleece)", "Ski-/Snowboardjacke",
+    "Ski-/Snowboardhose", "Ski/Snowboard", "Skischuhe/Boots", "Stöcke (bei Ski)", "Helm", "Skibrille",
+    "Handschuhe", "Neckwarmer/Mütze", "Lippenpflege", "Thermoflasche",
+)
+
+# Häufige Bruchstücke des minifizierten Exports. zlib findet Treffer am Ende des
+# Wörterbuchs am günstigsten, deshalb stehen sie hinter den Namen.
+_JSON_TEILE_V1 = (
+    '{"name":"',
+    '","ziel":"',
+    '","startdatum":"20',
+    '","enddatum":"20',
+    '","beschreibung":"',
+    ',"menge_pro_tag":1.0}',
+    ',"menge_gepackt":',
+    '","kategorien":[{"name":"',
+    ']},{"name":"',
+    '","gegenstaende":[{"name":"',
+    '","menge":1,"gepackt":true}',
+    '","menge":1,"gepackt":false},{"name":"',
+)
+
+
+def _woerterbuch(namen, json_teile) -> bytes:
+    return ("".join(f'"{n}"' for n in namen) + "".join(json_teile)).encode("utf-8")
+
+
+_WOERTERBUCH = {PRAEFIX: _woerterbuch(_NAMEN_V1, _JSON_TEILE_V1)}
+
+
+# Erzeugt den Teilen-Code für eine exportierte Reise (Format von export_reise_to_dict)
+def teilcode_erstellen(daten: dict) -> str:
+    text = json.dumps(daten, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    komprimierer = zlib.compressobj(9, zdict=_WOERTERBUCH[PRAEFIX])
+    gepackt = komprimierer.compress(text) + komprimierer.flush()
+    return PRAEFIX + base64.b85encode(gepackt).decode("ascii")
+
+
+# Erkennt, ob ein eingefügter Text ein Teilen-Code ist
+def ist_teilcode(text: str) -> bool:
+    return text.lstrip().startswith(tuple(_WOERTERBUCH))
+
+
+# Liest einen Teilen-Code wieder ein. Zeilenumbrüche und Leerzeichen, die
+# Messenger beim Kopieren einfügen, werden ignoriert.
+def teilcode_lesen(text: str) -> dict:
+    text = text.strip()
+    praefix = next((p for p in _WOERTERBUCH if text.startswith(p)), None)
+    if praefix is None:
+        raise ValueError("Kein PackAttack-Teilen-Code")
+    try:
+        gepackt = base64.b85decode(re.sub(r"\s+", "", text[len(praefix):]))
+        entpacker = zlib.decompressobj(zdict=_WOERTERBUCH[praefix])
+        roh = entpacker.decompress(gepackt, MAX_ENTPACKT)
+    except (ValueError, zlib.error):
+        raise ValueError("Teilen-Code ist unvollständig oder beschädigt")
+    if entpacker.unconsumed_tail:
+        raise ValueError("Teilen-Code ist zu groß")
+    if not entpacker.eof:
+        raise ValueError("Teilen-Code ist unvollständig oder beschädigt")
+    return json.loads(roh.decode("utf-8"))
+
+
+# Liest einen eingefügten Import-Text: Teilen-Code oder JSON-Export
+def import_text_lesen(text: str) -> dict:
+    if ist_teilcode(text):
+        return teilcode_lesen(text)
+    return json.loads(text)
@@ -0,0 +1,463 @@
+import hashlib
+import json
+import logging
+import re
+import sys
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from threading import RLock
+from typing import Callable, Dict, List, Optional
+
+from peewee import AutoField, CharField, DateTimeField, FloatField, ForeignKeyField, IntegerField
+
+from database import (
+    BaseModel,
+    KategorieModel,
+    GegenstandModel,
+    ReiseModel,
+    gegenstand_name,
+    jetzt_utc,
+    mit_katalog,
+    nach_id_nummeriert,
+)
+
+log = logging.getLogger(__name__)
+
+
+# Eigene Vorlagen in der Datenbank.
+#
+# Neben den mitgelieferten Vorlagen aus vorlagen.json kann jede Reise als Vorlage
+# gespeichert werden. Kategorien und Items werden dabei per INSERT ... SELECT
+# direkt in der DB kopiert. Nach außen haben eigene Vorlagen dasselbe Format wie
+# die aus der Datei (id, name, kategorien), die ID lautet "eigene-<n>".
+
+PREFIX = "eigene-"
+
+
+class EigeneVorlageModel(BaseModel):
+    class Meta:
+        table_name = "eigene_vorlagen"
+
+    id = AutoField()
+    name = CharField(max_length=200)
+    erstellt_am = DateTimeField(default=jetzt_utc)
+
+
+class VorlageKategorieModel(BaseModel):
+    class Meta:
+        table_name = "vorlage_kategorien"
+
+    id = AutoField()
+    name = CharField(max_length=200)
+    vorlage = ForeignKeyField(EigeneVorlageModel, backref="kategorien", on_delete="CASCADE")
+
+
+# Menge wie in vorlagen.json: feste "menge" oder "menge_pro_tag" (hat Vorrang)
+class VorlageGegenstandModel(BaseModel):
+    class Meta:
+        table_name = "vorlage_gegenstaende"
+
+    id = AutoField()
+    name = CharField(max_length=200)
+    menge = IntegerField(default=1)
+    menge_pro_tag = FloatField(null=True)
+    kategorie = ForeignKeyField(VorlageKategorieModel, backref="gegenstaende", on_delete="CASCADE")
+
+
+MODELLE = [EigeneVorlageModel, VorlageKategorieModel, VorlageGegenstandModel]
+
+
+# Legt die Tabellen an (idempotent, siehe Migration 7)
+def vorlagen_tabellen_anlegen():
+    EigeneVorlageModel._meta.database.create_tables(MODELLE)
+
+
+# "eigene-3" -> 3 (None für Vorlagen aus der Datei)
+def _db_id(vorlage_id: str) -> Optional[int]:
+    if not str(vorlage_id).startswith(PREFIX):
+        return None
+    try:
+        return int(str(vorlage_id)[len(PREFIX):])
+    except ValueError:
+        return None
+
+
+# Eintrag für den Vorlagen-Index (ohne Kategorien)
+def _kopf(v_id: int, name: str) -> dict:
+    return {"id": f"{PREFIX}{v_id}", "name": name, "eigene": True}
+
+
+# Alle eigenen Vorlagen als Index-Einträge, in einer Query
+def eigene_vorlagen() -> List[dict]:
+    return [
+        _kopf(v_id, name)
+        for v_id, name in EigeneVorlageModel.select(EigeneVorlageModel.id, EigeneVorlageModel.name)
+        .order_by(EigeneVorlageModel.id)
+        .tuples()
+    ]
+
+
+# Speichert eine Reise als Vorlage: Kategorien und Items werden mit je einem
+# INSERT ... SELECT kopiert (Packstatus wird nicht übernommen). Gibt den
+# Index-Eintrag zurück, None falls die Reise nicht existiert.
+def reise_als_vorlage_speichern(reise_id: int, name: str) -> Optional[dict]:
+    if not ReiseModel.aktive().where(ReiseModel.id == reise_id).exists():
+        return None
+    with EigeneVorlageModel._meta.database.atomic():
+        v = EigeneVorlageModel.create(name=name)
+        VorlageKategorieModel.insert_from(
+            KategorieModel.select(KategorieModel.name, v.id)
+            .where(KategorieModel.reise == reise_id)
+            .order_by(KategorieModel.id),
+            [VorlageKategorieModel.name, VorlageKategorieModel.vorlage],
+        ).execute()
+
+        k_alt = nach_id_nummeriert(KategorieModel, KategorieModel.reise == reise_id, "k_alt")
+        k_neu = nach_id_nummeriert(VorlageKategorieModel, VorlageKategorieModel.vorlage == v.id, "k_neu")
+        VorlageGegenstandModel.insert_from(
+            mit_katalog(
+                GegenstandModel.select(
+                    gegenstand_name(), GegenstandModel.menge, GegenstandModel.menge_pro_tag, k_neu.c.id
+                )
+                .join(k_alt, on=(k_alt.c.id == GegenstandModel.kategorie))
+                .join(k_neu, on=(k_neu.c.nr == k_alt.c.nr))
+            )
+            .with_cte(k_alt, k_neu)
+            .order_by(GegenstandModel.id),
+            [
+                VorlageGegenstandModel.name,
+                VorlageGegenstandModel.menge,
+                VorlageGegenstandModel.menge_pro_tag,
+                VorlageGegenstandModel.kategorie,
+            ],
+        ).execute()
+    return _kopf(v.id, v.name)
+
+
+# Lädt eine eigene Vorlage im Format von vorlagen.json (zwei Queries)
+def eigene_vorlage_laden(vorlage_id: str) -> Optional[dict]:
+    v = EigeneVorlageModel.get_or_none(EigeneVorlageModel.id == _db_id(vorlage_id))
+    if v is None:
+        return None
+    kategorien = OrderedDict(
+        (kat_id, {"name": kat_name, "gegenstaende": []})
+        for kat_id, kat_name in VorlageKategorieModel.select(VorlageKategorieModel.id, VorlageKategorieModel.name)
+        .where(VorlageKategorieModel.vorlage == v.id)
+        .order_by(VorlageKategorieModel.id)
+        .tuples()
+    )
+    for name, menge, pro_tag, kat_id in (
+        VorlageGegenstandModel.select(
+            VorlageGegenstandModel.name,
+            VorlageGegenstandModel.menge,
+            VorlageGegenstandModel.menge_pro_tag,
+            VorlageGegenstandModel.kategorie,
+        )
+        .where(VorlageGegenstandModel.kategorie.in_(list(kategorien)))
+        .order_by(VorlageGegenstandModel.id)
+        .tuples()
+    ):
+        item = {"name": name, "menge": menge}
+        if pro_tag is not None:
+            item["menge_pro_tag"] = pro_tag
+        kategorien[kat_id]["gegenstaende"].append(item)
+    return {"id": f"{PREFIX}{v.id}", "name": v.name, "eigene": True, "kategorien": list(kategorien.values())}
+
+
+# Löscht eine eigene Vorlage samt Kategorien und Items (per CASCADE)
+def eigene_vorlage_loeschen(vorlage_id: str) -> bool:
+    v_id = _db_id(vorlage_id)
+    if v_id is None:
+        return False
+    return bool(EigeneVorlageModel.delete().where(EigeneVorlageModel.id == v_id).execute())
+
+
+# === Bausteine ===============================================================
+# Vorlagen und Bausteine können in ihrer Kategorien-Liste andere Bausteine
+# einbinden, z.B. {"baustein": "dokumente"}. Gleichnamige Kategorien werden
+# dabei zusammengeführt (Reihenfolge des ersten Auftretens), ein Item-Name kommt
+# pro Kategorie nur einmal vor (der erste gewinnt). Aufgelöst wird einmal beim
+# Laden; danach sind alle Vorlagen flach und das Anlegen einer Reise kostet
+# unabhängig von der Verschachtelung gleich viel.
+
+# Hängt die Kategorien an das Ergebnis an (Name -> (Items, vorhandene Item-Namen))
+def _kategorien_einfuegen(ziel: "OrderedDict[str, tuple]", kategorien: List[dict]):
+    for kat in kategorien:
+        items, namen = ziel.setdefault(str(kat.get("name", "")).strip(), ([], set()))
+        for g in kat.get("gegenstaende", []):
+            if g.get("name") not in namen:
+                namen.add(g.get("name"))
+                items.append(dict(g))
+
+
+# Löst die Baustein-Verweise einer Vorlage auf. baustein_laden(id) liefert die
+# (noch nicht aufgelöste) Kategorien-Liste eines Bausteins oder None; bereits
+# aufgelöste Bausteine werden in `aufgeloest` wiederverwendet.
+def vorlage_aufloesen(
+    vorlage: dict,
+    baustein_laden: Callable[[str], Optional[List[dict]]],
+    aufgeloest: Optional[Dict[str, List[dict]]] = None,
+) -> dict:
+    aufgeloest = {} if aufgeloest is None else aufgeloest
+
+    def kategorien(eintraege: List[dict], pfad: frozenset) -> List[dict]:
+        ziel: "OrderedDict[str, tuple]" = OrderedDict()
+        for eintrag in eintraege:
+            if not isinstance(eintrag, dict):
+                continue
+            if "baustein" in eintrag:
+                _kategorien_einfuegen(ziel, baustein(eintrag["baustein"], pfad))
+            else:
+                _kategorien_einfuegen(ziel, [eintrag])
+        return [{"name": name, "gegenstaende": items} for name, (items, _) in ziel.items()]
+
+    def baustein(b_id: str, pfad: frozenset) -> List[dict]:
+        if b_id in pfad:
+            raise ValueError(f"Baustein „{b_id}“ bindet sich selbst ein")
+        if b_id not in aufgeloest:
+            quelle = baustein_laden(b_id)
+            if quelle is None:
+                raise ValueError(f"Unbekannter Baustein „{b_id}“")
+            aufgeloest[b_id] = kategorien(quelle, pfad | {b_id})
+        return aufgeloest[b_id]
+
+    return {**vorlage, "kategorien": kategorien(vorlage.get("kategorien", []), frozenset())}
+
+
+# Löst alle Vorlagen einer Datei auf. Jeder Baustein wird nur einmal aufgelöst;
+# Vorlagen mit unbekannten oder zyklischen Verweisen werden mit einer Warnung
+# ausgelassen.
+def vorlagen_aufloesen(vorlagen: List[dict], bausteine: List[dict]) -> List[dict]:
+    quellen = {b.get("id"): b.get("kategorien", []) for b in bausteine}
+    aufgeloest: Dict[str, List[dict]] = {}
+    ergebnis = []
+    for v in vorlagen:
+        try:
+            ergebnis.append(vorlage_aufloesen(v, quellen.get, aufgeloest))
+        except ValueError as e:
+            log.warning("Vorlage „%s“ wird ausgelassen: %s", v.get("id"), e)
+    return ergebnis
+
+
+# === Vorlagen-Verzeichnis ====================================================
+# Für große Sammlungen: statt einer vorlagen.json liegt jede Vorlage und jeder
+# Baustein in einer eigenen Datei, dazu ein kleines Inhaltsverzeichnis:
+#   <verzeichnis>/index.json                  id, name, Datei, Größe, mtime je Vorlage
+#   <verzeichnis>/vorlagen/<xx>/<id>.json     xx = Shard aus dem Hash der ID
+#   <verzeichnis>/bausteine/<id>.json
+# Für Auswahlliste und API wird nur index.json gelesen, der Inhalt einer Vorlage
+# erst bei ihrer Auswahl. Aufgelöste Vorlagen bleiben gecacht, bis sich eine der
+# beteiligten Dateien (Vorlage oder eingebundene Bausteine) ändert.
+
+INDEX_DATEI = "index.json"
+_GUELTIGE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _id_pruefen(vorlage_id: str) -> str:
+    if not _GUELTIGE_ID.match(str(vorlage_id)):
+        raise ValueError(f"Ungültige ID „{vorlage_id}“ (erlaubt: Buchstaben, Ziffern, - und _)")
+    return str(vorlage_id)
+
+
+# Relativer Pfad einer Vorlage; 256 Unterordner halten die Ordner klein
+def vorlage_pfad(vorlage_id: str) -> str:
+    shard = hashlib.blake2b(_id_pruefen(vorlage_id).encode("utf-8"), digest_size=1).hexdigest()
+    return f"vorlagen/{shard}/{vorlage_id}.json"
+
+
+def baustein_pfad(baustein_id: str) -> str:
+    return f"bausteine/{_id_pruefen(baustein_id)}.json"
+
+
+def _json_schreiben(pfad: Path, daten):
+    pfad.parent.mkdir(parents=True, exist_ok=True)
+    pfad.write_text(json.dumps(daten, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+# Schreibt index.json aus den Vorlagen-Dateien neu. Bereits bekannte Vorlagen
+# behalten ihre Position, neue werden nach Namen sortiert angehängt.
+def index_aufbauen(verzeichnis: Path, reihenfolge: Optional[List[str]] = None) -> List[dict]:
+    if reihenfolge is None:
+        try:
+            alt = json.loads((verzeichnis / INDEX_DATEI).read_text(encoding="utf-8"))
+            reihenfolge = [e["id"] for e in alt.get("vorlagen", [])]
+        except (OSError, ValueError):
+            reihenfolge = []
+    position = {v_id: i for i, v_id in enumerate(reihenfolge)}
+
+    eintraege = []
+    for datei in (verzeichnis / "vorlagen").glob("*/*.json"):
+        v = json.loads(datei.read_text(encoding="utf-8"))
+        stat = datei.stat()
+        eintraege.append(
+            {
+                "id": v.get("id", datei.stem),
+                "name": v.get("name", ""),
+                "datei": datei.relative_to(verzeichnis).as_posix(),
+                "groesse": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+            }
+        )
+    eintraege.sort(key=lambda e: (position.get(e["id"], len(position)), e["name"], e["id"]))
+    _json_schreiben(verzeichnis / INDEX_DATEI, {"vorlagen": eintraege})
+    return eintraege
+
+
+# Teilt eine vorlagen.json (inkl. Bausteine) in ein Vorlagen-Verzeichnis auf
+def verzeichnis_aus_datei(datei: Path, verzeichnis: Path) -> int:
+    data = json.loads(Path(datei).read_text(encoding="utf-8"))
+    for b in data.get("bausteine", []):
+        _json_schreiben(verzeichnis / baustein_pfad(b.get("id", "")), b)
+    vorlagen = data.get("vorlagen", [])
+    for v in vorlagen:
+        _json_schreiben(verzeichnis / vorlage_pfad(v.get("id", "")), v)
+    index_aufbauen(verzeichnis, reihenfolge=[v["id"] for v in vorlagen])
+    return len(vorlagen)
+
+
+class VorlagenVerzeichnis:
+    def __init__(self, pfad: Path):
+        self.pfad = Path(pfad)
+        self._lock = RLock()
+        self._index: Optional[tuple] = None  # (mtime, Köpfe)
+        self._dateien: Dict[str, tuple] = {}  # relativer Pfad -> (mtime, JSON)
+        self._aufgeloest: Dict[str, tuple] = {}  # ID -> ({Pfad: mtime}, Vorlage)
+
+    def _mtime(self, relativ: str) -> Optional[int]:
+        try:
+            return (self.pfad / relativ).stat().st_mtime_ns
+        except OSError:
+            return None
+
+    # Änderungszeit von index.json (None = kein Vorlagen-Verzeichnis vorhanden)
+    def index_mtime(self) -> Optional[int]:
+        return self._mtime(INDEX_DATEI)
+
+    def aktiv(self) -> bool:
+        return self.index_mtime() is not None
+
+    # Liest eine JSON-Datei (gecacht bis zur nächsten Änderung) und merkt sich
+    # ihre mtime in `abhaengig`
+    def _lesen(self, relativ: str, abhaengig: Optional[dict] = None):
+        mtime = self._mtime(relativ)
+        if mtime is None:
+            return None
+        if abhaengig is not None:
+            abhaengig[relativ] = mtime
+        eintrag = self._dateien.get(relativ)
+        if eintrag is None or eintrag[0] != mtime:
+            eintrag = self._dateien[relativ] = (mtime, json.loads((self.pfad / relativ).read_text(encoding="utf-8")))
+        return eintrag[1]
+
+    # Köpfe aller Vorlagen aus index.json (ohne Kategorien)
+    def koepfe(self) -> List[dict]:
+        with self._lock:
+            mtime = self.index_mtime()
+            if mtime is None:
+                return []
+            if self._index is None or self._index[0] != mtime:
+                daten = self._lesen(INDEX_DATEI) or {}
+                self._index = (mtime, [dict(e, verzeichnis=True) for e in daten.get("vorlagen", [])])
+            return self._index[1]
+
+    # Aufgelöste Vorlage; liest Vorlage und Bausteine nur beim ersten Zugriff
+    # bzw. nach einer Änderung an einer der Dateien
+    def laden(self, vorlage_id: str) -> Optional[dict]:
+        with self._lock:
+            treffer = self._aufgeloest.get(vorlage_id)
+            if treffer is not None and all(self._mtime(p) == m for p, m in treffer[0].items()):
+                return treffer[1]
+            kopf = next((k for k in self.koepfe() if k["id"] == vorlage_id), None)
+            if kopf is None:
+                return None
+            abhaengig: dict = {}
+            try:
+                quelle = self._lesen(kopf.get("datei") or vorlage_pfad(vorlage_id), abhaengig)
+                if quelle is None:
+                    return None
+
+                def baustein(b_id: str) -> Optional[List[dict]]:
+                    b = self._lesen(baustein_pfad(b_id), abhaengig)
+                    return None if b is None else b.get("kategorien", [])
+
+                vorlage = vorlage_aufloesen(quelle, baustein)
+            except ValueError as e:
+                log.warning("Vorlage „%s“ wird ausgelassen: %s", vorlage_id, e)
+                return None
+            vorlage.setdefault("id", vorlage_id)
+            vorlage.setdefault("name", kopf.get("name", ""))
+            self._aufgeloest[vorlage_id] = (abhaengig, vorlage)
+            return vorlage
+
+
+# === Vorlagen-Index ==========================================================
+
+# Liste aller Vorlagen für Auswahl und API: die aus vorlagen.json (nur neu
+# gelesen, wenn sich die Datei ändert) gefolgt von den eigenen (einmal aus der
+# DB geladen, danach per hinzufuegen()/entfernen() fortgeschrieben).
+class VorlagenIndex:
+    def __init__(self, datei_mtime: Callable[[], Optional[int]], datei_laden: Callable[[], List[dict]]):
+        self._datei_mtime = datei_mtime
+        self._datei_laden = datei_laden
+        self._lock = RLock()
+        self._datei: Optional[tuple] = None  # (mtime, Vorlagen)
+        self._eigene: "Optional[OrderedDict[str, dict]]" = None
+        # Zählt jede Änderung an den eigenen Vorlagen. Anzahl und höchste ID
+        # reichen dafür nicht, weil SQLite gelöschte IDs wiedervergibt; die
+        # Instanz-Kennung trennt die Zähler verschiedener Prozesse.
+        self._instanz = uuid.uuid4().hex[:8]
+        self._aenderungen = 0
+
+    # Alle Vorlagen (Datei-Vorlagen vollständig, eigene nur als Kopf)
+    def holen(self) -> List[dict]:
+        mtime = self._datei_mtime()
+        with self._lock:
+            if mtime is None:
+                self._datei = (None, [])
+            elif self._datei is None or self._datei[0] != mtime:
+                self._datei = (mtime, self._datei_laden())
+            if self._eigene is None:
+                self._eigene = OrderedDict((k["id"], k) for k in eigene_vorlagen())
+            return self._datei[1] + list(self._eigene.values())
+
+    # Stand für ETags: ändert sich mit der Datei und mit jeder eigenen Vorlage
+    def version(self) -> str:
+        self.holen()
+        with self._lock:
+            return f"{self._instanz}.{self._datei[0] or 0}.{self._aenderungen}"
+
+    # Trägt eine neu gespeicherte eigene Vorlage ein (ohne Neuladen)
+    def hinzufuegen(self, kopf: dict):
+        with self._lock:
+            self._aenderungen += 1
+            if self._eigene is not None:
+                self._eigene[kopf["id"]] = kopf
+
+    def entfernen(self, vorlage_id: str):
+        with self._lock:
+            self._aenderungen += 1
+            if self._eigene is not None:
+                self._eigene.pop(vorlage_id, None)
+
+    # Verwirft alles (nächster Zugriff lädt neu, z.B. in Tests mit anderer DB)
+    def leeren(self):
+        with self._lock:
+            self._aenderungen += 1
+            self._datei = None
+            self._eigene = None
+
+
+if __name__ == "__main__":
+    # python vorlagen.py aufteilen [vorlagen.json] [verzeichnis] | python vorlagen.py index [verzeichnis]
+    basis = Path(__file__).parent
+    if len(sys.argv) < 2 or sys.argv[1] not in {"aufteilen", "index"}:
+        print("Aufruf: python vorlagen.py aufteilen [vorlagen.json] [verzeichnis] | index [verzeichnis]")
+        sys.exit(2)
+    if sys.argv[1] == "aufteilen":
+        quelle = Path(sys.argv[2]) if len(sys.argv) > 2 else basis / "vorlagen.json"
+        ziel = Path(sys.argv[3]) if len(sys.argv) > 3 else basis / "vorlagen_bibliothek"
+        print(f"{verzeichnis_aus_datei(quelle, ziel)} Vorlagen nach {ziel} geschrieben")
+    else:
+        ziel = Path(sys.argv[2]) if len(sys.argv) > 2 else basis / "vorlagen_bibliothek"
+        print(f"{len(index_aufbauen(ziel))} Vorlagen im Index {ziel / INDEX_DATEI}")